@@ -5,8 +5,13 @@ Loads GEMINI_API_KEY from repo root .env or backend/.env.
 
 import os
 import sys
+import time
 from pathlib import Path
 
+from tracing import span
+
+_STARTED_NS = time.time_ns()  # Before importing google.genai, so the root span includes it
+
 # Prefer repo root .env (same as backend Node app)
 root = Path(__file__).resolve().parent.parent.parent
 env_path = root / ".env"
@@ -76,14 +81,17 @@ def summarize(calendar_text: str, gmail_text: str, *, prompt: str | None = None)
     body = "\n\n".join(combined)
     _log("calling Gemini (gemini-2.0-flash)...")
     client = _client_get()
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=f"{instructions}\n\n---\n\n{body}",
-        config=types.GenerateContentConfig(
-            max_output_tokens=1024,
-            temperature=0.2,
-        ),
-    )
+    with span("gemini.generate_content", model="gemini-2.0-flash", input_chars=len(body)) as s:
+        response = client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=f"{instructions}\n\n---\n\n{body}",
+            config=types.GenerateContentConfig(
+                max_output_tokens=1024,
+                temperature=0.2,
+            ),
+        )
+        if s is not None:
+            s.set(output_chars=len(getattr(response, "text", None) or ""))
     if not response or not getattr(response, "text", None):
         _log("Gemini returned no text")
         return "(Gemini returned no text.)"
@@ -137,7 +145,8 @@ def main():
             calendar_text = raw.strip()
             gmail_text = ""
     _log("main() calling summarize()")
-    out = summarize(calendar_text, gmail_text)
+    with span("summarize", start_ns=_STARTED_NS):
+        out = summarize(calendar_text, gmail_text)
     print(out)
 
 
@@ -16,6 +16,10 @@ import time as _time
 from datetime import datetime
 from pathlib import Path
 
+from tracing import span
+
+_STARTED_NS = _time.time_ns()
+
 # Load .env before importing summarize (needs GEMINI_API_KEY)
 root = Path(__file__).resolve().parent.parent.parent
 env_path = root / ".env"
@@ -132,6 +136,11 @@ def fetch_gcal_events(access_token: str, hours: int = 24) -> tuple[bool, list |
 
 
 def main() -> None:
+    with span("summarize_with_gcal", start_ns=_STARTED_NS):
+        _main()
+
+
+def _main() -> None:
     parser = argparse.ArgumentParser(
         description="Fetch Google Calendar events and summarize with Gemini."
     )
@@ -154,7 +163,8 @@ def main() -> None:
 
     hours = max(1, min(24 * 365, args.hours))
     _log(f"Fetching GCal events for the last {hours} hours...")
-    ok, events, err = fetch_gcal_events(args.token.strip(), hours)
+    with span("gcal.events.list", hours=hours):
+        ok, events, err = fetch_gcal_events(args.token.strip(), hours)
     if not ok:
         _log(f"GCal fetch failed: {err}")
         sys.exit(2)
@@ -166,7 +176,8 @@ def main() -> None:
         return
 
     _log(f"Got {len(events)} events, summarizing with Gemini...")
-    from summarize import summarize as run_summarize
+    with span("import summarize"):
+        from summarize import summarize as run_summarize
     summary = run_summarize(calendar_text, "")
     print(summary)
 
@@ -27,6 +27,10 @@ import time as _time
 from datetime import datetime
 from pathlib import Path
 
+from tracing import span
+
+_STARTED_NS = _time.time_ns()
+
 # Load .env before importing summarize (needs GEMINI_API_KEY)
 root = Path(__file__).resolve().parent.parent.parent
 env_path = root / ".env"
@@ -301,6 +305,11 @@ def format_gmail_as_text(messages: list) -> str:
 
 
 def main() -> None:
+    with span("summarize_with_gcal_gmail", start_ns=_STARTED_NS):
+        _main()
+
+
+def _main() -> None:
     parser = argparse.ArgumentParser(
         description="Fetch Google Calendar and Gmail for the same time window and summarize with Gemini."
     )
@@ -323,7 +332,8 @@ def main() -> None:
 
     hours = max(1, min(24 * 365, args.hours))
     _log(f"Fetching GCal events for the last {hours} hours...")
-    ok, events, err = fetch_gcal_events(args.token.strip(), hours)
+    with span("gcal.events.list", hours=hours):
+        ok, events, err = fetch_gcal_events(args.token.strip(), hours)
     if not ok:
         _log(f"GCal fetch failed: {err}")
         sys.exit(2)
@@ -331,13 +341,16 @@ def main() -> None:
     calendar_text = format_gcal_events_as_text(events or [])
 
     _log(f"Fetching Gmail messages for the last {hours} hours...")
-    gmail_ok, gmail_messages, gmail_err = fetch_gmail_messages(args.token.strip(), hours)
+    with span("gmail.messages.list", hours=hours):
+        gmail_ok, gmail_messages, gmail_err = fetch_gmail_messages(args.token.strip(), hours)
     if not gmail_ok:
         # Fallback: token may have only Calendar scope; try server-side refresh token from env
-        creds = _gmail_creds_from_env()
+        with span("google.oauth.refresh"):
+            creds = _gmail_creds_from_env()
         if creds:
             _log("Gmail failed with access token; trying server credentials from env (GOOGLE_REFRESH_TOKEN)...")
-            gmail_ok, gmail_messages, gmail_err = _fetch_gmail_with_creds(creds, hours)
+            with span("gmail.messages.list", hours=hours, fallback=True):
+                gmail_ok, gmail_messages, gmail_err = _fetch_gmail_with_creds(creds, hours)
         if not gmail_ok:
             _log(f"Gmail fetch failed (continuing with calendar only): {gmail_err}")
             gmail_text = ""
@@ -356,7 +369,8 @@ def main() -> None:
         return
 
     _log("Summarizing with Gemini...")
-    from summarize import summarize as run_summarize
+    with span("import summarize"):
+        from summarize import summarize as run_summarize
     summary = run_summarize(calendar_text, gmail_text)
     print(summary)
 
@@ -0,0 +1,32 @@
+"""
+Tracing for the Gemini scripts.
+
+Uses the tracer from mac_messages_mcp/mac_messages_mcp/tracing.py, so spans
+continue the trace in the TRACEPARENT environment variable set by the Node
+backend and are exported the same way (TRACE_FILE and/or
+OTEL_EXPORTER_OTLP_ENDPOINT). The module is loaded straight from its file:
+it only needs the standard library, while importing the mac_messages_mcp
+package would pull in the MCP server's dependencies.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_TRACER_PATH = Path(__file__).resolve().parents[2] / "mac_messages_mcp" / "mac_messages_mcp" / "tracing.py"
+_MODULE_NAME = "mac_messages_mcp_tracing"
+
+if _MODULE_NAME in sys.modules:
+    _tracer = sys.modules[_MODULE_NAME]
+else:
+    _spec = importlib.util.spec_from_file_location(_MODULE_NAME, _TRACER_PATH)
+    _tracer = importlib.util.module_from_spec(_spec)
+    sys.modules[_MODULE_NAME] = _tracer
+    _spec.loader.exec_module(_tracer)
+    _tracer.set_service_name("gemini-summarize")
+
+span = _tracer.span
+flush = _tracer.flush
+enabled = _tracer.enabled
+child_env = _tracer.child_env
+
+__all__ = ["span", "flush", "enabled", "child_env"]
@@ -10,6 +10,7 @@ import { google } from 'googleapis';
 import { Poke } from 'poke';
 
 import { requestLogger } from './middleware/requestLogger.js';
+import { childEnv, startSpan, tracingMiddleware } from './tracing.js';
 import { fetchEmails } from './gmail-api/fetchEmails.js';
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
@@ -24,6 +25,7 @@ const GET_MESSAGES_SCRIPT = path.join(MCP_DIR, 'get_messages_cli.py');
 const app = express();
 app.use(cors());
 app.use(express.json());
+app.use(tracingMiddleware);
 app.use(requestLogger);
 
 const PORT = process.env.PORT ?? 3000;
@@ -66,8 +68,10 @@ async function fetchMessages(hours = 168, contact) {
     if (contact && String(contact).trim()) {
       args.push(String(contact).trim());
     }
+    const span = startSpan('spawn get_messages_cli.py');
     const proc = spawn('uv', args, {
       cwd: MCP_DIR,
+      env: childEnv(span),
       stdio: ['ignore', 'pipe', 'pipe'],
     });
     let stdout = '';
@@ -75,6 +79,7 @@ async function fetchMessages(hours = 168, contact) {
     proc.stdout?.on('data', (chunk) => { stdout += chunk; });
     proc.stderr?.on('data', (chunk) => { stderr += chunk; });
     proc.on('close', (code) => {
+      span.end({ exit_code: code });
       try {
         const data = JSON.parse(stdout || '{}');
         if (data.ok && typeof data.messages === 'string') {
@@ -95,6 +100,7 @@ async function fetchMessages(hours = 168, contact) {
       }
     });
     proc.on('error', (err) => {
+      span.end({}, err.message);
       resolve({ ok: false, messages: '', error: err.message });
     });
   });
@@ -109,8 +115,10 @@ async function fetchMessages(hours = 168, contact) {
 async function fetchLatestMessageFromContact(contact, hours = 1) {
   return new Promise((resolve) => {
     const args = ['run', 'python', 'get_latest_message_cli.py', String(contact).trim(), String(hours)];
+    const span = startSpan('spawn get_latest_message_cli.py');
     const proc = spawn('uv', args, {
       cwd: MCP_DIR,
+      env: childEnv(span),
       stdio: ['ignore', 'pipe', 'pipe'],
     });
     let stdout = '';
@@ -118,6 +126,7 @@ async function fetchLatestMessageFromContact(contact, hours = 1) {
     proc.stdout?.on('data', (chunk) => { stdout += chunk; });
     proc.stderr?.on('data', (chunk) => { stderr += chunk; });
     proc.on('close', (code) => {
+      span.end({ exit_code: code });
       try {
         const data = JSON.parse(stdout || '{}');
         if (data.ok && typeof data.body === 'string') {
@@ -135,6 +144,7 @@ async function fetchLatestMessageFromContact(contact, hours = 1) {
       }
     });
     proc.on('error', (err) => {
+      span.end({}, err.message);
       resolve({ ok: false, error: err.message });
     });
   });
@@ -318,8 +328,10 @@ async function runSummarizeWithGcal(accessToken, hours = 24) {
     const py = path.join(GEMINI_DIR, '.venv', 'bin', 'python');
     const useVenv = fs.existsSync(py);
     const pythonBin = useVenv ? py : 'python3';
+    const span = startSpan('spawn summarize_with_gcal.py');
     const proc = spawn(pythonBin, [SUMMARIZE_WITH_GCAL_SCRIPT, '--token', accessToken, '--hours', String(hoursClamped)], {
       cwd: GEMINI_DIR,
+      env: childEnv(span),
       stdio: ['ignore', 'pipe', 'pipe'],
     });
     let stdout = '';
@@ -327,6 +339,7 @@ async function runSummarizeWithGcal(accessToken, hours = 24) {
     proc.stdout?.on('data', (chunk) => { stdout += chunk; });
     proc.stderr?.on('data', (chunk) => { stderr += chunk; });
     proc.on('close', (code) => {
+      span.end({ exit_code: code });
       const durationMs = Date.now() - startedAt;
       if (code === 0 && stdout.trim()) {
         console.log('[runSummarizeWithGcal] success', { code, durationMs, summaryLength: stdout.trim().length });
@@ -341,6 +354,7 @@ async function runSummarizeWithGcal(accessToken, hours = 24) {
       }
     });
     proc.on('error', (err) => {
+      span.end({}, err.message);
       const durationMs = Date.now() - startedAt;
       console.error('[runSummarizeWithGcal] spawn error', { durationMs, message: err.message });
       resolve({ ok: false, error: err.message });
@@ -361,8 +375,10 @@ async function runSummarizeWithGcalGmail(accessToken, hours = 24) {
     const py = path.join(GEMINI_DIR, '.venv', 'bin', 'python');
     const useVenv = fs.existsSync(py);
     const pythonBin = useVenv ? py : 'python3';
+    const span = startSpan('spawn summarize_with_gcal_gmail.py');
     const proc = spawn(pythonBin, [SUMMARIZE_WITH_GCAL_GMAIL_SCRIPT, '--token', accessToken, '--hours', String(hoursClamped)], {
       cwd: GEMINI_DIR,
+      env: childEnv(span),
       stdio: ['ignore', 'pipe', 'pipe'],
     });
     let stdout = '';
@@ -370,6 +386,7 @@ async function runSummarizeWithGcalGmail(accessToken, hours = 24) {
     proc.stdout?.on('data', (chunk) => { stdout += chunk; });
     proc.stderr?.on('data', (chunk) => { stderr += chunk; });
     proc.on('close', (code) => {
+      span.end({ exit_code: code });
       const durationMs = Date.now() - startedAt;
       if (code === 0 && stdout.trim()) {
         console.log('[runSummarizeWithGcalGmail] success', { code, durationMs, summaryLength: stdout.trim().length });
@@ -384,6 +401,7 @@ async function runSummarizeWithGcalGmail(accessToken, hours = 24) {
       }
     });
     proc.on('error', (err) => {
+      span.end({}, err.message);
       const durationMs = Date.now() - startedAt;
       console.error('[runSummarizeWithGcalGmail] spawn error', { durationMs, message: err.message });
       resolve({ ok: false, error: err.message });
@@ -416,8 +434,10 @@ async function runSummarize(calendarText, gmailText = '') {
     const pythonBin = useVenv ? py : 'python3';
     console.log('[runSummarize] spawning', { python: pythonBin, script: SUMMARIZE_SCRIPT, stdinBytes: Buffer.byteLength(stdinData, 'utf8') });
 
+    const span = startSpan('spawn summarize.py');
     const proc = spawn(pythonBin, [SUMMARIZE_SCRIPT], {
       cwd: GEMINI_DIR,
+      env: childEnv(span),
       stdio: ['pipe', 'pipe', 'pipe'],
     });
     let stdout = '';
@@ -426,6 +446,7 @@ async function runSummarize(calendarText, gmailText = '') {
     proc.stderr?.on('data', (chunk) => { stderr += chunk; });
     proc.stdin?.end(stdinData, 'utf8');
     proc.on('close', (code) => {
+      span.end({ exit_code: code });
       const durationMs = Date.now() - startedAt;
       if (code === 0 && stdout.trim()) {
         console.log('[runSummarize] success', { code, durationMs, summaryLength: stdout.trim().length });
@@ -437,6 +458,7 @@ async function runSummarize(calendarText, gmailText = '') {
       }
     });
     proc.on('error', (err) => {
+      span.end({}, err.message);
       const durationMs = Date.now() - startedAt;
       console.error('[runSummarize] spawn error', { durationMs, message: err.message });
       resolve({ ok: false, error: err.message });
@@ -0,0 +1,104 @@
+/**
+ * Lightweight request tracing shared with the Python scripts.
+ *
+ * Every HTTP request gets a root span (continuing an incoming `traceparent`
+ * header if present). Spawned Python processes receive the active span as the
+ * TRACEPARENT environment variable, so spans written by mac_messages_mcp and
+ * backend/gemini join the same trace. Finished spans are appended as JSON lines
+ * to TRACE_FILE (same record format as the Python side); with TRACE_FILE unset
+ * nothing is recorded and spans cost a couple of object allocations.
+ */
+import { AsyncLocalStorage } from 'async_hooks';
+import crypto from 'crypto';
+import fs from 'fs';
+import path from 'path';
+
+const SERVICE_NAME = 'backend';
+const storage = new AsyncLocalStorage();
+
+// Wall-clock epoch nanoseconds with monotonic resolution, comparable across processes
+const originNs = BigInt(Date.now()) * 1000000n;
+const originHr = process.hrtime.bigint();
+const nowNs = () => originNs + (process.hrtime.bigint() - originHr);
+
+function parseTraceparent(value) {
+  const parts = String(value || '').trim().split('-');
+  if (parts.length !== 4 || parts[1].length !== 32 || parts[2].length !== 16) return null;
+  return { traceId: parts[1], spanId: parts[2] };
+}
+
+function traceFile() {
+  const file = process.env.TRACE_FILE;
+  return file ? path.resolve(file) : null;
+}
+
+/**
+ * Start a span as a child of the active span (or of `parent`, a traceparent string).
+ * Call `span.end({ ...attributes })` when the operation finishes.
+ */
+export function startSpan(name, attributes = {}, parent) {
+  const active = storage.getStore();
+  const inherited = parent ? parseTraceparent(parent) : null;
+  const traceId = active?.traceId ?? inherited?.traceId ?? crypto.randomBytes(16).toString('hex');
+  const span = {
+    name,
+    traceId,
+    spanId: crypto.randomBytes(8).toString('hex'),
+    parentId: active?.spanId ?? inherited?.spanId ?? null,
+    attributes: { ...attributes },
+    startNs: nowNs(),
+    ended: false,
+    get traceparent() {
+      return `00-${this.traceId}-${this.spanId}-01`;
+    },
+    end(extra = {}, error = null) {
+      if (this.ended) return;
+      this.ended = true;
+      const file = traceFile();
+      if (!file) return;
+      const endNs = nowNs();
+      const record = {
+        trace_id: this.traceId,
+        span_id: this.spanId,
+        parent_id: this.parentId,
+        name: this.name,
+        service: SERVICE_NAME,
+        pid: process.pid,
+        start_ns: Number(this.startNs),
+        end_ns: Number(endNs),
+        duration_ms: Number(endNs - this.startNs) / 1e6,
+        attributes: { ...this.attributes, ...extra },
+        error: error ? String(error) : null,
+      };
+      fs.appendFile(file, JSON.stringify(record) + '\n', () => {});
+    },
+  };
+  return span;
+}
+
+/** Run `fn` with `span` as the active span for everything it awaits or spawns. */
+export function withSpan(span, fn) {
+  return storage.run(span, fn);
+}
+
+/**
+ * Environment for a child process that continues the active trace.
+ * Pass as `env` to child_process.spawn.
+ */
+export function childEnv(span) {
+  const active = span ?? storage.getStore();
+  const file = traceFile();
+  if (!active || !file) return process.env;
+  // Absolute path: the scripts run with a different cwd
+  return { ...process.env, TRACEPARENT: active.traceparent, TRACE_FILE: file };
+}
+
+/** Express middleware: one root span per request, exposed as `req.span`. */
+export function tracingMiddleware(req, res, next) {
+  const span = startSpan(`${req.method} ${req.path}`, { method: req.method, path: req.path }, req.get('traceparent'));
+  req.span = span;
+  res.setHeader('traceparent', span.traceparent);
+  res.on('finish', () => span.end({ status: res.statusCode }));
+  res.on('close', () => span.end({ status: res.statusCode, aborted: !res.writableEnded }));
+  withSpan(span, next);
+}
@@ -0,0 +1,57 @@
+"""
+Benchmarks for the message and contact lookup paths
+"""
+from mac_messages_mcp.analytics import get_conversation_analytics
+from mac_messages_mcp.messages import (
+    _check_imessage_availability,
+    find_contact_by_name,
+    find_handles_by_phone,
+    fuzzy_search_messages,
+    get_recent_messages,
+)
+
+
+def test_get_recent_messages_24h(benchmark, warm_contacts, no_result_cache):
+    result = benchmark(get_recent_messages, hours=24)
+    assert not result.startswith("Error")
+
+
+def test_get_recent_messages_24h_cached(benchmark, warm_contacts):
+    get_recent_messages(hours=24)
+    result = benchmark(get_recent_messages, hours=24)
+    assert not result.startswith("Error")
+
+
+def test_get_recent_messages_week_for_contact(benchmark, sample_contact, no_result_cache):
+    _name, handle = sample_contact
+    result = benchmark(get_recent_messages, hours=24 * 7, contact=handle)
+    assert not result.startswith("Error")
+
+
+def test_fuzzy_search_messages_week(benchmark, warm_contacts):
+    result = benchmark(fuzzy_search_messages, "dinner tonight", hours=24 * 7)
+    assert not result.startswith("Error")
+
+
+def test_find_contact_by_name(benchmark, sample_contact):
+    name, _handle = sample_contact
+    matches = benchmark(find_contact_by_name, name.split()[0])
+    assert matches
+
+
+def test_find_handles_by_phone(benchmark, sample_contact):
+    _name, handle = sample_contact
+    handles = benchmark(find_handles_by_phone, handle)
+    assert handles
+
+
+def test_check_imessage_availability(benchmark, sample_contact):
+    _name, handle = sample_contact
+    result = benchmark(_check_imessage_availability, handle)
+    assert isinstance(result, bool)
+
+
+def test_conversation_analytics_for_contact(benchmark, sample_contact):
+    _name, handle = sample_contact
+    stats = benchmark(get_conversation_analytics, contact=handle)
+    assert "error" not in stats
@@ -0,0 +1,88 @@
+"""
+Shared fixtures for the benchmark suite.
+
+A synthetic chat.db and AddressBook are generated once per session and the
+package is pointed at them through the database source registry, so the suite
+runs anywhere (including Linux CI) without touching real Messages data.
+
+Fixture size is controlled with environment variables:
+    MAC_MESSAGES_BENCH_MESSAGES  message rows (default 200000)
+    MAC_MESSAGES_BENCH_PEOPLE    correspondents (default 300)
+    MAC_MESSAGES_BENCH_SEED      generator seed (default 0)
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from mac_messages_mcp import messages
+from mac_messages_mcp.sources import ADDRESSBOOK_DB_PATHS_ENV, MESSAGES_DB_PATHS_ENV
+from pytest_benchmark.utils import parse_compare_fail
+
+from tests.fixtures import generate_fixture_dir, reset_caches
+
+BENCH_MESSAGES = int(os.environ.get("MAC_MESSAGES_BENCH_MESSAGES", 200_000))
+BENCH_PEOPLE = int(os.environ.get("MAC_MESSAGES_BENCH_PEOPLE", 300))
+BENCH_SEED = int(os.environ.get("MAC_MESSAGES_BENCH_SEED", 0))
+
+# A run compared against a stored baseline fails if any mean regresses by more than this
+REGRESSION_THRESHOLD = "mean:20%"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Apply the regression threshold whenever a baseline comparison is requested."""
+    if config.getoption("benchmark_compare") and not config.getoption("benchmark_compare_fail"):
+        config.option.benchmark_compare_fail = [parse_compare_fail(REGRESSION_THRESHOLD)]
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    """Record the fixture generator parameters with saved results, so baselines say what they measured."""
+    output_json["fixture"] = {"messages": BENCH_MESSAGES, "people": BENCH_PEOPLE, "seed": BENCH_SEED}
+
+
+@pytest.fixture(scope="session")
+def fixture_dbs(tmp_path_factory):
+    """Generate the benchmark databases and route all reads to them."""
+    directory = tmp_path_factory.mktemp("messages-bench")
+    chat_db, addressbook_db = generate_fixture_dir(
+        str(directory), messages=BENCH_MESSAGES, people=BENCH_PEOPLE, seed=BENCH_SEED
+    )
+
+    saved = {key: os.environ.get(key) for key in (MESSAGES_DB_PATHS_ENV, ADDRESSBOOK_DB_PATHS_ENV)}
+    os.environ[MESSAGES_DB_PATHS_ENV] = chat_db
+    os.environ[ADDRESSBOOK_DB_PATHS_ENV] = addressbook_db
+    reset_caches()
+    yield chat_db, addressbook_db
+
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    reset_caches()
+
+
+@pytest.fixture(scope="session")
+def warm_contacts(fixture_dbs):
+    """Load the contacts cache once so lookups measure steady-state cost."""
+    return messages.get_cached_contacts()
+
+
+@pytest.fixture(scope="session")
+def sample_contact(warm_contacts):
+    """A (name, phone) pair for a contact with plenty of history."""
+    handle = messages.query_messages_db(
+        "SELECT h.id FROM message m JOIN handle h ON m.handle_id = h.ROWID"
+        " WHERE h.id LIKE '+%' GROUP BY h.id ORDER BY COUNT(*) DESC LIMIT 1"
+    )[0]["id"]
+    phone = messages.normalize_phone_number(handle)
+    name = warm_contacts.get(phone) or warm_contacts.get(phone[1:])
+    return name, handle
+
+
+@pytest.fixture
+def no_result_cache(monkeypatch):
+    """Bypass the message-window result cache so each round does the full read."""
+    monkeypatch.setattr(messages._RESULT_CACHE, "maxsize", 0)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator for the MessageBridge MCP server.
+
+Starts the server against fixture databases with the fake send transport,
+replays a weighted mix of tool calls from N concurrent client sessions and
+reports throughput, latency percentiles and error rates per tool.
+
+Over stdio every client gets its own server process (that is how agents
+connect to it). With --http the clients share one server that the script
+starts over streamable HTTP, with the same fixture environment. With --url
+they hit an already running server instead; its data is not the fixture's,
+so send_message is left out of the mix.
+
+Throughput is measured from the moment every session has initialized, so
+server start-up is not counted.
+
+Usage (from the mac_messages_mcp directory):
+  uv run python -m benchmarks.loadgen --clients 8 --duration 30
+  uv run python -m benchmarks.loadgen --mix get_recent_messages=3,find_contact=1
+  uv run python -m benchmarks.loadgen --http
+  uv run python -m benchmarks.loadgen --url http://localhost:8000/mcp
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+try:
+    from mcp.client.streamable_http import streamablehttp_client
+except ImportError:  # mcp < 1.8 has no streamable HTTP client
+    streamablehttp_client = None
+
+from mac_messages_mcp.messages import SEND_TRANSPORT_ENV
+from mac_messages_mcp.sources import ADDRESSBOOK_DB_PATHS_ENV, MESSAGES_DB_PATHS_ENV
+from tests.fixtures import generate_fixture_dir
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Workload:
+    """Sample values for tool arguments, taken from the fixture databases."""
+
+    def __init__(self, chat_db: str, addressbook_db: str):
+        conn = sqlite3.connect(chat_db)
+        self.handles = [row[0] for row in conn.execute(
+            "SELECT h.id FROM handle h JOIN message m ON m.handle_id = h.ROWID"
+            " GROUP BY h.id ORDER BY COUNT(*) DESC LIMIT 50"
+        )]
+        conn.close()
+        conn = sqlite3.connect(addressbook_db)
+        self.names = [row[0] for row in conn.execute(
+            "SELECT DISTINCT ZFIRSTNAME FROM ZABCDRECORD WHERE ZFIRSTNAME IS NOT NULL"
+        )]
+        conn.close()
+        self.search_terms = ["dinner tonight", "running late", "happy birthday", "coffee", "the game"]
+
+
+ArgsFactory = Callable[[random.Random, Workload], Dict[str, Any]]
+
+# Tool name -> (default weight, argument factory)
+TOOL_MIX: Dict[str, Tuple[int, ArgsFactory]] = {
+    "get_recent_messages": (6, lambda rng, w: {"hours": rng.choice([1, 24, 168])}),
+    "get_recent_messages_contact": (3, lambda rng, w: {
+        "hours": rng.choice([24, 168, 720]), "contact": rng.choice(w.handles)}),
+    "fuzzy_search_messages": (2, lambda rng, w: {
+        "search_term": rng.choice(w.search_terms), "hours": rng.choice([24, 168])}),
+    "find_contact": (3, lambda rng, w: {"name": rng.choice(w.names)}),
+    "check_imessage_availability": (2, lambda rng, w: {"recipient": rng.choice(w.handles)}),
+    "get_chats": (1, lambda rng, w: {}),
+    "send_message": (1, lambda rng, w: {"recipient": rng.choice(w.handles), "message": "load test"}),
+}
+
+# Mix entries that call the same MCP tool with different argument shapes
+_TOOL_ALIASES = {"get_recent_messages_contact": "get_recent_messages"}
+# Mix entries with side effects, only run against a server using the fake send transport
+_SIDE_EFFECT_TOOLS = ("send_message",)
+_SERVER_START_TIMEOUT = 30.0
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    """Parse "tool=weight,tool=weight" into a weight map (default: TOOL_MIX)."""
+    if not value:
+        return {name: weight for name, (weight, _) in TOOL_MIX.items()}
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip().removeprefix("tool_")
+        if name not in TOOL_MIX:
+            raise SystemExit(f"Unknown tool in mix: {name} (choose from {', '.join(TOOL_MIX)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class Stats:
+    """Latency samples and error counts for one tool."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[index]
+
+
+class StartGate:
+    """Holds clients until every session has initialized, then starts the clock."""
+
+    def __init__(self, clients: int, duration: float):
+        self.duration = duration
+        self.started = 0.0
+        self.deadline = 0.0
+        self._ready = asyncio.Barrier(clients + 1)
+        self._go = asyncio.Event()
+
+    async def client_ready(self) -> None:
+        await self._ready.wait()
+        await self._go.wait()
+
+    async def start(self) -> None:
+        await self._ready.wait()
+        self.started = time.monotonic()
+        self.deadline = self.started + self.duration
+        self._go.set()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def http_server(env: Dict[str, str]) -> AsyncIterator[str]:
+    """Run the server over streamable HTTP with the fixture environment; yields its /mcp URL."""
+    port = _free_port()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "mac_messages_mcp.server",
+        "--transport", "streamable-http", "--host", "127.0.0.1", "--port", str(port),
+        env=env, cwd=PROJECT_DIR, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        give_up = time.monotonic() + _SERVER_START_TIMEOUT
+        while True:
+            if process.returncode is not None:
+                raise SystemExit(f"Server exited with status {process.returncode} before listening")
+            try:
+                _reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                if time.monotonic() > give_up:
+                    raise SystemExit(f"Server did not listen on port {port} within {_SERVER_START_TIMEOUT:.0f}s")
+                await asyncio.sleep(0.1)
+                continue
+            writer.close()
+            break
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        await process.wait()
+
+
+@asynccontextmanager
+async def open_session(url: Optional[str], env: Dict[str, str]) -> AsyncIterator[ClientSession]:
+    """Open one MCP client session over HTTP (shared server at url) or stdio (own server)."""
+    if url:
+        if streamablehttp_client is None:
+            raise SystemExit("HTTP load tests need mcp>=1.8 (streamable HTTP client)")
+        async with streamablehttp_client(url) as (read, write, _get_session_id):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+        return
+
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "mac_messages_mcp.server"],
+        env=env,
+        cwd=PROJECT_DIR,
+    )
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+async def run_client(
+    client_id: int,
+    args: argparse.Namespace,
+    url: Optional[str],
+    env: Dict[str, str],
+    workload: Workload,
+    mix: Dict[str, int],
+    stats: Dict[str, Stats],
+    gate: StartGate,
+) -> None:
+    rng = random.Random(args.seed + client_id)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    async with open_session(url, env) as session:
+        await gate.client_ready()
+        calls = 0
+        while time.monotonic() < gate.deadline and (not args.calls or calls < args.calls):
+            name = rng.choices(names, weights=weights)[0]
+            tool = "tool_" + _TOOL_ALIASES.get(name, name)
+            arguments = TOOL_MIX[name][1](rng, workload)
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, arguments)
+                text = "".join(getattr(c, "text", "") for c in result.content)
+                failed = result.isError or text.startswith("Error")
+            except Exception:
+                failed = True
+            stats[name].latencies.append(time.perf_counter() - started)
+            stats[name].errors += int(failed)
+            calls += 1
+
+
+def report(stats: Dict[str, Stats], elapsed: float, as_json: bool) -> None:
+    rows = []
+    for name, s in sorted(stats.items()):
+        count = len(s.latencies)
+        if not count:
+            continue
+        rows.append({
+            "tool": name,
+            "calls": count,
+            "throughput": count / elapsed,
+            "error_rate": s.errors / count,
+            "p50_ms": s.percentile(50) * 1000,
+            "p90_ms": s.percentile(90) * 1000,
+            "p99_ms": s.percentile(99) * 1000,
+            "max_ms": max(s.latencies) * 1000,
+        })
+    total = sum(r["calls"] for r in rows)
+    errors = sum(stats[r["tool"]].errors for r in rows)
+
+    if as_json:
+        print(json.dumps({"elapsed_s": elapsed, "calls": total, "errors": errors, "tools": rows}, indent=2))
+        return
+
+    header = f"{'tool':<30} {'calls':>7} {'req/s':>8} {'err%':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['tool']:<30} {r['calls']:>7} {r['throughput']:>8.1f} {r['error_rate'] * 100:>6.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    print("-" * len(header))
+    print(f"{total} calls in {elapsed:.1f}s = {total / elapsed:.1f} req/s, {errors} errors")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    fixture_dir = args.fixture_dir or os.path.join(tempfile.gettempdir(), "mac-messages-loadgen")
+    chat_db = os.path.join(fixture_dir, "chat.db")
+    addressbook_db = os.path.join(fixture_dir, "AddressBook-v22.abcddb")
+    if args.regenerate or not (os.path.exists(chat_db) and os.path.exists(addressbook_db)):
+        print(f"Generating fixture with {args.messages} messages in {fixture_dir}...", file=sys.stderr)
+        chat_db, addressbook_db = generate_fixture_dir(fixture_dir, messages=args.messages, seed=args.seed)
+
+    env = dict(os.environ)
+    env.update({
+        MESSAGES_DB_PATHS_ENV: chat_db,
+        ADDRESSBOOK_DB_PATHS_ENV: addressbook_db,
+        SEND_TRANSPORT_ENV: "fake",
+    })
+
+    workload = Workload(chat_db, addressbook_db)
+    mix = parse_mix(args.mix)
+    if args.url:
+        # Someone else's server: it may send for real, and to people who exist
+        skipped = [name for name in _SIDE_EFFECT_TOOLS if mix.pop(name, None) is not None]
+        if skipped:
+            print(f"Not calling {', '.join(skipped)} against --url {args.url}", file=sys.stderr)
+        if not mix:
+            raise SystemExit("Nothing left in the mix to run against --url")
+    stats = {name: Stats() for name in mix}
+    gate = StartGate(args.clients, args.duration)
+
+    async def run(url: Optional[str]) -> None:
+        await asyncio.gather(gate.start(), *(
+            run_client(i, args, url, env, workload, mix, stats, gate) for i in range(args.clients)
+        ))
+
+    if args.http:
+        async with http_server(env) as url:
+            await run(url)
+    else:
+        await run(args.url)
+    report(stats, time.monotonic() - gate.started, args.json)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the MCP server")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--calls", type=int, default=0, help="Stop each client after N calls (0 = no limit)")
+    parser.add_argument("--mix", help="Weighted tool mix, e.g. get_recent_messages=5,find_contact=2")
+    parser.add_argument("--http", action="store_true",
+                        help="Start one server over streamable HTTP and share it between clients")
+    parser.add_argument("--url", help="Streamable HTTP endpoint of an already running server (no send_message)")
+    parser.add_argument("--fixture-dir", help="Where to keep the generated databases")
+    parser.add_argument("--messages", type=int, default=200_000, help="Fixture size when generating")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate the fixture databases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    if args.http and args.url:
+        parser.error("--http starts its own server; don't combine it with --url")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
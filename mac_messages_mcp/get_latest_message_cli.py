@@ -1,39 +1,75 @@
 #!/usr/bin/env python3
 """
-CLI to retrieve the single most recent message from a contact (for Poke reply polling).
+CLI to retrieve the most recent message from one or more contacts (for Poke reply polling).
 Outputs JSON for consumption by the backend (Node.js).
 
 Usage:
   uv run python get_latest_message_cli.py [contact] [hours]
+  uv run python get_latest_message_cli.py contact [contact ...] [--hours N]
+
+With one contact the output is {"ok", "body", "is_from_me", "date"}. With
+several, every contact is answered by a single database query and the output
+is {"ok": true, "results": {contact: {"body", "is_from_me", "date"} | null}}.
 
 Examples:
   uv run python get_latest_message_cli.py
   uv run python get_latest_message_cli.py Poke 1
+  uv run python get_latest_message_cli.py Poke "+15551234567" alice@example.com --hours 2
 """
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
+_STARTED_NS = time.time_ns()  # Before heavy imports, so spans include import time
+
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 
-def main():
-    contact = os.environ.get("POKE_MESSAGES_CONTACT", "Poke").strip() or "Poke"
-    hours = 1
+def parse_args(argv):
+    """Return (contacts, hours) from argv, accepting the legacy "contact hours" form."""
+    contacts = []
+    hours = None
+    args = iter(argv)
+    for arg in args:
+        if arg == "--hours" or arg.startswith("--hours="):
+            value = arg.split("=", 1)[1] if "=" in arg else next(args, "")
+            try:
+                hours = int(value)
+            except ValueError:
+                hours = 1
+        elif arg.strip():
+            contacts.append(arg.strip())
+
+    # Legacy form: a single contact followed by a short number of hours
+    if hours is None and len(contacts) == 2 and contacts[1].isdigit() and len(contacts[1]) <= 4:
+        hours = int(contacts.pop())
+
+    if not contacts:
+        contacts = [os.environ.get("POKE_MESSAGES_CONTACT", "Poke").strip() or "Poke"]
+    return contacts, hours if hours is not None else 1
 
-    if len(sys.argv) > 1:
-        contact = sys.argv[1].strip() or contact
-    if len(sys.argv) > 2:
-        try:
-            hours = int(sys.argv[2])
-        except ValueError:
-            hours = 1
+
+def main():
+    contacts, hours = parse_args(sys.argv[1:])
 
     try:
-        from mac_messages_mcp import get_latest_message_from_contact
+        from mac_messages_mcp import get_latest_messages
+        from mac_messages_mcp.tracing import span
+
+        with span(
+            "get_latest_message_cli", start_ns=_STARTED_NS, contact=",".join(contacts), hours=hours
+        ) as root:
+            if root is not None:
+                root.set(import_ms=round((time.time_ns() - _STARTED_NS) / 1e6, 3), contacts=len(contacts))
+            results = get_latest_messages(contacts, hours=hours)
+
+        if len(contacts) > 1:
+            print(json.dumps({"ok": True, "results": results}))
+            return
 
-        result = get_latest_message_from_contact(contact=contact, hours=hours)
+        result = results.get(contacts[0])
         if result is None:
             print(json.dumps({"ok": False, "error": "No message found"}))
             sys.exit(0)
@@ -12,8 +12,11 @@ Examples:
 """
 import json
 import sys
+import time
 from pathlib import Path
 
+_STARTED_NS = time.time_ns()  # Before heavy imports, so spans include import time
+
 # Ensure we can import mac_messages_mcp (run from mac_messages_mcp dir)
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
@@ -31,7 +34,12 @@ def main():
 
     try:
         from mac_messages_mcp import get_recent_messages
-        result = get_recent_messages(hours=hours, contact=contact)
+        from mac_messages_mcp.tracing import span
+
+        with span("get_messages_cli", start_ns=_STARTED_NS, hours=hours, contact=contact) as root:
+            if root is not None:
+                root.set(import_ms=round((time.time_ns() - _STARTED_NS) / 1e6, 3))
+            result = get_recent_messages(hours=hours, contact=contact)
         print(json.dumps({"ok": True, "messages": result}))
     except Exception as e:
         print(json.dumps({
@@ -3,40 +3,61 @@ Mac Messages MCP - A bridge for interacting with macOS Messages app
 """
 
 from . import phone_country
+from .analytics import get_conversation_analytics
 from .messages import (
     check_addressbook_access,
     check_messages_db_access,
     find_contact_by_name,
     find_handle_by_phone,
     find_handles_by_phone,
+    find_person,
     fuzzy_search_messages,
     get_addressbook_contacts,
+    get_attachments,
     get_cached_contacts,
+    get_chat_directory,
+    get_chat_messages,
     get_contact_name,
     get_latest_message_from_contact,
+    get_latest_messages,
+    get_person_index,
     get_recent_messages,
+    get_thread,
     normalize_phone_number,
     query_addressbook_db,
     query_messages_db,
+    resolve_contacts,
     send_message,
 )
+from .relationships import get_contact_summaries, get_overdue_contacts
 
 __all__ = [
     "phone_country",
     "get_latest_message_from_contact",
+    "get_latest_messages",
     "get_recent_messages",
+    "get_thread",
     "send_message",
     "query_messages_db",
     "get_contact_name",
     "check_messages_db_access",
     "get_addressbook_contacts",
+    "get_attachments",
     "normalize_phone_number",
     "get_cached_contacts",
+    "get_chat_directory",
+    "get_chat_messages",
+    "get_contact_summaries",
+    "get_conversation_analytics",
+    "get_overdue_contacts",
     "query_addressbook_db",
     "check_addressbook_access",
     "find_contact_by_name",
     "find_handle_by_phone",
     "find_handles_by_phone",
+    "find_person",
+    "get_person_index",
+    "resolve_contacts",
     "fuzzy_search_messages",
 ]
 
@@ -0,0 +1,278 @@
+"""
+Conversation analytics: reply latency, activity heatmaps and who starts conversations.
+
+A person's or chat's history is read with one query per Messages database
+into NumPy columns (time, is_from_me, sender) and every statistic is computed
+with vectorized array operations, so multi-year histories take milliseconds
+instead of a Python loop over every message.
+
+NumPy is an optional dependency: install with `pip install "mac-messages-mcp[analytics]"`.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without the extra
+    np = None
+
+from .messages import _REACTION_FILTER, get_message_sources, query_messages_db, resolve_contacts
+from .sources import APPLE_EPOCH_OFFSET, SECONDS_DATE_LIMIT, DatabaseSource, fan_out
+
+# A silence longer than this ends a conversation: the next message starts a
+# new one instead of counting as a (very slow) reply
+DEFAULT_CONVERSATION_GAP_HOURS = 6
+# Upper bounds (seconds) of the reply-latency histogram buckets
+LATENCY_BUCKETS = (60, 300, 900, 3600, 6 * 3600)
+LATENCY_BUCKET_LABELS = ("<1m", "1-5m", "5-15m", "15-60m", "1-6h", ">6h")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+_PERSON_QUERY = f"""
+SELECT m.guid, m.date, m.is_from_me, h.id
+FROM message m
+LEFT JOIN handle h ON h.ROWID = m.handle_id
+WHERE m.handle_id IN ({{marks}})
+  AND m.cache_roomnames IS NULL
+  AND {_REACTION_FILTER}
+"""
+
+_CHAT_QUERY = f"""
+SELECT m.guid, cmj.message_date, m.is_from_me, h.id
+FROM chat_message_join cmj
+JOIN message m ON m.ROWID = cmj.message_id
+LEFT JOIN handle h ON h.ROWID = m.handle_id
+WHERE cmj.chat_id IN (SELECT ROWID FROM chat WHERE chat_identifier = ? OR guid = ?)
+  AND {_REACTION_FILTER}
+"""
+
+
+class Conversation:
+    """
+    One person's or chat's messages as parallel NumPy columns, oldest first.
+
+    Attributes:
+        times: Unix seconds (float64)
+        from_me: True for messages you sent (bool)
+        sender: Index into senders for each message (int); 0 is you
+        senders: Sender addresses, with "" for you at index 0
+    """
+
+    def __init__(self, times, from_me, sender, senders: List[str]):
+        self.times = times
+        self.from_me = from_me
+        self.sender = sender
+        self.senders = senders
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+def apple_dates_to_unix(dates):
+    """Vectorized message.date (seconds or nanoseconds since 2001) to Unix seconds."""
+    dates = np.asarray(dates, dtype=np.int64)
+    # Same rule as sources.apple_date_to_unix, applied to whole columns
+    seconds = np.where(np.abs(dates) >= SECONDS_DATE_LIMIT, dates / 1e9, dates.astype(np.float64))
+    return seconds + APPLE_EPOCH_OFFSET
+
+
+def _to_conversation(rows: List[tuple], dedupe: bool = False) -> "Conversation":
+    """Columnize (guid, date, is_from_me, handle) rows, optionally dropping duplicate guids."""
+    if not rows:
+        return Conversation(np.empty(0), np.empty(0, dtype=bool), np.empty(0, dtype=np.int64), [""])
+    guids, dates, from_me, handles = (np.array(column, dtype=object) for column in zip(*rows))
+    keep = dates != None  # noqa: E711 - elementwise comparison
+    if dedupe:
+        # Overlapping exports contain the same messages; keep each guid once
+        first = np.zeros(len(guids), dtype=bool)
+        first[np.unique(guids, return_index=True)[1]] = True
+        keep &= first
+    dates, from_me, handles = dates[keep].astype(np.int64), from_me[keep].astype(bool), handles[keep]
+
+    times = apple_dates_to_unix(dates)
+    order = np.argsort(times, kind="stable")
+    times, from_me, handles = times[order], from_me[order], handles[order]
+    handles[from_me | (handles == None)] = ""  # noqa: E711
+    # Factorize senders in first-seen order, with you ("") always at 0: a
+    # leading "" makes it the first occurrence, then np.unique's sorted codes
+    # are renumbered by where each sender first appears
+    keys = np.concatenate([np.array([""]), handles.astype(str)])
+    names, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    by_first = np.argsort(first, kind="stable")
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[by_first] = np.arange(len(names))
+    sender = rank[inverse.reshape(-1)[1:]]
+    return Conversation(times, from_me, sender, names[by_first].tolist())
+
+
+def load_conversation(contact: Optional[str] = None, chat_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load a person's direct messages or a chat's messages into NumPy columns.
+
+    Exactly one of contact and chat_id must be given. For a contact, every
+    handle of the person (their numbers and iMessage emails) is included;
+    group chats are not. Tapback reactions are skipped.
+
+    Args:
+        contact: Name, phone number or email address
+        chat_id: chat_identifier or chat guid (as listed by get_chat_directory)
+
+    Returns:
+        {"conversation": Conversation, "label": str} or {"error": ...}
+    """
+    if np is None:
+        return {"error": 'Analytics need NumPy. Install it with: pip install "mac-messages-mcp[analytics]"'}
+    if (contact is None) == (chat_id is None):
+        return {"error": "Specify exactly one of contact or chat_id."}
+
+    if contact is not None:
+        resolved = resolve_contacts([contact])[0]
+        if resolved["status"] == "ambiguous":
+            names = ", ".join(c["name"] for c in resolved["candidates"])
+            return {"error": f"'{contact}' matches several contacts ({names}). Use a phone number or email."}
+        if resolved["person"] is None:
+            return {"error": f"No contact or message history found for '{contact}'."}
+        person = resolved["person"]
+        handle_ids = person["handle_ids"]
+        label = person["name"] or contact
+
+        def run(source: DatabaseSource) -> List[Any]:
+            ids = handle_ids.get(source.path)
+            if not ids:
+                return []
+            query = _PERSON_QUERY.format(marks=", ".join("?" for _ in ids))
+            return query_messages_db(
+                query, tuple(ids), snapshot=True, source=source, tuples=True, label="get_conversation_analytics"
+            )
+    else:
+        label = chat_id
+
+        def run(source: DatabaseSource) -> List[Any]:
+            return query_messages_db(
+                _CHAT_QUERY, (chat_id, chat_id), snapshot=True, source=source, tuples=True,
+                label="get_conversation_analytics",
+            )
+
+    per_source = fan_out(get_message_sources(), run)
+    errors = [rows[0]["error"] for rows in per_source if rows and isinstance(rows[0], dict)]
+    readable = [rows for rows in per_source if not (rows and isinstance(rows[0], dict))]
+    if not readable and errors:
+        return {"error": errors[0]}
+    conversation = _to_conversation([row for rows in readable for row in rows], dedupe=len(readable) > 1)
+    if not len(conversation):
+        target = f"chat '{chat_id}'" if chat_id is not None else label
+        return {"error": f"No messages found for {target}."}
+    return {"conversation": conversation, "label": label}
+
+
+def conversation_starts(conversation: Conversation, gap_seconds: float):
+    """Boolean mask of messages that start a conversation (first, or after a long silence)."""
+    starts = np.ones(len(conversation), dtype=bool)
+    starts[1:] = np.diff(conversation.times) > gap_seconds
+    return starts
+
+
+def reply_latencies(conversation: Conversation, gap_seconds: float) -> Dict[str, Any]:
+    """
+    Seconds between a message and the next one from someone else.
+
+    Only turn changes within a conversation count: a message after a silence
+    longer than gap_seconds starts a new conversation instead. In group chats
+    "them" only counts answers to your messages, not one member replying to
+    another.
+
+    Returns:
+        {"me": latencies of your replies, "them": latencies of replies to you}
+        as float64 arrays
+    """
+    if len(conversation) < 2:
+        empty = np.empty(0)
+        return {"me": empty, "them": empty}
+    deltas = np.diff(conversation.times)
+    turn = (conversation.sender[1:] != conversation.sender[:-1]) & (deltas <= gap_seconds)
+    mine = conversation.from_me[1:]
+    after_mine = conversation.from_me[:-1]
+    return {"me": deltas[turn & mine], "them": deltas[turn & ~mine & after_mine]}
+
+
+def summarize_latencies(latencies) -> Dict[str, Any]:
+    """Count, median, 90th percentile, mean and bucketed histogram of latencies."""
+    if not len(latencies):
+        return {"count": 0, "median_seconds": None, "p90_seconds": None, "mean_seconds": None, "histogram": {}}
+    median, p90 = np.percentile(latencies, [50, 90])
+    counts = np.bincount(np.searchsorted(LATENCY_BUCKETS, latencies, side="right"),
+                         minlength=len(LATENCY_BUCKET_LABELS))
+    return {
+        "count": int(len(latencies)),
+        "median_seconds": round(float(median), 1),
+        "p90_seconds": round(float(p90), 1),
+        "mean_seconds": round(float(latencies.mean()), 1),
+        "histogram": dict(zip(LATENCY_BUCKET_LABELS, counts.tolist())),
+    }
+
+
+def _utc_offsets(times):
+    """Local UTC offset (seconds) for each time, looked up once per distinct day."""
+    days = np.floor(times / 86400).astype(np.int64)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    offsets = np.array([time.localtime(int(day) * 86400 + 43200).tm_gmtoff for day in unique_days])
+    return offsets[inverse]
+
+
+def activity_heatmap(times):
+    """
+    Messages per local weekday and hour.
+
+    Returns:
+        7x24 int array; rows are Monday..Sunday, columns hours 0..23
+    """
+    local = np.floor(times + _utc_offsets(times)).astype(np.int64)
+    hours = (local // 3600) % 24
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekdays = (local // 86400 + 3) % 7
+    return np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+
+
+def get_conversation_analytics(
+    contact: Optional[str] = None,
+    chat_id: Optional[str] = None,
+    gap_hours: float = DEFAULT_CONVERSATION_GAP_HOURS,
+) -> Dict[str, Any]:
+    """
+    Reply latency, activity heatmap and initiation statistics for a person or chat.
+
+    Args:
+        contact: Name, phone number or email address (direct messages only)
+        chat_id: chat_identifier or chat guid
+        gap_hours: Silence (hours) after which the next message starts a new conversation
+
+    Returns:
+        Dict with "label", "messages", "sent", "first_message" and
+        "last_message" (Unix seconds), "reply_latency" ({"me", "them"}
+        summaries, see summarize_latencies), "conversations" (count,
+        started_by_me, initiation_ratio) and "heatmap" (7x24 list, Monday
+        first), or {"error": ...}
+    """
+    loaded = load_conversation(contact=contact, chat_id=chat_id)
+    if "error" in loaded:
+        return loaded
+    conversation = loaded["conversation"]
+    gap_seconds = float(gap_hours) * 3600
+
+    latencies = reply_latencies(conversation, gap_seconds)
+    starts = conversation_starts(conversation, gap_seconds)
+    started = int(starts.sum())
+    started_by_me = int((starts & conversation.from_me).sum())
+    return {
+        "label": loaded["label"],
+        "messages": len(conversation),
+        "sent": int(conversation.from_me.sum()),
+        "first_message": float(conversation.times[0]),
+        "last_message": float(conversation.times[-1]),
+        "reply_latency": {who: summarize_latencies(values) for who, values in latencies.items()},
+        "conversations": {
+            "count": started,
+            "started_by_me": started_by_me,
+            "initiation_ratio": round(started_by_me / started, 3),
+        },
+        "heatmap": activity_heatmap(conversation.times).tolist(),
+    }
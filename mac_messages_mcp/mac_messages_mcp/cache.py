@@ -0,0 +1,60 @@
+"""
+Small thread-safe LRU cache used for decoded bodies and query results.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from . import metrics
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+
+    Lookups are counted in metrics under the cache's name.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+        metrics.record_cache(self.name, hit=value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cache_size_from_env(value: Optional[str], default: int) -> int:
+    """Parse a cache size setting, falling back to default on bad input."""
+    try:
+        return max(0, int(value)) if value is not None else default
+    except ValueError:
+        return default
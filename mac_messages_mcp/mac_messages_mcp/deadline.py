@@ -0,0 +1,241 @@
+"""
+Per-call time budgets and cancellation.
+
+A Deadline is installed in a context variable for the duration of a tool call
+(or HTTP request). Every SQLite query run through a DatabaseSource checks it
+from a progress handler, so a scan is interrupted as soon as the budget runs
+out or the caller goes away. Interrupted queries return the rows read so far
+and mark the deadline as truncated; tools then label their output as partial
+instead of hanging.
+
+The deadline also carries the call's progress reporter. Work done in the
+worker thread (rows read, messages scanned) is counted with report_progress()
+and forwarded to the client as MCP progress notifications, at most every
+PROGRESS_REPORT_INTERVAL seconds, when the client asked for them with a
+progress token. Notification messages can carry partial results.
+
+The default budget is 30 seconds and can be changed with
+MAC_MESSAGES_TOOL_TIMEOUT (seconds, 0 for no limit).
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+
+TOOL_TIMEOUT_ENV = "MAC_MESSAGES_TOOL_TIMEOUT"
+DEFAULT_TOOL_TIMEOUT = 30.0
+TOOL_CONCURRENCY_ENV = "MAC_MESSAGES_TOOL_CONCURRENCY"
+DEFAULT_TOOL_CONCURRENCY = 4
+
+# SQLite VM instructions between deadline checks; ~100µs of work per check
+PROGRESS_INTERVAL = 1000
+# Minimum seconds between progress notifications sent to the client
+PROGRESS_REPORT_INTERVAL = 0.25
+# Progress notifications queued for the client before new ones are dropped
+_PROGRESS_BUFFER = 16
+
+TRUNCATED_NOTICE = (
+    "[Results truncated: {reason} before the query finished. "
+    "Showing partial results; narrow the time window or filter by contact to see everything.]"
+)
+
+_current: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar("deadline", default=None)
+
+# Tools run in a bounded pool of worker threads so one slow read doesn't
+# hold up other clients; contact selections are kept per session.
+_TOOL_LIMITER: Optional[anyio.CapacityLimiter] = None
+
+
+def default_timeout() -> Optional[float]:
+    """The configured per-call budget in seconds, or None for no limit."""
+    try:
+        value = float(os.environ.get(TOOL_TIMEOUT_ENV, DEFAULT_TOOL_TIMEOUT))
+    except ValueError:
+        value = DEFAULT_TOOL_TIMEOUT
+    return value if value > 0 else None
+
+
+def tool_concurrency() -> int:
+    """How many tool calls may run at once (at least 1)."""
+    try:
+        return max(1, int(os.environ.get(TOOL_CONCURRENCY_ENV, DEFAULT_TOOL_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_TOOL_CONCURRENCY
+
+
+class Deadline:
+    """A time budget that can also be cancelled from another thread."""
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        on_progress: Optional[Callable[[float, Optional[str]], None]] = None,
+    ):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self._cancelled = threading.Event()
+        self.truncated = False
+        # Called with (work done so far, message); None when nobody listens
+        self.on_progress = on_progress
+        self._work = 0
+        self._last_report = 0.0
+        self._progress_lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Stop the work at the next check (client cancelled or disconnected)."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def expired(self) -> bool:
+        """True once the budget is spent or the call was cancelled."""
+        if self._cancelled.is_set():
+            return True
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def advance(self, units: int = 1, message: Optional[str] = None, force: bool = False) -> None:
+        """
+        Count units of work done and report progress if enough time has passed.
+
+        Progress is the running total of work units, so it only ever grows
+        even when several phases or sources report into the same call.
+        """
+        if self.on_progress is None:
+            return
+        with self._progress_lock:
+            self._work += units
+            now = time.monotonic()
+            if not force and now - self._last_report < PROGRESS_REPORT_INTERVAL:
+                return
+            self._last_report = now
+            work = self._work
+        self.on_progress(work, message)
+
+    def truncation_notice(self) -> str:
+        reason = "the request was cancelled" if self.cancelled else f"the {self.timeout:g}s time budget ran out"
+        return TRUNCATED_NOTICE.format(reason=reason)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the active call, if any."""
+    return _current.get()
+
+
+def report_progress(units: int = 1, message: Optional[str] = None, force: bool = False) -> None:
+    """Count work for the active call's progress notifications (no-op outside a tool call)."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.advance(units, message, force)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    """Make `deadline` the active deadline for the body."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def mark_truncated(result: Any, deadline: Deadline) -> Any:
+    """Append the truncation notice to a text result if the deadline cut it short."""
+    if deadline.truncated and isinstance(result, str):
+        return f"{result}\n\n{deadline.truncation_notice()}"
+    return result
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _TOOL_LIMITER
+    if _TOOL_LIMITER is None:
+        _TOOL_LIMITER = anyio.CapacityLimiter(tool_concurrency())
+    return _TOOL_LIMITER
+
+
+def _progress_context(args: tuple, kwargs: dict) -> Any:
+    """The MCP Context among a tool's arguments if the client asked for progress."""
+    for value in list(kwargs.values()) + list(args):
+        if not hasattr(value, "report_progress"):
+            continue
+        try:
+            meta = value.request_context.meta
+        except (AttributeError, ValueError, LookupError):
+            return None
+        return value if meta is not None and getattr(meta, "progressToken", None) is not None else None
+    return None
+
+
+def cancellable_tool(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Run a blocking MCP tool in a worker thread under a deadline.
+
+    The event loop stays free to read cancellation notifications from the
+    client; when the request is cancelled the deadline is cancelled too, so
+    the thread's SQLite work stops at the next progress check. Truncated text
+    results get a notice appended. If the client sent a progress token,
+    report_progress() calls in the worker become progress notifications.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        ctx = _progress_context(args, kwargs)
+        deadline = Deadline(default_timeout())
+        context = contextvars.copy_context()
+
+        def call() -> Any:
+            with deadline_scope(deadline):
+                return fn(*args, **kwargs)
+
+        async def run() -> Any:
+            try:
+                return await anyio.to_thread.run_sync(
+                    context.run, call, abandon_on_cancel=True, limiter=_get_limiter()
+                )
+            except anyio.get_cancelled_exc_class():
+                deadline.cancel()
+                raise
+
+        if ctx is None:
+            return mark_truncated(await run(), deadline)
+
+        send, receive = anyio.create_memory_object_stream(_PROGRESS_BUFFER)
+
+        def push(work: float, message: Optional[str]) -> None:
+            # Called from the worker thread; never block it on a slow client
+            try:
+                anyio.from_thread.run_sync(send.send_nowait, (work, message))
+            except (anyio.WouldBlock, anyio.ClosedResourceError, RuntimeError):
+                pass
+
+        async def forward() -> None:
+            async with receive:
+                async for work, message in receive:
+                    try:
+                        await ctx.report_progress(work, None, message)
+                    except Exception:
+                        pass
+
+        deadline.on_progress = push
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(forward)
+            try:
+                result = await run()
+            finally:
+                deadline.on_progress = None
+                send.close()
+        return mark_truncated(result, deadline)
+
+    return wrapper
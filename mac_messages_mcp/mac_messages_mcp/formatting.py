@@ -0,0 +1,156 @@
+"""
+Compact, size-budgeted rendering of message lists for LLM-facing tools.
+
+The default tool output repeats a full timestamp, chat label and sender on
+every line. The compact form prints one header per run of consecutive
+messages from the same sender in the same chat, with a relative timestamp,
+and the bodies beneath it (on the same line for a single message), trimmed
+to a maximum length. Runs are rendered one
+at a time and output stops once the character budget is reached, with a
+footer saying how many messages were left out.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Rough characters per token for English chat text
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_BODY_CHARS = 300
+# Messages further apart than this start a new run even from the same sender
+RUN_GAP_SECONDS = 30 * 60
+# Room kept for the "messages not shown" footer
+_FOOTER_RESERVE = 80
+
+
+def budget_chars(max_tokens: Optional[int] = None, max_chars: Optional[int] = None) -> Optional[int]:
+    """The character budget for a max_tokens and/or max_chars limit (the tighter wins)."""
+    limits = []
+    if max_tokens is not None:
+        limits.append(int(max_tokens) * CHARS_PER_TOKEN)
+    if max_chars is not None:
+        limits.append(int(max_chars))
+    return max(1, min(limits)) if limits else None
+
+
+def relative_time(timestamp: Optional[float], now: datetime) -> str:
+    """Short time relative to now: "just now", "5m ago", "3h ago", "yesterday 14:05", "Mon 09:12", "2024-03-02"."""
+    if timestamp is None:
+        return "unknown time"
+    when = datetime.fromtimestamp(timestamp)
+    now = now.astimezone().replace(tzinfo=None) if now.tzinfo else now
+    seconds = (now - when).total_seconds()
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m ago"
+    days = (now.date() - when.date()).days
+    if days == 0:
+        return f"{int(seconds // 3600)}h ago"
+    if days == 1:
+        return f"yesterday {when:%H:%M}"
+    if days < 7:
+        return f"{when:%a %H:%M}"
+    return f"{when:%Y-%m-%d}"
+
+
+def trim_body(body: str, max_chars: int = DEFAULT_MAX_BODY_CHARS) -> str:
+    """Collapse whitespace and cut a body to max_chars, marking the cut with an ellipsis."""
+    body = " ".join(body.split())
+    if len(body) <= max_chars:
+        return body
+    return body[: max(1, max_chars - 1)].rstrip() + "…"
+
+
+def iter_compact_chunks(
+    messages: Iterable[Dict[str, Any]], now: datetime, max_body_chars: int = DEFAULT_MAX_BODY_CHARS
+) -> Iterator[Tuple[str, int]]:
+    """
+    Render runs of consecutive messages from the same sender and chat.
+
+    Args:
+        messages: Dicts with "time" (Unix seconds or None), "sender", "body"
+                  and optionally "chat" (group chat name), in display order
+        now: Reference time for relative timestamps
+        max_body_chars: Longest body shown before trimming
+
+    Yields:
+        (text, number of messages in it) per run
+    """
+    run: List[Dict[str, Any]] = []
+
+    def render() -> Tuple[str, int]:
+        first = run[0]
+        header = first["sender"]
+        if first.get("chat"):
+            header += f" in {first['chat']}"
+        header += f" · {relative_time(first['time'], now)}:"
+        if len(run) == 1:
+            return f"{header} {trim_body(first['body'], max_body_chars)}", 1
+        lines = [header]
+        lines.extend(f"  {trim_body(m['body'], max_body_chars)}" for m in run)
+        return "\n".join(lines), len(run)
+
+    for message in messages:
+        if run:
+            last = run[-1]
+            same_run = (
+                message["sender"] == last["sender"]
+                and message.get("chat") == last.get("chat")
+                and message["time"] is not None
+                and last["time"] is not None
+                and abs(message["time"] - last["time"]) <= RUN_GAP_SECONDS
+            )
+            if not same_run:
+                yield render()
+                run = []
+        run.append(message)
+    if run:
+        yield render()
+
+
+def _whole_messages(text: str, count: int, length: int) -> int:
+    """How many of a run's messages are complete in its first `length` characters."""
+    if count == 1:
+        return 1 if length >= len(text) else 0
+    # A header line, then one line per message
+    written, end = 0, -1
+    for line in text.split("\n"):
+        end += len(line) + 1
+        if end > length:
+            break
+        written += 1
+    return max(written - 1, 0)
+
+
+def render_compact(
+    messages: List[Dict[str, Any]],
+    now: datetime,
+    max_chars: Optional[int] = None,
+    max_body_chars: int = DEFAULT_MAX_BODY_CHARS,
+) -> str:
+    """
+    Compact rendering of messages, stopping at max_chars.
+
+    Runs are added whole while they fit. If even the first run doesn't fit,
+    it is cut at the budget. A footer reports the messages left out,
+    counting any message the cut went through as left out.
+    """
+    parts: List[str] = []
+    used = 0
+    shown = 0
+    limit = None if max_chars is None else max(max_chars - _FOOTER_RESERVE, 1)
+    for text, count in iter_compact_chunks(messages, now, max_body_chars):
+        cost = len(text) + (1 if parts else 0)
+        if limit is not None and used + cost > limit:
+            if not parts:
+                cut = text[: max(limit - 1, 1)]
+                parts.append(cut.rstrip() + "…")
+                shown += _whole_messages(text, count, len(cut))
+            break
+        parts.append(text)
+        used += cost
+        shown += count
+    output = "\n".join(parts)
+    omitted = len(messages) - shown
+    if omitted > 0:
+        output += f"\n… {omitted} more messages not shown (raise max_tokens or narrow the time window)"
+    return output
@@ -0,0 +1,206 @@
+"""
+Off-thread JSON logging for the MCP server.
+
+Log calls on the request path only put a record on a queue. A QueueListener
+thread formats the records (one JSON object per line by default) and writes
+them to stderr, so a slow terminal or pipe never holds up a tool call.
+
+Tool invocations are logged through log_tool_call(), which truncates long
+arguments (message bodies, contact lists) and can sample busy tools:
+
+    MAC_MESSAGES_LOG_FORMAT=json            json (default) or text
+    MAC_MESSAGES_LOG_SAMPLE=get_recent_messages=0.1,*=1
+                                            fraction of calls logged per tool
+    MAC_MESSAGES_LOG_ARG_CHARS=200          longest argument value logged
+
+Sampling is deterministic: a rate of 0.1 logs every tenth call of that tool.
+Errors and other log records are never sampled.
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+LOG_FORMAT_ENV = "MAC_MESSAGES_LOG_FORMAT"
+LOG_SAMPLE_ENV = "MAC_MESSAGES_LOG_SAMPLE"
+LOG_ARG_CHARS_ENV = "MAC_MESSAGES_LOG_ARG_CHARS"
+DEFAULT_ARG_CHARS = 200
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes that aren't caller-supplied extras
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Running listeners by logger name ("" for the root logger)
+_LISTENERS: Dict[str, logging.handlers.QueueListener] = {}
+_LISTENERS_LOCK = threading.Lock()
+_CALL_COUNTS: Dict[str, Iterator[int]] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with a tool call's arguments appended."""
+
+    def __init__(self) -> None:
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        args = getattr(record, "tool_args", None)
+        if args:
+            text += " (" + " ".join(f"{key}={value!r}" for key, value in args.items()) + ")"
+        return text
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only interpolate the message (cheap, and the args may not survive
+        # the trip); tracebacks are rendered here since exc_info can't be
+        # shared with the listener thread safely
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _sample_rates() -> Dict[str, float]:
+    """Per-tool sample rates from MAC_MESSAGES_LOG_SAMPLE ("tool=rate,...", "*" for the default)."""
+    rates = {"*": 1.0}
+    for item in os.environ.get(LOG_SAMPLE_ENV, "").split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+def _arg_chars() -> int:
+    try:
+        return max(1, int(os.environ.get(LOG_ARG_CHARS_ENV, DEFAULT_ARG_CHARS)))
+    except ValueError:
+        return DEFAULT_ARG_CHARS
+
+
+_SAMPLE_RATES = _sample_rates()
+_ARG_CHARS = _arg_chars()
+
+
+def truncate_value(value: Any, max_chars: int = DEFAULT_ARG_CHARS) -> Any:
+    """A log-safe form of an argument: numbers and short strings as-is, anything else cut to max_chars."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}…(+{len(text) - max_chars} chars)"
+
+
+def should_log_call(tool_name: str) -> bool:
+    """Whether this call of tool_name is in the sample (every 1/rate-th call is)."""
+    rate = _SAMPLE_RATES.get(tool_name, _SAMPLE_RATES["*"])
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    counter = _CALL_COUNTS.get(tool_name)
+    if counter is None:
+        counter = _CALL_COUNTS.setdefault(tool_name, itertools.count(1))
+    n = next(counter)
+    return int(n * rate) > int((n - 1) * rate)
+
+
+def log_tool_call(logger: logging.Logger, tool_name: str, **kwargs: Any) -> None:
+    """
+    Log an MCP tool invocation with truncated arguments, subject to sampling.
+
+    Args:
+        logger: Logger to write to
+        tool_name: Tool name, also the key for MAC_MESSAGES_LOG_SAMPLE
+        **kwargs: The call's arguments; None values are left out
+    """
+    if not logger.isEnabledFor(logging.INFO) or not should_log_call(tool_name):
+        return
+    args = {key: truncate_value(value, _ARG_CHARS) for key, value in kwargs.items() if value is not None}
+    rate = _SAMPLE_RATES.get(tool_name, _SAMPLE_RATES["*"])
+    extra: Dict[str, Any] = {"tool": tool_name, "tool_args": args}
+    if rate < 1.0:
+        extra["sample_rate"] = rate
+    logger.info("[MCP] Tool invoked: %s", tool_name, extra=extra)
+
+
+def stop_logging(logger: Optional[logging.Logger] = None) -> None:
+    """Flush and stop the listener for logger (every listener when None)."""
+    with _LISTENERS_LOCK:
+        names = list(_LISTENERS) if logger is None else [logger.name if logger.parent else ""]
+        listeners = [_LISTENERS.pop(name) for name in names if name in _LISTENERS]
+    for listener in listeners:
+        listener.stop()
+
+
+def configure_logging(
+    level: int = logging.INFO,
+    stream: Optional[TextIO] = None,
+    json_format: Optional[bool] = None,
+    logger: Optional[logging.Logger] = None,
+) -> logging.handlers.QueueListener:
+    """
+    Route logger (the root logger by default) through a queue to a listener thread.
+
+    Replaces the logger's handlers with a QueueHandler; the listener writes
+    to stream (stderr by default) as JSON or, with MAC_MESSAGES_LOG_FORMAT=text,
+    in the classic text format. Calling it again restarts the pipeline.
+
+    Returns:
+        The running QueueListener (stopped automatically at exit)
+    """
+    if json_format is None:
+        json_format = os.environ.get(LOG_FORMAT_ENV, "json").strip().lower() != "text"
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    target = logger if logger is not None else logging.getLogger()
+    stop_logging(target)
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    with _LISTENERS_LOCK:
+        for old in list(target.handlers):
+            target.removeHandler(old)
+        target.addHandler(_QueueHandler(records))
+        target.setLevel(level)
+        _LISTENERS[target.name if target.parent else ""] = listener
+    listener.start()
+    return listener
+
+
+atexit.register(stop_logging)
@@ -1,43 +1,90 @@
 """
 Core functionality for interacting with macOS Messages app
 """
+import base64
+import bisect
 import difflib
-import glob
 import json
+import logging
+import math
 import os
 import re
 import sqlite3
 import subprocess
+import tempfile
+import threading
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from thefuzz import fuzz
 
+from . import metrics, tracing
+from .cache import LRUCache, cache_size_from_env
+from .deadline import current_deadline, report_progress
+from .formatting import budget_chars, render_compact, trim_body
+from .people import Person, PersonIndex
+from .selections import format_selection_prompt, is_selection, resolve_selection, save_selection
+from .snapshot import resolve_read_path, snapshot_enabled
+from .sources import (
+    ADDRESSBOOK_DB_PATHS_ENV,
+    DatabaseSource,
+    apple_date_ns_sql,
+    apple_date_sort_key,
+    apple_date_to_unix,
+    fan_out,
+    get_addressbook_db_paths,
+    get_addressbook_search_pattern,
+    get_addressbook_sources,
+    get_message_sources,
+    get_messages_db_paths,
+    get_source_for_path,
+    merge_by_date,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Set to "fake" to skip osascript entirely (load tests, fixtures, Linux).
+# Every script then reports success without touching Messages.app.
+SEND_TRANSPORT_ENV = "MAC_MESSAGES_SEND_TRANSPORT"
 
 def run_applescript(script: str) -> str:
     """Run an AppleScript and return the result."""
-    proc = subprocess.Popen(['osascript', '-e', script], 
-                            stdout=subprocess.PIPE, 
-                            stderr=subprocess.PIPE)
-    out, err = proc.communicate()
+    if os.environ.get(SEND_TRANSPORT_ENV) == "fake":
+        return "success"
+    with metrics.timer("messages_osascript_seconds"), tracing.span("osascript"):
+        proc = subprocess.Popen(['osascript', '-e', script], 
+                                stdout=subprocess.PIPE, 
+                                stderr=subprocess.PIPE)
+        out, err = proc.communicate()
     if proc.returncode != 0:
         return f"Error: {err.decode('utf-8')}"
     return out.decode('utf-8').strip()
 
-def get_chat_mapping() -> Dict[str, str]:
+# Chat display names per database path: path -> (loaded_at, mapping)
+_CHAT_MAPPING_CACHE: Dict[str, Tuple[float, Dict[str, str]]] = {}
+_CHAT_MAPPING_TTL = 60  # seconds
+
+def get_chat_mapping(source: Optional[DatabaseSource] = None) -> Dict[str, str]:
     """
     Get mapping from room_name to display_name in chat table
     """
-    conn = sqlite3.connect(get_messages_db_path())
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT room_name, display_name FROM chat")
-    result_set = cursor.fetchall()
-
-    mapping = {room_name: display_name for room_name, display_name in result_set}
+    db_path = source.path if source is not None else get_messages_db_path()
+    cached = _CHAT_MAPPING_CACHE.get(db_path)
+    if cached is not None and time.time() - cached[0] <= _CHAT_MAPPING_TTL:
+        metrics.record_cache("chat_mapping", hit=True)
+        return cached[1]
+    metrics.record_cache("chat_mapping", hit=False)
+
+    result_set = query_messages_db(
+        "SELECT room_name, display_name FROM chat", source=source, label="get_chat_mapping"
+    )
+    if result_set and "error" in result_set[0]:
+        return {}
 
-    conn.close()
+    mapping = {row["room_name"]: row["display_name"] for row in result_set}
+    _CHAT_MAPPING_CACHE[db_path] = (time.time(), mapping)
 
     return mapping
 
@@ -62,39 +109,142 @@ def extract_body_from_attributed(attributed_body):
                     decoded = decoded[6:-12]
                     return decoded
     except Exception as e:
-        print(f"Error extracting from attributedBody: {e}")
+        logger.warning("Error extracting from attributedBody: %s", e)
     
     return None
 
+# Decoded attributedBody text by message guid
+_DECODED_BODY_CACHE = LRUCache("decoded_body", 10000)
+_NOT_CACHED = object()
+
+def get_message_body(msg: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the text of a message row, decoding attributedBody when text is empty.
+
+    Decoded bodies are cached by message guid, since the same rows are decoded
+    repeatedly across searches and formatting passes.
+    """
+    if msg.get("text"):
+        return msg["text"]
+    attributed_body = msg.get("attributedBody")
+    if attributed_body is None:
+        return None
+
+    guid = msg.get("guid")
+    if guid is None:
+        return extract_body_from_attributed(attributed_body)
+    body = _DECODED_BODY_CACHE.get(guid, _NOT_CACHED)
+    if body is _NOT_CACHED:
+        body = extract_body_from_attributed(attributed_body)
+        _DECODED_BODY_CACHE.put(guid, body)
+    return body
+
+
+# Metrics label for queries whose call site didn't name them
+UNLABELLED_QUERY = "unlabelled"
+
 
 def get_messages_db_path() -> str:
-    """Get the path to the Messages database."""
-    home_dir = os.path.expanduser("~")
-    return os.path.join(home_dir, "Library/Messages/chat.db")
+    """Get the path to the primary Messages database."""
+    return get_messages_db_paths()[0]
+
+def query_messages_db(
+    query: str,
+    params: tuple = (),
+    snapshot: bool = False,
+    source: Optional[DatabaseSource] = None,
+    label: Optional[str] = None,
+    tuples: bool = False,
+) -> List[Any]:
+    """
+    Query the Messages database and return results as a list of dictionaries.
 
-def query_messages_db(query: str, params: tuple = ()) -> List[Dict[str, Any]]:
-    """Query the Messages database and return results as a list of dictionaries."""
+    Args:
+        query: SQL to execute
+        params: Bound parameters for the query
+        snapshot: Serve the read from a consistent snapshot copy when snapshot
+                  mode is enabled (for long analytics-style scans). Live-tail
+                  reads should leave this off.
+        source: Messages database to query (default: the primary source)
+        label: Name the query is recorded under in metrics and traces; every
+               call site passes its public function's name
+        tuples: Return rows as plain tuples in column order (for bulk column
+                loads). Errors are still reported as a single {"error": ...} row.
+    """
     try:
-        db_path = get_messages_db_path()
+        db_path = source.path if source is not None else get_messages_db_path()
         
         # Check if the database file exists and is accessible
         if not os.path.exists(db_path):
             return [{"error": f"Messages database not found at {db_path}"}]
+
+        if snapshot:
+            db_path = resolve_read_path(db_path)
             
-        # Try to connect to the database
         try:
-            conn = sqlite3.connect(db_path)
+            db = get_source_for_path(db_path)
+            run = db.query_tuples if tuples else db.query
+            if not metrics.enabled() and not tracing.enabled():
+                return run(query, params)
+            label = label or UNLABELLED_QUERY
+            with tracing.span("sqlite.query", query=label, db=db_path) as span:
+                started = time.perf_counter()
+                rows = run(query, params)
+                if span is not None:
+                    span.set(rows=len(rows))
+            metrics.observe("messages_query_latency_seconds", time.perf_counter() - started, query=label)
+            metrics.observe("messages_query_rows", len(rows), metrics.ROW_COUNT_BUCKETS, query=label)
+            return rows
         except sqlite3.OperationalError as e:
+            if "unable to open" not in str(e) and "authoriz" not in str(e):
+                raise
             return [{"error": f"Cannot access Messages database. Please grant Full Disk Access permission to your terminal application in System Preferences > Security & Privacy > Privacy > Full Disk Access. Error: {str(e)} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."}]
-            
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return results
     except Exception as e:
         return [{"error": str(e)}]
+
+def query_messages_sources(
+    build_query: Callable[[DatabaseSource], Optional[Tuple[str, tuple]]],
+    limit: Optional[int] = None,
+    snapshot: bool = False,
+    label: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fan a message query out to every registered Messages database.
+
+    Each source's query must return rows ordered by date descending and include
+    the message guid. Results are merged newest-first through a k-way heap and
+    deduplicated by guid, so overlapping exports count each message once. Every
+    row is tagged with its source under the "_source" key.
+
+    Args:
+        build_query: Returns (query, params) for a source, or None to skip it
+        limit: Maximum number of merged rows to return
+        snapshot: Read from snapshot copies (see query_messages_db)
+        label: Metrics label for the per-source queries
+
+    Returns:
+        Merged rows, or a single error row if no source could be read
+    """
+    def run(source: DatabaseSource) -> List[Dict[str, Any]]:
+        built = build_query(source)
+        if built is None:
+            return []
+        rows = query_messages_db(built[0], built[1], snapshot=snapshot, source=source, label=label)
+        if rows and "error" in rows[0]:
+            return rows
+        for row in rows:
+            row["_source"] = source
+        return rows
+
+    per_source = fan_out(get_message_sources(), run)
+    readable = [rows for rows in per_source if not (rows and "error" in rows[0])]
+    if not readable:
+        errors = [rows for rows in per_source if rows]
+        return errors[0] if errors else []
+    for rows in per_source:
+        if rows and "error" in rows[0]:
+            logger.warning("Skipping unreadable Messages source: %s", rows[0]["error"])
+    return merge_by_date(readable, limit=limit)
     
 def normalize_phone_number(phone: str) -> str:
     """
@@ -158,15 +308,34 @@ def fuzzy_match(query: str, candidates: List[Tuple[str, Any]], threshold: float
     Returns:
         List of (name, value, score) tuples for matches, sorted by score
     """
+    return _fuzzy_match_cleaned(
+        query, [(name, value, clean_name(name).lower()) for name, value in candidates], threshold
+    )
+
+def _fuzzy_match_cleaned(
+    query: str, candidates: List[Tuple[str, Any, str]], threshold: float = 0.6
+) -> List[Tuple[str, Any, float]]:
+    """fuzzy_match over (name, value, cleaned lowercase name) candidates."""
     query = clean_name(query).lower()
     if not query:
         return []
 
     results = []
-
-    for name, value in candidates:
-        clean_candidate = clean_name(name).lower()
-
+    # Names share tokens (first names especially), so compare each once
+    ratios: Dict[str, float] = {}
+
+    def ratio(other: str, floor: float) -> float:
+        # SequenceMatcher.ratio() can't exceed 2 * shorter / total length, so
+        # skip the comparison when it couldn't reach the threshold or beat
+        # the best score so far (neither would change the result)
+        if 2 * min(len(query), len(other)) / (len(query) + len(other)) < floor:
+            return 0.0
+        score = ratios.get(other)
+        if score is None:
+            score = ratios[other] = difflib.SequenceMatcher(None, query, other).ratio()
+        return score
+
+    for name, value, clean_candidate in candidates:
         # Try exact full match first (case insensitive)
         if query == clean_candidate:
             results.append((name, value, 1.0))
@@ -191,12 +360,12 @@ def fuzzy_match(query: str, candidates: List[Tuple[str, Any]], threshold: float
                 best_token_score = max(best_token_score, prefix_score)
             else:
                 # Fuzzy match on individual token
-                token_score = difflib.SequenceMatcher(None, query, token).ratio()
+                token_score = ratio(token, max(threshold, best_token_score))
                 best_token_score = max(best_token_score, token_score)
 
         # Also try matching query against full name for multi-word queries
         if ' ' in query or best_token_score < threshold:
-            full_score = difflib.SequenceMatcher(None, query, clean_candidate).ratio()
+            full_score = ratio(clean_candidate, max(threshold, best_token_score))
             best_token_score = max(best_token_score, full_score)
 
         if best_token_score >= threshold:
@@ -209,30 +378,25 @@ def query_addressbook_db(query: str, params: tuple = ()) -> List[Dict[str, Any]]
     """Query the AddressBook database and return results as a list of dictionaries."""
     try:
         # Find the AddressBook database paths
-        home_dir = os.path.expanduser("~")
-        sources_path = os.path.join(home_dir, "Library/Application Support/AddressBook/Sources/*/AddressBook-v22.abcddb")
-        db_paths = glob.glob(sources_path)
-        
-        if not db_paths:
-            return [{"error": f"AddressBook database not found at {sources_path} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."}]
+        sources = [source for source in get_addressbook_sources() if source.exists()]
         
-        # Try each database path until one works
-        all_results = []
-        for db_path in db_paths:
+        if not sources:
+            return [{"error": f"AddressBook database not found at {get_addressbook_search_pattern()} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."}]
+
+        def run(source: DatabaseSource) -> List[Dict[str, Any]]:
             try:
-                conn = sqlite3.connect(db_path)
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                results = [dict(row) for row in cursor.fetchall()]
-                conn.close()
-                all_results.extend(results)
+                return source.query(query, params)
             except sqlite3.OperationalError as e:
-                # If we can't access this one, try the next database
-                print(f"Warning: Cannot access {db_path}: {str(e)}")
-                continue
+                # If we can't access this one, the other databases still count
+                logger.warning("Cannot access %s: %s", source.path, e)
+                return []
+
+        # Query every database in parallel
+        all_results = []
+        for results in fan_out(sources, run):
+            all_results.extend(results)
         
-        if not all_results and len(db_paths) > 0:
+        if not all_results:
             return [{"error": f"Could not access any AddressBook databases. Please grant Full Disk Access permission. PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."}]
             
         return all_results
@@ -277,13 +441,13 @@ def get_addressbook_contacts() -> Dict[str, str]:
         results = query_addressbook_db(query)
         
         if results and "error" in results[0]:
-            print(f"Error getting AddressBook contacts: {results[0]['error']}")
+            logger.error("Error getting AddressBook contacts: %s", results[0]["error"])
             # Fall back to subprocess method if direct DB access fails
             return get_addressbook_contacts_subprocess()
         
         return process_contacts(results)
     except Exception as e:
-        print(f"Error getting AddressBook contacts: {str(e)}")
+        logger.error("Error getting AddressBook contacts: %s", e)
         return {}
 
 def process_contacts(contacts) -> Dict[str, str]:
@@ -331,7 +495,7 @@ def process_contacts(contacts) -> Dict[str, str]:
                 name_to_numbers[full_name].append(normalized_phone)
         except Exception as e:
             # Skip individual entries that fail to process
-            print(f"Error processing contact: {str(e)}")
+            logger.warning("Error processing contact: %s", e)
             continue
 
     # Store the reverse lookup in a global variable for later use
@@ -403,7 +567,7 @@ def get_addressbook_contacts_subprocess() -> Dict[str, str]:
                     # Skip individual lines that fail to parse
                     continue
     except Exception as e:
-        print(f"Error getting AddressBook contacts via subprocess: {str(e)} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE.")
+        logger.error(f"Error getting AddressBook contacts via subprocess: {str(e)} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE.")
     
     return contacts_map
 
@@ -417,11 +581,34 @@ def get_cached_contacts() -> Dict[str, str]:
     
     current_time = time.time()
     if _CONTACTS_CACHE is None or (current_time - _LAST_CACHE_UPDATE) > _CACHE_TTL:
+        metrics.record_cache("contacts", hit=False)
         _CONTACTS_CACHE = get_addressbook_contacts()
         _LAST_CACHE_UPDATE = current_time
+    else:
+        metrics.record_cache("contacts", hit=True)
     
     return _CONTACTS_CACHE
 
+def reset_caches() -> None:
+    """Forget every cached contact, index, directory and result (the next call reloads from disk)."""
+    global _CONTACTS_CACHE, _LAST_CACHE_UPDATE, _NAME_CANDIDATES, _PEOPLE_RECORDS
+    _CONTACTS_CACHE = None
+    _LAST_CACHE_UPDATE = 0
+    _NAME_CANDIDATES = None
+    _PEOPLE_RECORDS = None
+    _CHAT_MAPPING_CACHE.clear()
+    with _ACTIVITY_LOCK:
+        _ACTIVITY_STATE.clear()
+    for cache in (
+        _DECODED_BODY_CACHE,
+        _ACTIVITY_CACHE,
+        _PERSON_INDEX_CACHE,
+        _RESULT_CACHE,
+        _CHAT_DIRECTORY_CACHE,
+        _CHAT_ATTACHMENTS_CACHE,
+    ):
+        cache.clear()
+
 def find_contact_by_name(name: str) -> List[Dict[str, Any]]:
     """
     Find contacts by name or nickname using fuzzy matching.
@@ -437,22 +624,37 @@ def find_contact_by_name(name: str) -> List[Dict[str, Any]]:
         List of matching contacts (may be multiple if ambiguous)
     """
     contacts = get_cached_contacts()
-    global _PHONE_TO_DETAILS_MAP
+    return _match_contact_name(name, contacts, _contact_name_candidates(contacts))
+
+# (contacts map, candidates) so repeated lookups don't re-clean every name
+_NAME_CANDIDATES: Optional[Tuple[Dict[str, str], List[Tuple[str, str, str]]]] = None
+
+def _contact_name_candidates(contacts: Dict[str, str]) -> List[Tuple[str, str, str]]:
+    """Searchable (name, phone, cleaned name) entries for full names and nicknames."""
+    global _NAME_CANDIDATES
+    if _NAME_CANDIDATES is not None and _NAME_CANDIDATES[0] is contacts:
+        return _NAME_CANDIDATES[1]
 
-    # Build candidates: search both full name and nickname
     candidates = []
     for phone, contact_name in contacts.items():
         # Add full name as searchable
-        candidates.append((contact_name, phone))
+        candidates.append((contact_name, phone, clean_name(contact_name).lower()))
 
         # Add nickname as searchable (if exists)
         details = _PHONE_TO_DETAILS_MAP.get(phone, {})
         nickname = details.get("nickname", "")
         if nickname:
-            candidates.append((nickname, phone))
+            candidates.append((nickname, phone, clean_name(nickname).lower()))
+
+    _NAME_CANDIDATES = (contacts, candidates)
+    return candidates
 
+def _match_contact_name(
+    name: str, contacts: Dict[str, str], candidates: List[Tuple[str, str, str]]
+) -> List[Dict[str, Any]]:
+    """Fuzzy-match a name against prepared candidates, deduplicated and ranked."""
     # Perform fuzzy matching
-    matches = fuzzy_match(name, candidates)
+    matches = _fuzzy_match_cleaned(name, candidates)
 
     # Deduplicate by phone number, keeping highest score for each
     seen_phones = {}
@@ -467,8 +669,352 @@ def find_contact_by_name(name: str) -> List[Dict[str, Any]]:
                 "matched_on": matched_name  # What actually matched (name or nickname)
             }
 
-    # Convert to sorted list
-    results = sorted(seen_phones.values(), key=lambda x: x["score"], reverse=True)
+    # Rank by name match first, then by how much and how recently you talk
+    return rank_contacts(list(seen_phones.values()))
+
+AUTO_SELECT_ENV = "MAC_MESSAGES_AUTO_SELECT"
+
+# How much interaction history can lift a candidate above a better name match
+ACTIVITY_WEIGHT = 0.3
+# Recency score halves for every this many days since the last message
+ACTIVITY_HALF_LIFE_DAYS = 30
+# A candidate is auto-selected when it leads the runner-up by this much...
+AUTO_SELECT_MARGIN = 0.15
+# ...and its name matches within this much of the best name match
+AUTO_SELECT_NAME_TOLERANCE = 0.05
+
+# Per-handle message counts per source, advanced from the last ROWID read
+_ACTIVITY_STATE: Dict[str, Dict[str, Any]] = {}
+_ACTIVITY_LOCK = threading.Lock()
+# Merged activity across sources, keyed by every source's watermark
+_ACTIVITY_CACHE = LRUCache("handle_activity", 4)
+
+_ACTIVITY_QUERY = """
+SELECT h.id AS handle, COUNT(*) AS messages, MAX(m.date) AS last_date
+FROM message m
+JOIN handle h ON m.handle_id = h.ROWID
+WHERE m.ROWID > ? AND m.ROWID <= ?
+GROUP BY h.id
+"""
+
+def _update_handle_activity(source: DatabaseSource) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """
+    Bring one source's per-handle counts up to its current max ROWID.
+
+    Only rows added since the last call are aggregated (a ROWID range on the
+    primary key), so a new message costs one small query instead of a
+    GROUP BY over the whole history. Reads the live database, whose max
+    ROWID bounds the range, so the counts always match the watermark.
+
+    Returns:
+        (watermark, {handle key: {"messages", "last_message"}})
+    """
+    state = _ACTIVITY_STATE.setdefault(source.path, {"watermark": 0, "activity": {}})
+    max_rowid = source.data_version()[1] or 0
+    if max_rowid < state["watermark"]:
+        # A different (or restored) database: start over
+        state["watermark"], state["activity"] = 0, {}
+    if max_rowid == state["watermark"]:
+        return state["watermark"], state["activity"]
+
+    rows = query_messages_db(
+        _ACTIVITY_QUERY, (state["watermark"], max_rowid), source=source, label="get_handle_activity"
+    )
+    deadline = current_deadline()
+    if (rows and "error" in rows[0]) or (deadline is not None and deadline.truncated):
+        # Keep the last complete aggregate rather than half a range
+        return state["watermark"], state["activity"]
+
+    activity = state["activity"]
+    for row in rows:
+        handle = row["handle"] or ""
+        key = handle.lower() if "@" in handle else normalize_phone_number(handle)
+        if not key:
+            continue
+        entry = activity.setdefault(key, {"messages": 0, "last_message": 0.0})
+        entry["messages"] += row["messages"]
+        if row["last_date"]:
+            entry["last_message"] = max(entry["last_message"], apple_date_to_unix(row["last_date"]))
+    state["watermark"] = max_rowid
+    return max_rowid, activity
+
+
+def get_handle_activity() -> Dict[str, Dict[str, Any]]:
+    """
+    Message count and last message time per handle, across every source.
+
+    Handles are keyed by normalized phone number (or lowercased email), so the
+    SMS and iMessage handles for one number are counted together. Each
+    source's aggregate is updated incrementally from the last ROWID it
+    covered (deleted messages stay counted until the process restarts).
+
+    Returns:
+        Dict mapping handle key to {"messages": int, "last_message": unix seconds}
+    """
+    with _ACTIVITY_LOCK:
+        per_source = []
+        for source in get_message_sources():
+            try:
+                per_source.append((source.path,) + _update_handle_activity(source))
+            except sqlite3.Error as e:
+                logger.warning("Could not read message activity from %s: %s", source.path, e)
+        key = tuple((path, watermark) for path, watermark, _ in per_source)
+        cached = _ACTIVITY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for _, _, activity in per_source:
+            for handle, entry in activity.items():
+                total = merged.setdefault(handle, {"messages": 0, "last_message": 0.0})
+                total["messages"] += entry["messages"]
+                total["last_message"] = max(total["last_message"], entry["last_message"])
+        _ACTIVITY_CACHE.put(key, merged)
+        return merged
+
+def _activity_for_phone(phone: str, activity: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Combined activity for a contact number, with and without a US country code."""
+    variants = {phone}
+    if len(phone) == 10:
+        variants.add("1" + phone)
+    elif len(phone) == 11 and phone.startswith("1"):
+        variants.add(phone[1:])
+    messages, last_message = 0, 0.0
+    for variant in variants:
+        entry = activity.get(variant)
+        if entry:
+            messages += entry["messages"]
+            last_message = max(last_message, entry["last_message"])
+    return {"messages": messages, "last_message": last_message}
+
+def rank_contacts(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Order name matches by name score plus interaction history.
+
+    Each match gains "messages", "last_message" (Unix seconds, 0 if never)
+    and "rank". Volume is scored relative to the busiest candidate; recency
+    decays with a ACTIVITY_HALF_LIFE_DAYS half-life.
+
+    Args:
+        matches: Contacts with "phone" and "score" keys
+
+    Returns:
+        The matches sorted by rank, highest first
+    """
+    if len(matches) > 1:
+        try:
+            activity = get_handle_activity()
+        except Exception as e:
+            logger.warning("Could not read message activity for ranking: %s", e)
+            activity = {}
+    else:
+        activity = {}
+
+    now = time.time()
+    for match in matches:
+        match.update(_activity_for_phone(match["phone"], activity))
+    busiest = max((m["messages"] for m in matches), default=0)
+    for match in matches:
+        volume = math.log1p(match["messages"]) / math.log1p(busiest) if busiest else 0.0
+        if match["last_message"]:
+            days = max(0.0, now - match["last_message"]) / 86400
+            recency = 0.5 ** (days / ACTIVITY_HALF_LIFE_DAYS)
+        else:
+            recency = 0.0
+        match["rank"] = match["score"] + ACTIVITY_WEIGHT * (volume + recency) / 2
+    return sorted(matches, key=lambda m: (m["rank"], m["score"]), reverse=True)
+
+def auto_select_enabled() -> bool:
+    return os.environ.get(AUTO_SELECT_ENV, "true").strip().lower() not in ("0", "false", "no", "off")
+
+def pick_dominant_contact(matches: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    The one candidate that clearly dominates a ranked match list, if any.
+
+    The top match wins when its name match is (nearly) as good as the best
+    one and its rank leads the runner-up by AUTO_SELECT_MARGIN, e.g. the
+    "Sam" you text every day over a "Sam" from years ago.
+
+    Args:
+        matches: Output of find_contact_by_name / rank_contacts
+
+    Returns:
+        The selected contact, or None if the user has to choose
+    """
+    if len(matches) == 1:
+        return matches[0]
+    if not matches or not auto_select_enabled():
+        return None
+    top, runner_up = matches[0], matches[1]
+    best_score = max(m["score"] for m in matches)
+    if top["score"] < best_score - AUTO_SELECT_NAME_TOLERANCE:
+        return None
+    if top.get("rank", top["score"]) - runner_up.get("rank", runner_up["score"]) < AUTO_SELECT_MARGIN:
+        return None
+    return top
+
+# Every phone number and email per AddressBook record, for the person index
+_PEOPLE_QUERY = """
+SELECT
+    r.Z_PK AS record_id, r.ZFIRSTNAME AS first_name, r.ZLASTNAME AS last_name,
+    r.ZNICKNAME AS nickname, 'phone' AS kind, p.ZFULLNUMBER AS address,
+    p.ZORDERINGINDEX AS ordering
+FROM ZABCDRECORD r
+JOIN ZABCDPHONENUMBER p ON p.ZOWNER = r.Z_PK
+WHERE p.ZFULLNUMBER IS NOT NULL
+UNION ALL
+SELECT
+    r.Z_PK, r.ZFIRSTNAME, r.ZLASTNAME, r.ZNICKNAME, 'email',
+    COALESCE(e.ZADDRESSNORMALIZED, e.ZADDRESS), e.ZORDERINGINDEX
+FROM ZABCDRECORD r
+JOIN ZABCDEMAILADDRESS e ON e.ZOWNER = r.Z_PK
+WHERE e.ZADDRESS IS NOT NULL
+ORDER BY record_id, kind DESC, ordering
+"""
+
+# (AddressBook paths, load time, rows); refreshed like the contacts cache
+_PEOPLE_RECORDS: Optional[Tuple[Tuple[str, ...], float, List[Dict[str, Any]]]] = None
+# Built indexes keyed by (AddressBook load time, Messages database versions)
+_PERSON_INDEX_CACHE = LRUCache("person_index", 2)
+
+def _get_addressbook_people() -> Tuple[float, List[Dict[str, Any]]]:
+    """AddressBook phone and email rows, cached for _CACHE_TTL seconds."""
+    global _PEOPLE_RECORDS
+    paths = tuple(get_addressbook_db_paths())
+    now = time.time()
+    if _PEOPLE_RECORDS is not None:
+        cached_paths, loaded_at, rows = _PEOPLE_RECORDS
+        if cached_paths == paths and now - loaded_at <= _CACHE_TTL:
+            return loaded_at, rows
+    rows = query_addressbook_db(_PEOPLE_QUERY)
+    if rows and "error" in rows[0]:
+        logger.warning("Could not read AddressBook for the person index: %s", rows[0]["error"])
+        rows = []
+    _PEOPLE_RECORDS = (paths, now, rows)
+    return now, rows
+
+def get_person_index() -> PersonIndex:
+    """
+    Index of AddressBook people linked to their handles in every Messages database.
+
+    Rebuilt when the AddressBook cache refreshes or any Messages database
+    changes (new handles appear when a conversation starts).
+    """
+    loaded_at, records = _get_addressbook_people()
+    version = _messages_data_version()
+    key = (loaded_at, version)
+    if version is not None:
+        cached = _PERSON_INDEX_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    index = PersonIndex(records)
+    sources = get_message_sources()
+    handle_rows = fan_out(sources, lambda source: query_messages_db(
+        "SELECT ROWID, id FROM handle", source=source, label="get_person_index"
+    ))
+    for source, rows in zip(sources, handle_rows):
+        if rows and "error" in rows[0]:
+            continue
+        index.add_handles(source.path, rows)
+
+    deadline = current_deadline()
+    # A handle scan cut short by the time budget would hide handles until the next change
+    if version is not None and not (deadline is not None and deadline.truncated):
+        index.version = key
+        _PERSON_INDEX_CACHE.put(key, index)
+    return index
+
+def _person_index_or_empty() -> PersonIndex:
+    """get_person_index(), or an empty index (with a warning) when it can't be built."""
+    try:
+        return get_person_index()
+    except Exception as e:
+        logger.warning("Person index unavailable: %s", e)
+        return PersonIndex()
+
+def find_person(address: str, index: Optional[PersonIndex] = None) -> Optional[Person]:
+    """The AddressBook person a phone number or email belongs to, if any."""
+    return (index if index is not None else _person_index_or_empty()).find(address)
+
+MAX_RESOLVE_BATCH = 1000
+
+def _is_address(value: str) -> bool:
+    """True for phone numbers and email addresses, False for names."""
+    return "@" in value or all(c.isdigit() or c in '+- ().' for c in value)
+
+def resolve_contacts(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Resolve many names, phone numbers and emails in one pass.
+
+    The contacts map, name candidates, activity aggregate and person index
+    are loaded once and every query is answered from memory; repeated queries
+    are resolved once.
+
+    Args:
+        queries: Names, phone numbers (any format) or email addresses
+
+    Returns:
+        One dict per query, in order, with:
+            query: the input
+            status: "resolved" (one person), "ambiguous" (several name
+                    matches, see candidates), "handle_only" (an address with
+                    message history but no AddressBook entry) or "not_found"
+            person: id, name, nickname, phones, emails and handle_ids
+                    (Messages database path -> handle ROWIDs), or None
+            candidates: up to 5 ranked name matches when ambiguous
+    """
+    index = _person_index_or_empty()
+    contacts = get_cached_contacts()
+    candidates = _contact_name_candidates(contacts)
+
+    def resolve(query: str) -> Dict[str, Any]:
+        if not query:
+            return {"status": "not_found", "person": None, "candidates": []}
+
+        if _is_address(query):
+            person = index.find(query)
+            if person is not None:
+                return {"status": "resolved", "person": person.to_dict(), "candidates": []}
+            handle_ids = index.handles_for(query)
+            if handle_ids:
+                return {
+                    "status": "handle_only",
+                    "person": {"id": None, "name": None, "nickname": "", "phones": [], "emails": [],
+                               "handle_ids": handle_ids},
+                    "candidates": [],
+                }
+            return {"status": "not_found", "person": None, "candidates": []}
+
+        matches = _match_contact_name(query, contacts, candidates)
+        if not matches:
+            return {"status": "not_found", "person": None, "candidates": []}
+        selected = pick_dominant_contact(matches)
+        if selected is None:
+            return {
+                "status": "ambiguous",
+                "person": None,
+                "candidates": [
+                    {key: m.get(key) for key in ("name", "phone", "score", "messages")}
+                    for m in matches[:5]
+                ],
+            }
+        person = index.find(selected["phone"])
+        if person is None:
+            person_dict = {"id": None, "name": selected["name"], "nickname": "",
+                           "phones": [selected["phone"]], "emails": [],
+                           "handle_ids": index.handles_for(selected["phone"])}
+        else:
+            person_dict = person.to_dict()
+        return {"status": "resolved", "person": person_dict, "candidates": []}
+
+    resolved: Dict[str, Dict[str, Any]] = {}
+    results = []
+    for query in queries:
+        query = str(query).strip()
+        if query not in resolved:
+            resolved[query] = resolve(query)
+        results.append(dict(resolved[query], query=query))
     return results
 
 def send_message(recipient: str, message: str, group_chat: bool = False) -> str:
@@ -493,24 +1039,12 @@ def send_message(recipient: str, message: str, group_chat: bool = False) -> str:
         # Use the recipient directly as the chat ID
         return _send_message_to_recipient(recipient, message, group_chat=True)
     
-    # Handle contact selection format (contact:N)
-    if recipient.lower().startswith("contact:"):
-        try:
-            # Get the selected index (1-based)
-            index = int(recipient.split(":", 1)[1].strip()) - 1
-            
-            # Get the most recent contact matches from global cache
-            if not hasattr(send_message, "recent_matches") or not send_message.recent_matches:
-                return "No recent contact matches available. Please search for a contact first."
-            
-            if index < 0 or index >= len(send_message.recent_matches):
-                return f"Invalid selection. Please choose a number between 1 and {len(send_message.recent_matches)}."
-            
-            # Get the selected contact
-            contact = send_message.recent_matches[index]
-            return _send_message_to_recipient(contact['phone'], message, contact['name'], group_chat=False)
-        except (ValueError, IndexError) as e:
-            return f"Error selecting contact: {str(e)}"
+    # Handle contact selection format (contact:N or <token>:N)
+    if is_selection(recipient):
+        contact = resolve_selection(recipient)
+        if isinstance(contact, str):
+            return contact
+        return _send_message_to_recipient(contact['phone'], message, contact['name'], group_chat=False)
     
     # Check if recipient is directly a phone number
     if all(c.isdigit() or c in '+- ()' for c in recipient):
@@ -528,20 +1062,14 @@ def send_message(recipient: str, message: str, group_chat: bool = False) -> str:
     if not contacts:
         return f"Error: Could not find any contact matching '{recipient}'"
     
+    # A send can't be undone, so never guess between several matches (no
+    # activity-based auto-selection here, unlike the read tools)
     if len(contacts) == 1:
-        # Single match, use it
         contact = contacts[0]
         return _send_message_to_recipient(contact['phone'], message, contact['name'], group_chat=False)
-    else:
-        # Store the matches for later selection
-        send_message.recent_matches = contacts
-        
-        # Multiple matches, return them all
-        contact_list = "\n".join([f"{i+1}. {c['name']} ({c['phone']})" for i, c in enumerate(contacts[:10])])
-        return f"Multiple contacts found matching '{recipient}'. Please specify which one using 'contact:N' where N is the number:\n{contact_list}"
-
-# Initialize the static variable for recent matches
-send_message.recent_matches = []
+    # Store the ranked matches in this session for a later contact:N selection
+    token = save_selection(contacts)
+    return format_selection_prompt(recipient, contacts, token)
 
 def _send_message_to_recipient(recipient: str, message: str, contact_name: str = None, group_chat: bool = False) -> str:
     """
@@ -557,10 +1085,11 @@ def _send_message_to_recipient(recipient: str, message: str, contact_name: str =
         Success or error message
     """
     try:
-        # Create a temporary file with the message content
-        file_path = os.path.abspath('imessage_tmp.txt')
+        # Create a temporary file with the message content (one per call, so
+        # concurrent sends can't overwrite each other's text)
+        fd, file_path = tempfile.mkstemp(prefix='imessage_', suffix='.txt')
         
-        with open(file_path, 'w') as f:
+        with os.fdopen(fd, 'w') as f:
             f.write(message)
         
         # Adjust the AppleScript command based on whether this is a group chat
@@ -590,9 +1119,57 @@ def _send_message_to_recipient(recipient: str, message: str, contact_name: str =
         # Try fallback method
         return _send_message_direct(recipient, message, contact_name, group_chat)
 
-def get_contact_name(handle_id: int) -> str:
+def _find_handle_ids(contact: str, source: Optional[DatabaseSource] = None) -> Optional[List[int]]:
+    """
+    Find the handle ROWIDs for a phone number or email address.
+
+    Args:
+        contact: Phone number (any format) or email address
+        source: Messages database to search (default: primary)
+
+    Returns:
+        List of handle ROWIDs, or None if there are none
+    """
+    if '@' in contact:
+        # This is an email
+        query = "SELECT ROWID FROM handle WHERE id = ?"
+        results = query_messages_db(query, (contact,), source=source, label="find_handle_ids")
+        if results and "error" not in results[0]:
+            return [row["ROWID"] for row in results]
+        return None
+    # This is a phone number - try various formats (returns all handles for multi-protocol)
+    return find_handles_by_phone(contact, source)
+
+def _contact_handle_ids(contact: str, source: Optional[DatabaseSource] = None) -> Optional[List[int]]:
+    """
+    Handle ROWIDs for a phone number or email plus every other address of the
+    same person (their other numbers and iMessage emails).
+
+    Args:
+        contact: Phone number (any format) or email address
+        source: Messages database to search (default: primary)
+
+    Returns:
+        List of handle ROWIDs, or None if there are none
+    """
+    handle_ids = list(_find_handle_ids(contact, source) or [])
+    person = find_person(contact)
+    if person is not None:
+        path = source.path if source is not None else get_messages_db_path()
+        handle_ids.extend(h for h in person.handle_ids.get(path, []) if h not in handle_ids)
+    return handle_ids or None
+
+def get_contact_name(
+    handle_id: int, source: Optional[DatabaseSource] = None, index: Optional[PersonIndex] = None
+) -> str:
     """
     Get contact name from handle_id with improved contact lookup.
+
+    Args:
+        handle_id: handle.ROWID of the sender
+        source: Messages database the handle_id belongs to (default: primary)
+        index: Person index to resolve through, so callers formatting many
+               rows look it up once (default: the current index)
     """
     if handle_id is None:
         return "Unknown"
@@ -601,7 +1178,7 @@ def get_contact_name(handle_id: int) -> str:
     handle_query = """
     SELECT id FROM handle WHERE ROWID = ?
     """
-    handles = query_messages_db(handle_query, (handle_id,))
+    handles = query_messages_db(handle_query, (handle_id,), source=source, label="get_contact_name")
     
     if not handles or "error" in handles[0]:
         return "Unknown"
@@ -626,6 +1203,11 @@ def get_contact_name(handle_id: int) -> str:
         if '1' + normalized_handle in contacts:
             return contacts['1' + normalized_handle]
     
+    # Email handles (and numbers in other formats) through the person index
+    person = find_person(handle_id_value, index)
+    if person is not None:
+        return person.name
+    
     # If no match found in AddressBook, fall back to display name from chat
     contact_query = """
     SELECT 
@@ -641,7 +1223,7 @@ def get_contact_name(handle_id: int) -> str:
     LIMIT 1
     """
     
-    contacts = query_messages_db(contact_query, (handle_id_value,))
+    contacts = query_messages_db(contact_query, (handle_id_value,), source=source, label="get_contact_name")
     
     if contacts and len(contacts) > 0 and "display_name" in contacts[0] and contacts[0]["display_name"]:
         return contacts[0]["display_name"]
@@ -649,18 +1231,156 @@ def get_contact_name(handle_id: int) -> str:
     # If no contact name found, return the phone number or email
     return handle_id_value
 
-def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
+RESULT_CACHE_SIZE_ENV = "MAC_MESSAGES_RESULT_CACHE_SIZE"
+
+# Formatted message windows keyed by (hours, contact, minute, database versions)
+_RESULT_CACHE = LRUCache(
+    "recent_messages", cache_size_from_env(os.environ.get(RESULT_CACHE_SIZE_ENV), 128)
+)
+
+def _messages_data_version() -> Optional[Tuple[Any, ...]]:
+    """Version stamp of every Messages source, or None if one can't be read."""
+    try:
+        return tuple((source.path,) + source.data_version() for source in get_message_sources())
+    except sqlite3.Error:
+        return None
+
+# Tapback reactions are message rows pointing at their parent through
+# associated_message_guid ("p:<part>/<guid>" or "bp:<guid>"). 2000-2005 add a
+# reaction, 3000-3005 remove it; 2006 is a custom emoji reaction.
+TAPBACK_ADDED = range(2000, 3000)
+TAPBACK_REMOVED = range(3000, 4000)
+TAPBACK_EMOJI = {0: "❤️", 1: "👍", 2: "👎", 3: "😂", 4: "‼️", 5: "❓"}
+_REACTION_FILTER = "COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999"
+# Every reaction to a row of `page`, oldest first, encoded as
+# "type:is_from_me:handle" joined by \x1f. Probes the associated_message_guid
+# index once per prefix instead of scanning the window for reactions.
+_REACTIONS_SUBQUERY = """
+(SELECT group_concat(r.associated_message_type || ':' || r.is_from_me || ':' || COALESCE(r.handle, ''), char(31))
+ FROM (
+     SELECT r.associated_message_type, r.is_from_me, h.id AS handle
+     FROM message r
+     LEFT JOIN handle h ON h.ROWID = r.handle_id
+     WHERE r.associated_message_guid IN (
+         'p:0/' || page.guid, 'p:1/' || page.guid, 'p:2/' || page.guid, 'bp:' || page.guid
+     )
+     ORDER BY r.ROWID
+ ) r) AS reactions
+"""
+
+
+def fold_reactions(encoded: Optional[str]) -> List[Tuple[str, List[str]]]:
+    """
+    Net reactions on one message from the encoded reactions column.
+
+    Each sender keeps only their latest reaction, and a removal cancels it,
+    as in the Messages app.
+
+    Returns:
+        (emoji, [sender addresses, "" for you]) pairs in first-reacted order
+    """
+    if not encoded:
+        return []
+    by_sender: Dict[str, int] = {}
+    for entry in encoded.split("\x1f"):
+        kind, from_me, handle = entry.split(":", 2)
+        sender = "" if from_me == "1" else handle
+        kind = int(kind)
+        if kind in TAPBACK_ADDED:
+            by_sender.pop(sender, None)
+            by_sender[sender] = kind - 2000
+        elif kind in TAPBACK_REMOVED and by_sender.get(sender) == kind - 3000:
+            del by_sender[sender]
+
+    grouped: Dict[str, List[str]] = {}
+    for sender, kind in by_sender.items():
+        grouped.setdefault(TAPBACK_EMOJI.get(kind, "➕"), []).append(sender)
+    return list(grouped.items())
+
+
+def _name_reactions(
+    reactions: List[Tuple[str, List[str]]], contacts: Dict[str, str], index: PersonIndex
+) -> List[Dict[str, Any]]:
+    """Folded reactions with display names, e.g. [{"emoji": "❤️", "senders": ["You", "Ana"]}]."""
+    return [
+        {
+            "emoji": emoji,
+            "senders": [_address_display_name(sender, contacts, index) if sender else "You" for sender in senders],
+        }
+        for emoji, senders in reactions
+    ]
+
+def format_reactions(reactions: List[Dict[str, Any]]) -> str:
+    """Compact annotation such as "[❤️ You, Ana · 😂 Ben]"."""
+    parts = [f"{r['emoji']} {', '.join(r['senders'])}" for r in reactions]
+    return f"[{' · '.join(parts)}]"
+
+
+def get_recent_messages(
+    hours: int = 24,
+    contact: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    max_chars: Optional[int] = None,
+) -> str:
     """
     Get recent messages from the Messages app using attributedBody for content.
     
+    Results are cached per (hours, contact) for the current minute and the
+    current version of every Messages database, so repeated calls are served
+    from memory until a new message arrives or the minute rolls over. The
+    window start is rounded down to the minute, so it may include up to a
+    minute of older messages.
+    
+    Tapback reactions are not listed as messages of their own: they are
+    folded into the message they react to as an annotation such as
+    "[❤️ You, Ana]". Reactions to messages outside the window are omitted.
+    
+    With max_tokens or max_chars the compact format is used instead (see
+    formatting.py): consecutive messages from the same sender and chat are
+    grouped under one header with a relative time, long bodies are trimmed,
+    and output stops at the budget.
+    
     Args:
         hours: Number of hours to look back (default: 24)
         contact: Filter by contact name, phone number, or email (optional)
                 Use "contact:N" to select a specific contact from previous matches
+        max_tokens: Approximate token budget for the output (optional)
+        max_chars: Character budget for the output (optional)
     
     Returns:
         Formatted string with recent messages
     """
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    normalized_contact = str(contact).strip().lower() if contact is not None else None
+    budget = budget_chars(max_tokens, max_chars)
+    # contact:N depends on the session's previous lookup, so it's never served from cache
+    if _RESULT_CACHE.maxsize <= 0 or (normalized_contact is not None and is_selection(normalized_contact)):
+        return _get_recent_messages(hours, contact, now, budget)
+
+    version = _messages_data_version()
+    if version is None:
+        return _get_recent_messages(hours, contact, now, budget)
+    key = (hours, normalized_contact or None, now, version, budget)
+    cached = _RESULT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    result = _get_recent_messages(hours, contact, now, budget)
+    deadline = current_deadline()
+    # Errors, partial results and "pick a contact" prompts (which save a
+    # selection in the caller's session) must be recomputed every time
+    if not (
+        result.startswith(("Error", "Multiple contacts"))
+        or (deadline is not None and deadline.truncated)
+    ):
+        _RESULT_CACHE.put(key, result)
+    return result
+
+def _get_recent_messages(hours: int, contact: Optional[str], now: datetime, budget: Optional[int] = None) -> str:
+    """
+    Uncached implementation of get_recent_messages for a window ending at now,
+    in the compact format when budget (characters) is set.
+    """
     # Input validation
     if hours < 0:
         return "Error: Hours cannot be negative. Please provide a positive number."
@@ -670,42 +1390,21 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
     if hours > MAX_HOURS:
         return f"Error: Hours value too large. Maximum allowed is {MAX_HOURS} hours (10 years)."
     
-    handle_ids = None
+    handle_ids_by_source = None
+    sources = get_message_sources()
+    auto_selected_note = None
     
     # If contact is specified, try to resolve it
     if contact:
         # Convert to string to ensure phone numbers work properly
         contact = str(contact).strip()
         
-        # Handle contact selection format (contact:N)
-        if contact.lower().startswith("contact:"):
-            try:
-                # Extract the number after the colon
-                contact_parts = contact.split(":", 1)
-                if len(contact_parts) < 2 or not contact_parts[1].strip():
-                    return "Error: Invalid contact selection format. Use 'contact:N' where N is a positive number."
-                
-                # Get the selected index (1-based)
-                try:
-                    index = int(contact_parts[1].strip()) - 1
-                except ValueError:
-                    return "Error: Contact selection must be a number. Use 'contact:N' where N is a positive number."
-                
-                # Validate index is not negative
-                if index < 0:
-                    return "Error: Contact selection must be a positive number (starting from 1)."
-                
-                # Get the most recent contact matches from global cache
-                if not hasattr(get_recent_messages, "recent_matches") or not get_recent_messages.recent_matches:
-                    return "No recent contact matches available. Please search for a contact first."
-                
-                if index >= len(get_recent_messages.recent_matches):
-                    return f"Invalid selection. Please choose a number between 1 and {len(get_recent_messages.recent_matches)}."
-                
-                # Get the selected contact's phone number
-                contact = get_recent_messages.recent_matches[index]['phone']
-            except Exception as e:
-                return f"Error processing contact selection: {str(e)}"
+        # Handle contact selection format (contact:N or <token>:N)
+        if is_selection(contact):
+            selected = resolve_selection(contact)
+            if isinstance(selected, str):
+                return selected
+            contact = selected['phone']
         
         # Check if contact might be a name rather than a phone number or email
         # If any character is NOT a phone/email character, treat as a name
@@ -716,30 +1415,34 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
             if not matches:
                 return f"No contacts found matching '{contact}'."
             
-            if len(matches) == 1:
-                # Single match, use its phone number
-                contact = matches[0]['phone']
+            selected = pick_dominant_contact(matches)
+            if selected is not None:
+                # Single match or a clear favourite, use its phone number
+                if len(matches) > 1:
+                    auto_selected_note = (
+                        f"Showing {selected['name']} ({selected['phone']}), the most active of "
+                        f"{len(matches)} contacts matching '{contact}'. Use find_contact to see the others."
+                    )
+                contact = selected['phone']
             else:
-                # Store the matches for later selection
-                get_recent_messages.recent_matches = matches
-                
-                # Multiple matches, return them all
-                contact_list = "\n".join([f"{i+1}. {c['name']} ({c['phone']})" for i, c in enumerate(matches[:10])])
-                return f"Multiple contacts found matching '{contact}'. Please specify which one using 'contact:N' where N is the number:\n{contact_list}"
+                # Store the matches in this session for a later contact:N selection
+                token = save_selection(matches)
+                return format_selection_prompt(contact, matches, token)
         
-        # At this point, contact should be a phone number or email
-        # Try to find handle_ids with improved phone number matching
-        if '@' in contact:
-            # This is an email
-            query = "SELECT ROWID FROM handle WHERE id = ?"
-            results = query_messages_db(query, (contact,))
-            if results and not "error" in results[0] and len(results) > 0:
-                handle_ids = [row["ROWID"] for row in results]
-        else:
-            # This is a phone number - try various formats (returns all handles for multi-protocol)
-            handle_ids = find_handles_by_phone(contact)
+        # At this point, contact should be a phone number or email. Expand it
+        # to all of that person's handles (SMS, iMessage, email addresses);
+        # handle ROWIDs are local to each database, so resolve them per source
+        resolved_contact = contact
+        handle_ids_by_source = {
+            source.path: handle_ids
+            for source, handle_ids in zip(
+                sources,
+                fan_out(sources, lambda source: _contact_handle_ids(resolved_contact, source)),
+            )
+            if handle_ids
+        }
             
-        if not handle_ids:
+        if not handle_ids_by_source:
             # Try a direct search in message table to see if any messages exist
             normalized = normalize_phone_number(contact)
             query = """
@@ -748,7 +1451,7 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
             JOIN handle h ON m.handle_id = h.ROWID
             WHERE h.id LIKE ?
             """
-            results = query_messages_db(query, (f"%{normalized}%",))
+            results = query_messages_db(query, (f"%{normalized}%",), label="get_recent_messages_contact_check")
             
             if results and not "error" in results[0] and results[0].get("count", 0) == 0:
                 # No messages found but the query was valid
@@ -758,8 +1461,7 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
                 return f"Could not find any messages with contact '{contact}'. Verify the phone number or email is correct."
     
     # Calculate the timestamp for X hours ago
-    current_time = datetime.now(timezone.utc)
-    hours_ago = current_time - timedelta(hours=hours)
+    hours_ago = now - timedelta(hours=hours)
     
     # Convert to Apple's timestamp format (nanoseconds since 2001-01-01)
     # Apple's Core Data uses nanoseconds, not seconds
@@ -773,34 +1475,51 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
     # to avoid integer overflow issues when binding to SQLite
     timestamp_str = str(nanoseconds_since_apple_epoch)
     
-    # Build the SQL query - use attributedBody field and text
-    query = """
-    SELECT 
-        m.ROWID,
-        m.date, 
-        m.text, 
-        m.attributedBody,
-        m.is_from_me,
-        m.handle_id,
-        m.cache_roomnames
-    FROM 
-        message m
-    WHERE 
-        CAST(m.date AS TEXT) > ? 
-    """
-    
-    params = [timestamp_str]
-    
-    # Add contact filter if handle_ids were found (support multiple handles for multi-protocol)
-    if handle_ids:
-        placeholders = ", ".join(["?" for _ in handle_ids])
-        query += f"AND m.handle_id IN ({placeholders}) "
-        params.extend(handle_ids)
-    
-    query += "ORDER BY m.date DESC LIMIT 100"
+    def build_query(source: DatabaseSource) -> Optional[Tuple[str, tuple]]:
+        # Build the SQL query - use attributedBody field and text. Reactions
+        # are left out of the window and folded into their parent messages
+        query = f"""
+        WITH page AS (
+            SELECT 
+                m.ROWID,
+                m.guid,
+                m.date, 
+                m.text, 
+                m.attributedBody,
+                m.is_from_me,
+                m.handle_id,
+                m.cache_roomnames,
+                m.cache_has_attachments
+            FROM 
+                message m
+            WHERE 
+                CAST(m.date AS TEXT) > ? 
+                AND {_REACTION_FILTER}
+        """
+        
+        params = [timestamp_str]
+        
+        # Add contact filter if handle_ids were found (support multiple handles for multi-protocol)
+        if handle_ids_by_source is not None:
+            handle_ids = handle_ids_by_source.get(source.path)
+            if not handle_ids:
+                # This contact has no history in this source
+                return None
+            placeholders = ", ".join(["?" for _ in handle_ids])
+            query += f"AND m.handle_id IN ({placeholders}) "
+            params.extend(handle_ids)
+        
+        query += f"""
+            ORDER BY {apple_date_ns_sql("m.date")} DESC LIMIT 100
+        )
+        SELECT page.*, {_REACTIONS_SUBQUERY}
+        FROM page
+        ORDER BY {apple_date_ns_sql("page.date")} DESC
+        """
+        return query, tuple(params)
     
-    # Execute the query
-    messages = query_messages_db(query, tuple(params))
+    # Execute the query against every source and merge newest-first
+    messages = query_messages_sources(build_query, limit=100, label="get_recent_messages")
     
     # Format the results
     if not messages:
@@ -809,20 +1528,21 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
     if "error" in messages[0]:
         return f"Error accessing messages: {messages[0]['error']}"
     
-    # Get chat mapping for group chat names
-    chat_mapping = get_chat_mapping()
+    # Get chat mapping for group chat names (one per source)
+    chat_mappings = {}
+    contacts = None
+    index = _person_index_or_empty()
     
     formatted_messages = []
+    entries = []
     for msg in messages:
+        source = msg["_source"]
         # Get the message content from text or attributedBody
-        if msg.get('text'):
-            body = msg['text']
-        elif msg.get('attributedBody'):
-            body = extract_body_from_attributed(msg['attributedBody'])
-            if not body:
-                # Skip messages with no content
-                continue
-        else:
+        body = get_message_body(msg)
+        if msg.get("cache_has_attachments"):
+            # The attachment itself shows up as U+FFFC in the body
+            body = f"[Attachment] {(body or '').replace(chr(0xFFFC), '').strip()}".rstrip()
+        if not body:
             # Skip empty messages
             continue
         
@@ -844,31 +1564,53 @@ def get_recent_messages(hours: int = 24, contact: Optional[str] = None) -> str:
         except (ValueError, TypeError, OverflowError) as e:
             # If conversion fails, use a placeholder
             date_str = "Unknown date"
-            print(f"Date conversion error: {e} for timestamp {msg['date']}")
+            logger.warning("Date conversion error: %s for timestamp %s", e, msg["date"])
         
-        direction = "You" if msg["is_from_me"] else get_contact_name(msg["handle_id"])
+        direction = "You" if msg["is_from_me"] else get_contact_name(msg["handle_id"], source, index)
         
         # Check if this is a group chat
         group_chat_name = None
         if msg.get('cache_roomnames'):
-            group_chat_name = chat_mapping.get(msg['cache_roomnames'])
+            if source.path not in chat_mappings:
+                chat_mappings[source.path] = get_chat_mapping(source)
+            group_chat_name = chat_mappings[source.path].get(msg['cache_roomnames'])
         
         message_prefix = f"[{date_str}]"
         if group_chat_name:
             message_prefix += f" [{group_chat_name}]"
         
+        if budget is not None:
+            # Trim before annotating so reactions survive long bodies
+            body = trim_body(body)
+        reactions = fold_reactions(msg.get("reactions"))
+        if reactions:
+            if contacts is None:
+                contacts = get_cached_contacts()
+            body += " " + format_reactions(_name_reactions(reactions, contacts, index))
+        
         formatted_messages.append(
             f"{message_prefix} {direction}: {body}"
         )
+        if budget is not None:
+            try:
+                timestamp = apple_date_to_unix(msg["date"])
+            except (ValueError, TypeError):
+                timestamp = None
+            entries.append({"time": timestamp, "sender": direction, "chat": group_chat_name, "body": body})
     
     if not formatted_messages:
         return "No messages found in the specified time period."
-        
+    
+    if budget is not None:
+        if auto_selected_note:
+            # The note and its newline come out of the same budget
+            auto_selected_note = trim_body(auto_selected_note, budget // 2)
+            budget -= len(auto_selected_note) + 1
+        formatted_messages = [render_compact(entries, now, max_chars=budget)]
+    if auto_selected_note:
+        formatted_messages.insert(0, auto_selected_note)
     return "\n".join(formatted_messages)
 
-# Initialize the static variable for recent matches
-get_recent_messages.recent_matches = []
-
 
 def get_latest_message_from_contact(contact: str, hours: int = 1) -> Optional[Dict[str, Any]]:
     """
@@ -878,68 +1620,664 @@ def get_latest_message_from_contact(contact: str, hours: int = 1) -> Optional[Di
     if not contact or not str(contact).strip():
         return None
     contact = str(contact).strip()
+    return get_latest_messages([contact], hours=hours).get(contact)
+
 
-    handle_ids = None
+def _latest_handle_ids(contact: str, index: PersonIndex) -> Dict[str, List[int]]:
+    """Handle ROWIDs per Messages database for a name, number or email (newest-message polling)."""
     if not all(c.isdigit() or c in '+- ()@.' for c in contact):
         matches = find_contact_by_name(contact)
         if not matches:
-            return None
-        if len(matches) > 1:
-            contact = matches[0]['phone']
-        else:
-            contact = matches[0]['phone']
-    if '@' in contact:
-        query = "SELECT ROWID FROM handle WHERE id = ?"
-        results = query_messages_db(query, (contact,))
-        if results and "error" not in results[0] and len(results) > 0:
-            handle_ids = [row["ROWID"] for row in results]
-    else:
-        handle_ids = find_handles_by_phone(contact)
-    if not handle_ids:
-        return None
+            return {}
+        contact = matches[0]['phone']
+    handle_ids = {path: list(ids) for path, ids in index.handles_for(contact).items()}
+    person = index.find(contact)
+    if person is not None:
+        for path, ids in person.handle_ids.items():
+            known = handle_ids.setdefault(path, [])
+            known.extend(h for h in ids if h not in known)
+    return handle_ids
+
+
+def get_latest_messages(contacts: List[str], hours: int = 1) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Get the most recent message for each of many contacts in one query per database.
 
-    current_time = datetime.now(timezone.utc)
-    hours_ago = current_time - timedelta(hours=hours)
+    Contacts (names, numbers or emails) are resolved to handles in memory
+    through the person index, then a single window-function query per
+    Messages database picks the newest message per contact within the last
+    `hours`; the newest across databases wins. Tapback reactions are skipped.
+
+    Args:
+        contacts: Names, phone numbers or email addresses
+        hours: How far back to look
+
+    Returns:
+        Dict mapping each contact (stripped) to a dict with body, is_from_me
+        and date (Apple timestamp), or None if there is no message
+    """
+    contacts = [str(c).strip() for c in contacts if c is not None and str(c).strip()]
+    results: Dict[str, Optional[Dict[str, Any]]] = {contact: None for contact in contacts}
+    if not results:
+        return results
+
+    index = _person_index_or_empty()
+
+    targets: Dict[str, List[Tuple[int, int]]] = {}  # path -> (position in results, handle ROWID)
+    unique_contacts = list(results)
+    for position, contact in enumerate(unique_contacts):
+        for path, handle_ids in _latest_handle_ids(contact, index).items():
+            targets.setdefault(path, []).extend((position, handle_id) for handle_id in handle_ids)
+    if not targets:
+        return results
+
+    hours_ago = datetime.now(timezone.utc) - timedelta(hours=hours)
     apple_epoch = datetime(2001, 1, 1, tzinfo=timezone.utc)
-    seconds_since_apple_epoch = (hours_ago - apple_epoch).total_seconds()
-    nanoseconds_since_apple_epoch = int(seconds_since_apple_epoch * 1_000_000_000)
-    timestamp_str = str(nanoseconds_since_apple_epoch)
+    timestamp_str = str(int((hours_ago - apple_epoch).total_seconds() * 1_000_000_000))
+
+    def run(source: DatabaseSource) -> List[Dict[str, Any]]:
+        source_targets = targets.get(source.path)
+        if not source_targets:
+            return []
+        values = ", ".join(["(?, ?)"] * len(source_targets))
+        query = f"""
+        WITH targets(contact, handle_id) AS (VALUES {values}),
+        ranked AS (
+            SELECT
+                t.contact, m.date, m.text, m.attributedBody, m.is_from_me,
+                ROW_NUMBER() OVER (PARTITION BY t.contact ORDER BY m.date DESC) AS rn
+            FROM targets t
+            JOIN message m ON m.handle_id = t.handle_id
+            WHERE CAST(m.date AS TEXT) > ?
+              AND {_REACTION_FILTER}
+        )
+        SELECT contact, date, text, attributedBody, is_from_me FROM ranked WHERE rn = 1
+        """
+        params = [value for target in source_targets for value in target] + [timestamp_str]
+        return query_messages_db(query, tuple(params), source=source, label="get_latest_messages")
 
-    query = """
-    SELECT m.date, m.text, m.attributedBody, m.is_from_me
-    FROM message m
-    WHERE CAST(m.date AS TEXT) > ?
-    """
-    params = [timestamp_str]
-    placeholders = ", ".join(["?" for _ in handle_ids])
-    query += f"AND m.handle_id IN ({placeholders}) "
-    params.extend(handle_ids)
-    query += "ORDER BY m.date DESC LIMIT 1"
-
-    messages = query_messages_db(query, tuple(params))
-    if not messages or "error" in messages[0]:
-        return None
+    newest: Dict[int, float] = {}
+    for rows in fan_out(get_message_sources(), run):
+        if rows and "error" in rows[0]:
+            continue
+        for msg in rows:
+            if msg.get("text"):
+                body = msg["text"]
+            elif msg.get("attributedBody"):
+                body = extract_body_from_attributed(msg["attributedBody"])
+            else:
+                continue
+            if not body or not body.strip():
+                continue
+            try:
+                date_int = int(msg["date"])
+            except (TypeError, ValueError):
+                continue
+            # Sources may mix second and nanosecond dates; compare in Unix time
+            when = apple_date_to_unix(date_int)
+            if when <= newest.get(msg["contact"], float("-inf")):
+                continue
+            newest[msg["contact"]] = when
+            results[unique_contacts[msg["contact"]]] = {
+                "body": body.strip(),
+                "is_from_me": bool(msg.get("is_from_me")),
+                "date": date_int,
+            }
+    return results
 
-    msg = messages[0]
-    if msg.get("text"):
-        body = msg["text"]
-    elif msg.get("attributedBody"):
-        body = extract_body_from_attributed(msg["attributedBody"])
+
+# chat.style for group conversations (one-to-one chats are 45)
+GROUP_CHAT_STYLE = 43
+CHAT_DIRECTORY_SORTS = ("recent", "name", "participants")
+
+# One row per chat with its members and last activity
+_CHAT_DIRECTORY_QUERY = f"""
+WITH members AS (
+    SELECT chj.chat_id, COUNT(*) AS participants, GROUP_CONCAT(h.id, char(31)) AS handles
+    FROM chat_handle_join chj
+    JOIN handle h ON h.ROWID = chj.handle_id
+    GROUP BY chj.chat_id
+),
+activity AS (
+    SELECT chat_id, MAX({apple_date_ns_sql("message_date")}) AS last_date, COUNT(*) AS messages
+    FROM chat_message_join
+    GROUP BY chat_id
+)
+SELECT
+    c.guid, c.chat_identifier, c.display_name, c.style,
+    COALESCE(mb.participants, 0) AS participants, mb.handles,
+    a.last_date, COALESCE(a.messages, 0) AS messages
+FROM chat c
+LEFT JOIN members mb ON mb.chat_id = c.ROWID
+LEFT JOIN activity a ON a.chat_id = c.ROWID
+"""
+
+# Full directories keyed by Messages database version; pages are sliced from these
+_CHAT_DIRECTORY_CACHE = LRUCache("chat_directory", 4)
+
+def _address_display_name(address: str, contacts: Dict[str, str], index: PersonIndex) -> str:
+    """Contact name for a handle address, falling back to the address itself."""
+    person = index.find(address)
+    if person is not None:
+        return person.name
+    return contacts.get(normalize_phone_number(address)) or address
+
+def _build_chat_directory() -> List[Dict[str, Any]]:
+    """
+    Every chat across all sources with resolved members, newest activity first.
+
+    Raises:
+        sqlite3.OperationalError: If no Messages database could be read
+    """
+    sources = get_message_sources()
+    per_source = fan_out(sources, lambda source: query_messages_db(
+        _CHAT_DIRECTORY_QUERY, source=source, label="get_chat_directory"
+    ))
+    readable = [rows for rows in per_source if not (rows and "error" in rows[0])]
+    if not readable:
+        errors = [rows[0]["error"] for rows in per_source if rows]
+        if errors:
+            raise sqlite3.OperationalError(errors[0])
+
+    contacts = get_cached_contacts()
+    index = _person_index_or_empty()
+
+    chats: Dict[str, Dict[str, Any]] = {}
+    for rows in readable:
+        for row in rows:
+            last_date = apple_date_sort_key(row["last_date"])
+            existing = chats.get(row["guid"])
+            if existing is not None and existing["_last_date"] >= last_date:
+                continue
+            handles = row["handles"].split("\x1f") if row["handles"] else []
+            members = [_address_display_name(h, contacts, index) for h in handles]
+            last_message = None
+            if last_date:
+                last_message = datetime.fromtimestamp(apple_date_to_unix(last_date)).strftime("%Y-%m-%d %H:%M:%S")
+            chats[row["guid"]] = {
+                "chat_id": row["chat_identifier"],
+                "display_name": row["display_name"] or None,
+                "is_group": row["style"] == GROUP_CHAT_STYLE,
+                "participants": row["participants"],
+                "members": members,
+                "messages": row["messages"],
+                "last_message": last_message,
+                "_last_date": last_date,
+            }
+    return sorted(chats.values(), key=lambda c: c["_last_date"], reverse=True)
+
+def get_chat_directory(
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "recent",
+    include_direct: bool = False,
+) -> Dict[str, Any]:
+    """
+    List chats with their participants and last activity, a page at a time.
+
+    The directory is built with one aggregate query per Messages database
+    (over chat_handle_join and chat_message_join) and cached until a
+    database changes, so paging through it doesn't re-run the query.
+
+    Args:
+        limit: Chats per page (1-500)
+        offset: Number of chats to skip
+        sort: "recent" (last message first), "name" or "participants" (largest first)
+        include_direct: Include one-to-one conversations as well as group chats
+
+    Returns:
+        Dict with "chats" (chat_id, display_name, is_group, participants,
+        members, messages, last_message), "total" and "next_offset" (None on
+        the last page), or {"error": ...}
+    """
+    if sort not in CHAT_DIRECTORY_SORTS:
+        return {"error": f"Unknown sort '{sort}'. Use one of: {', '.join(CHAT_DIRECTORY_SORTS)}."}
+    limit = max(1, min(int(limit), 500))
+    offset = max(0, int(offset))
+
+    version = _messages_data_version()
+    directory = _CHAT_DIRECTORY_CACHE.get(version) if version is not None else None
+    if directory is None:
+        try:
+            directory = _build_chat_directory()
+        except sqlite3.Error as e:
+            return {"error": str(e)}
+        deadline = current_deadline()
+        # A build cut short by the time budget is served once but never cached
+        if version is not None and not (deadline is not None and deadline.truncated):
+            _CHAT_DIRECTORY_CACHE.put(version, directory)
+
+    chats = directory if include_direct else [c for c in directory if c["is_group"]]
+    if sort == "name":
+        chats = sorted(chats, key=lambda c: (c["display_name"] or ", ".join(c["members"])).lower())
+    elif sort == "participants":
+        chats = sorted(chats, key=lambda c: c["participants"], reverse=True)
+
+    page = [{k: v for k, v in chat.items() if not k.startswith("_")} for chat in chats[offset:offset + limit]]
+    next_offset = offset + limit if offset + limit < len(chats) else None
+    return {"chats": page, "total": len(chats), "next_offset": next_offset}
+
+
+MAX_CHAT_PAGE = 200
+
+def _encode_chat_cursor(date: int, guid: str) -> str:
+    return base64.urlsafe_b64encode(f"{date}:{guid}".encode()).decode().rstrip("=")
+
+def _decode_chat_cursor(cursor: str) -> Tuple[int, str]:
+    """(message_date, guid) of the last message on the previous page."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    date, guid = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+    return int(date), guid
+
+def _message_dict(row: Dict[str, Any], contacts: Dict[str, str], index: PersonIndex) -> Dict[str, Any]:
+    """Structured form of a message row with guid, date, handle, is_from_me and body columns."""
+    if row["is_from_me"]:
+        sender = "You"
+    elif row["handle"]:
+        sender = _address_display_name(row["handle"], contacts, index)
     else:
-        return None
-    if not body or not body.strip():
-        return None
+        sender = "Unknown"
+    timestamp = apple_date_to_unix(row["date"])
+    message = {
+        "guid": row["guid"],
+        "date": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": timestamp,
+        "sender": sender,
+        "is_from_me": bool(row["is_from_me"]),
+        "body": get_message_body(row),
+        "reply_to": row.get("thread_originator_guid"),
+    }
+    if "reactions" in row:
+        message["reactions"] = _name_reactions(fold_reactions(row["reactions"]), contacts, index)
+    return message
+
+
+def get_chat_messages(chat_id: str, cursor: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    Read one chat's messages newest first, a page at a time.
 
-    is_from_me = bool(msg.get("is_from_me"))
-    date_val = msg.get("date")
-    if date_val is None:
-        return None
-    try:
-        date_int = int(date_val)
-    except (TypeError, ValueError):
-        return None
+    Messages are read through chat_message_join's (chat_id, message_date)
+    index with keyset pagination, so a page costs the same however large
+    the database is or how deep into the thread it starts.
 
-    return {"body": body.strip(), "is_from_me": is_from_me, "date": date_int}
+    Args:
+        chat_id: chat_identifier (e.g. "chat123456789", as listed by
+                 get_chat_directory) or chat guid (e.g. "iMessage;-;chat123456789")
+        cursor: next_cursor from the previous page, or None for the newest messages
+        limit: Messages per page (1-200)
+
+    Returns:
+        Dict with "chat_id", "messages" (guid, date, timestamp in Unix
+        seconds, sender, is_from_me, body, reply_to, the guid of the thread an inline reply belongs to,
+        and reactions, tapbacks folded into [{"emoji", "senders"}] rather than returned as messages;
+        oldest last) and "next_cursor" (None when the thread is exhausted),
+        or {"error": ...}
+    """
+    limit = max(1, min(int(limit), MAX_CHAT_PAGE))
+    after = None
+    if cursor:
+        try:
+            after = _decode_chat_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return {"error": f"Invalid cursor '{cursor}'. Pass next_cursor from the previous page."}
+
+    def run(source: DatabaseSource) -> Tuple[bool, List[Dict[str, Any]]]:
+        """(whether this source has the chat, its page of rows or an error row)."""
+        chats = query_messages_db(
+            "SELECT ROWID FROM chat WHERE chat_identifier = ? OR guid = ?", (chat_id, chat_id), source=source,
+            label="get_chat_messages",
+        )
+        if chats and "error" in chats[0]:
+            return False, chats
+        if not chats:
+            return False, []
+        chat_rowids = [row["ROWID"] for row in chats]
+        query = f"""
+        WITH page AS (
+            SELECT m.guid, cmj.message_date AS date, m.text, m.attributedBody, m.is_from_me, h.id AS handle,
+                   m.thread_originator_guid
+            FROM chat_message_join cmj
+            JOIN message m ON m.ROWID = cmj.message_id
+            LEFT JOIN handle h ON h.ROWID = m.handle_id
+            WHERE cmj.chat_id IN ({", ".join("?" for _ in chat_rowids)})
+            AND {_REACTION_FILTER}
+        """
+        params: List[Any] = list(chat_rowids)
+        if after is not None:
+            # Range on the indexed column, then break ties on guid
+            query += "AND cmj.message_date <= ? AND (cmj.message_date < ? OR m.guid < ?) "
+            params.extend([after[0], after[0], after[1]])
+        query += f"""
+            ORDER BY cmj.message_date DESC, m.guid DESC LIMIT ?
+        )
+        SELECT page.*, {_REACTIONS_SUBQUERY}
+        FROM page
+        ORDER BY page.date DESC, page.guid DESC
+        """
+        params.append(limit + 1)
+        return True, query_messages_db(query, tuple(params), source=source, label="get_chat_messages")
+
+    per_source = fan_out(get_message_sources(), run)
+    errors = [rows[0]["error"] for _found, rows in per_source if rows and "error" in rows[0]]
+    readable = [rows for found, rows in per_source if found and not (rows and "error" in rows[0])]
+    if not readable:
+        # A chat that exists but has nothing in this page is an empty page, not an error
+        return {"error": errors[0]} if errors else {"error": f"No chat found with ID '{chat_id}'."}
+
+    # Exports of the same chat overlap: keep each message once, in a total
+    # (date, guid) order so the cursor never skips or repeats a row
+    rows: Dict[str, Dict[str, Any]] = {}
+    for source_rows in readable:
+        for row in source_rows:
+            rows.setdefault(row["guid"], row)
+    ordered = sorted(rows.values(), key=lambda r: (apple_date_sort_key(r["date"]), r["guid"]), reverse=True)
+    page, more = ordered[:limit], len(ordered) > limit
+
+    contacts = get_cached_contacts()
+    index = _person_index_or_empty()
+
+    chat_messages = [_message_dict(row, contacts, index) for row in page]
+    next_cursor = _encode_chat_cursor(page[-1]["date"], page[-1]["guid"]) if more else None
+    return {"chat_id": chat_id, "messages": chat_messages, "next_cursor": next_cursor}
+
+
+MAX_THREAD_MESSAGES = 500
+# Replies to replies deeper than this are not followed up to their root
+_MAX_THREAD_DEPTH = 50
+
+# Walk up from any message to the thread's root, then collect every reply
+# below it. Each step is a lookup on the guid or thread_originator_guid index,
+# so a thread costs the same however large its chat is.
+_THREAD_QUERY = f"""
+WITH RECURSIVE
+ancestors(guid, parent, depth) AS (
+    SELECT guid, thread_originator_guid, 0 FROM message WHERE guid = ?
+    UNION ALL
+    SELECT m.guid, m.thread_originator_guid, a.depth + 1
+    FROM message m JOIN ancestors a ON m.guid = a.parent
+    WHERE a.depth < {_MAX_THREAD_DEPTH}
+),
+root(guid) AS (SELECT guid FROM ancestors ORDER BY depth DESC LIMIT 1),
+thread(guid) AS (
+    SELECT guid FROM root
+    UNION
+    SELECT m.guid FROM message m JOIN thread t ON m.thread_originator_guid = t.guid
+)
+SELECT m.guid, m.date, m.text, m.attributedBody, m.is_from_me, h.id AS handle, m.thread_originator_guid
+FROM thread t
+JOIN message m ON m.guid = t.guid
+LEFT JOIN handle h ON h.ROWID = m.handle_id
+WHERE {_REACTION_FILTER}
+ORDER BY m.date
+LIMIT ?
+"""
+
+
+def build_reply_trees(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Nest messages under the message they reply to.
+
+    Args:
+        messages: Message dicts with "guid" and "reply_to", oldest first
+
+    Returns:
+        Root messages (those whose parent isn't in the list), each with a
+        "replies" list of child messages in the same form
+    """
+    nodes: Dict[str, Dict[str, Any]] = {}
+    roots = []
+    for message in messages:
+        node = dict(message, replies=[])
+        # Only attach to a parent seen earlier, so a malformed chain can't loop
+        parent = nodes.get(message.get("reply_to"))
+        (parent["replies"] if parent is not None else roots).append(node)
+        nodes[message["guid"]] = node
+    return roots
+
+
+def format_reply_trees(roots: List[Dict[str, Any]], indent: str = "  ") -> str:
+    """Indented text form of build_reply_trees output, one message per line."""
+    lines = []
+    stack = [(node, 0) for node in reversed(roots)]
+    while stack:
+        node, depth = stack.pop()
+        body = node["body"] or "[No displayable content]"
+        lines.append(f"{indent * depth}[{node['date']}] {node['sender']}: {body}")
+        stack.extend((child, depth + 1) for child in reversed(node["replies"]))
+    return "\n".join(lines)
+
+
+def get_thread(message_guid: str, limit: int = MAX_THREAD_MESSAGES) -> Dict[str, Any]:
+    """
+    Reconstruct the inline-reply thread a message belongs to.
+
+    Starting from any message in the thread (the original or any reply), the
+    root is found through thread_originator_guid and every reply below it is
+    collected, including replies to replies.
+
+    Args:
+        message_guid: guid of any message in the thread (e.g. the reply_to
+                      value from get_chat_messages)
+        limit: Maximum number of messages to return (1-500), oldest first
+
+    Returns:
+        Dict with "thread" (root messages as from get_chat_messages, each with
+        nested "replies"), "messages" (count) and "truncated", or {"error": ...}
+    """
+    limit = max(1, min(int(limit), MAX_THREAD_MESSAGES))
+    per_source = fan_out(
+        get_message_sources(),
+        lambda source: query_messages_db(
+            _THREAD_QUERY, (message_guid, limit + 1), source=source, label="get_thread"
+        ),
+    )
+    readable = [rows for rows in per_source if not (rows and "error" in rows[0])]
+    if not readable:
+        errors = [rows[0]["error"] for rows in per_source if rows]
+        return {"error": errors[0] if errors else f"No message found with guid '{message_guid}'."}
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for source_rows in readable:
+        for row in source_rows:
+            rows.setdefault(row["guid"], row)
+    if not rows:
+        return {"error": f"No message found with guid '{message_guid}'."}
+    ordered = sorted(rows.values(), key=lambda r: (apple_date_sort_key(r["date"]), r["guid"]))
+
+    contacts = get_cached_contacts()
+    index = _person_index_or_empty()
+    thread = [_message_dict(row, contacts, index) for row in ordered[:limit]]
+    return {
+        "thread": build_reply_trees(thread),
+        "messages": len(thread),
+        "truncated": len(ordered) > limit,
+    }
+
+
+# Attachment metadata for one chat. Only attachment columns that describe
+# the file are read; the files themselves and the attachment table's blob
+# columns (user_info, attribution_info) never are.
+_CHAT_ATTACHMENTS_QUERY = """
+SELECT a.guid, a.transfer_name, a.filename, a.mime_type, a.total_bytes,
+       m.guid AS message_guid, cmj.message_date AS date, m.is_from_me, h.id AS handle
+FROM chat_message_join cmj
+JOIN message_attachment_join maj ON maj.message_id = cmj.message_id
+JOIN attachment a ON a.ROWID = maj.attachment_id
+JOIN message m ON m.ROWID = cmj.message_id
+LEFT JOIN handle h ON h.ROWID = m.handle_id
+WHERE cmj.chat_id IN (SELECT ROWID FROM chat WHERE chat_identifier = ? OR guid = ?)
+"""
+_CHAT_ATTACHMENTS_CACHE = LRUCache("chat_attachments", 16)
+
+
+def _load_chat_attachments(chat_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Every attachment of a chat across all sources, oldest first, with
+    "keys" holding the parallel (date sort key, guid) list for paging.
+
+    Returns:
+        The loaded entry, None if the chat doesn't exist, or {"error": ...}
+    """
+    version = _messages_data_version()
+    if version is not None:
+        cached = _CHAT_ATTACHMENTS_CACHE.get((chat_id, version))
+        if cached is not None:
+            return cached
+
+    sources = get_message_sources()
+    chats = fan_out(
+        sources,
+        lambda source: query_messages_db(
+            "SELECT 1 FROM chat WHERE chat_identifier = ? OR guid = ? LIMIT 1", (chat_id, chat_id), source=source,
+            label="get_attachments",
+        ),
+    )
+    if not any(rows and "error" not in rows[0] for rows in chats):
+        errors = [rows[0]["error"] for rows in chats if rows]
+        return {"error": errors[0]} if errors else None
+
+    per_source = fan_out(
+        sources, lambda source: query_messages_db(
+            _CHAT_ATTACHMENTS_QUERY, (chat_id, chat_id), source=source, label="get_attachments"
+        )
+    )
+    rows: Dict[str, Dict[str, Any]] = {}
+    for source_rows in per_source:
+        if source_rows and "error" in source_rows[0]:
+            continue
+        for row in source_rows:
+            rows.setdefault(row["guid"], row)
+
+    contacts = get_cached_contacts()
+    index = _person_index_or_empty()
+
+    ordered = sorted(rows.values(), key=lambda r: (apple_date_sort_key(r["date"]), r["guid"]))
+    attachments = []
+    for row in ordered:
+        if row["is_from_me"]:
+            sender = "You"
+        elif row["handle"]:
+            sender = _address_display_name(row["handle"], contacts, index)
+        else:
+            sender = "Unknown"
+        path = row["filename"]
+        attachments.append({
+            "guid": row["guid"],
+            "name": row["transfer_name"] or (os.path.basename(path) if path else None),
+            "mime_type": row["mime_type"],
+            "size": row["total_bytes"],
+            "sender": sender,
+            "is_from_me": bool(row["is_from_me"]),
+            "date": datetime.fromtimestamp(apple_date_to_unix(row["date"])).strftime("%Y-%m-%d %H:%M:%S"),
+            "message_guid": row["message_guid"],
+            "path": os.path.expanduser(path) if path else None,
+        })
+    entry = {
+        "attachments": attachments,
+        "keys": [(apple_date_sort_key(r["date"]), r["guid"]) for r in ordered],
+        "dates": [r["date"] for r in ordered],
+    }
+    deadline = current_deadline()
+    # A read cut short by the time budget must not be served again as complete
+    if version is not None and not (deadline is not None and deadline.truncated):
+        _CHAT_ATTACHMENTS_CACHE.put((chat_id, version), entry)
+    return entry
+
+
+def get_attachments(
+    chat_id: str, cursor: Optional[str] = None, limit: int = 50, mime_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    List a chat's attachments newest first, a page at a time.
+
+    Only metadata is returned; attachment files are never opened. The chat's
+    attachment list is loaded once per database version and cached, so
+    paging through a media-heavy chat costs one query.
+
+    Args:
+        chat_id: chat_identifier or chat guid (as listed by get_chat_directory)
+        cursor: next_cursor from the previous page, or None for the newest
+        limit: Attachments per page (1-200)
+        mime_type: Only attachments whose MIME type starts with this (e.g. "image/")
+
+    Returns:
+        Dict with "chat_id", "attachments" (guid, name, mime_type, size in
+        bytes, sender, is_from_me, date, message_guid and path on disk),
+        "total" (matching attachments in the chat) and "next_cursor", or
+        {"error": ...}
+    """
+    limit = max(1, min(int(limit), MAX_CHAT_PAGE))
+    before = None
+    if cursor:
+        try:
+            date, guid = _decode_chat_cursor(cursor)
+            before = (apple_date_sort_key(date), guid)
+        except (ValueError, UnicodeDecodeError):
+            return {"error": f"Invalid cursor '{cursor}'. Pass next_cursor from the previous page."}
+
+    entry = _load_chat_attachments(chat_id)
+    if entry is None:
+        return {"error": f"No chat found with ID '{chat_id}'."}
+    if "error" in entry:
+        return entry
+
+    attachments, keys, dates = entry["attachments"], entry["keys"], entry["dates"]
+    # Keyset paging over the cached list: everything strictly older than the cursor
+    end = bisect.bisect_left(keys, before) if before is not None else len(keys)
+    if mime_type:
+        prefix = mime_type.lower()
+        positions = [i for i in range(end) if (attachments[i]["mime_type"] or "").lower().startswith(prefix)]
+        total = sum(1 for a in attachments if (a["mime_type"] or "").lower().startswith(prefix))
+    else:
+        positions = range(end)
+        total = len(attachments)
+    page_positions = positions[-limit:][::-1]
+    more = len(positions) > limit
+    next_cursor = None
+    if more:
+        last = page_positions[-1]
+        next_cursor = _encode_chat_cursor(dates[last], keys[last][1])
+    return {
+        "chat_id": chat_id,
+        "attachments": [attachments[i] for i in page_positions],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+
+
+# Messages read and scored per page of a fuzzy search, and the most it reads
+FUZZY_BATCH = 100
+FUZZY_MAX_MESSAGES = 500
+# Best matches so far included in each progress notification
+FUZZY_PROGRESS_MATCHES = 3
+
+_FUZZY_QUERY = f"""
+SELECT
+    m.ROWID,
+    m.guid,
+    m.date,
+    m.text,
+    m.attributedBody,
+    m.is_from_me,
+    m.handle_id,
+    m.cache_roomnames
+FROM
+    message m
+WHERE
+    {apple_date_ns_sql("m.date")} > ?
+    {{after}}
+ORDER BY {apple_date_ns_sql("m.date")} DESC, m.guid DESC
+LIMIT ?
+"""
+
+
+def _fuzzy_progress(scanned: int, matches: List[Tuple[str, Dict[str, Any], float]]) -> str:
+    """Progress message with the best matches found so far."""
+    status = f"Scanned {scanned} messages, {len(matches)} matches"
+    best = sorted(matches, key=lambda m: m[2], reverse=True)[:FUZZY_PROGRESS_MATCHES]
+    if best:
+        status += "; best so far: " + ", ".join(f'"{trim_body(text, 80)}" ({score:.2f})' for text, _msg, score in best)
+    return status
 
 
 def fuzzy_search_messages(
@@ -950,6 +2288,11 @@ def fuzzy_search_messages(
     """
     Fuzzy search for messages containing the search_term within the last N hours.
 
+    The newest messages (up to FUZZY_MAX_MESSAGES) are read FUZZY_BATCH at a
+    time and each page is scored as soon as it is read. After every page a
+    progress notification carries the best matches found so far, so a client
+    sees matches before the whole window has been scanned.
+
     Args:
         search_term: The string to search for in message content.
         hours: Number of hours to look back (default: 24).
@@ -982,64 +2325,68 @@ def fuzzy_search_messages(
     
     # Convert to nanoseconds (Apple's format)
     nanoseconds_since_apple_epoch = int(seconds_since_apple_epoch * 1_000_000_000)
-    timestamp_str = str(nanoseconds_since_apple_epoch)
-
-    # Build the SQL query to get all messages in the time window
-    # Limiting to 500 messages to avoid performance issues with very large message histories.
-    query = """
-    SELECT
-        m.ROWID,
-        m.date,
-        m.text,
-        m.attributedBody,
-        m.is_from_me,
-        m.handle_id,
-        m.cache_roomnames
-    FROM
-        message m
-    WHERE
-        CAST(m.date AS TEXT) > ?
-    ORDER BY m.date DESC
-    LIMIT 500
-    """
-    params = (timestamp_str,)
-    raw_messages = query_messages_db(query, params)
-
-    if not raw_messages:
-        return f"No messages found in the last {hours} hours to search."
-    if "error" in raw_messages[0]:
-        return f"Error accessing messages: {raw_messages[0]['error']}"
-
-    message_candidates = []
-    for msg_dict in raw_messages:
-        body = msg_dict.get("text") or extract_body_from_attributed(
-            msg_dict.get("attributedBody")
-        )
-        if body and body.strip():
-            message_candidates.append((body, msg_dict))
 
-    if not message_candidates:
-        return f"No message content found to search in the last {hours} hours."
-
-    # --- New fuzzy matching logic using thefuzz ---
     cleaned_search_term = clean_name(search_term).lower()
     # thefuzz scores are 0-100. Scale the input threshold (0.0-1.0).
     scaled_threshold = threshold * 100
 
     matched_messages_with_scores = []
-    for original_message_text, msg_dict_value in message_candidates:
-        # We use the original_message_text for matching, which might contain HTML entities etc.
-        # clean_name will handle basic cleaning like emoji removal.
-        cleaned_candidate_text = clean_name(original_message_text).lower()
-
-        # Using WRatio for a good balance of matching strategies.
-        score_from_thefuzz = fuzz.WRatio(cleaned_search_term, cleaned_candidate_text)
-
-        if score_from_thefuzz >= scaled_threshold:
-            # Store score as 0.0-1.0 for consistency with how threshold is defined
-            matched_messages_with_scores.append(
-                (original_message_text, msg_dict_value, score_from_thefuzz / 100.0)
+    scanned = 0
+    candidates = 0
+    after: Optional[Tuple[int, str]] = None
+    deadline = current_deadline()
+    while scanned < FUZZY_MAX_MESSAGES:
+        batch_size = min(FUZZY_BATCH, FUZZY_MAX_MESSAGES - scanned)
+        if after is None:
+            query = _FUZZY_QUERY.format(after="")
+            params = (nanoseconds_since_apple_epoch, batch_size)
+        else:
+            # Keyset on (normalized date, guid), the order every page is read in
+            query = _FUZZY_QUERY.format(
+                after=f"AND ({apple_date_ns_sql('m.date')} < ? OR ({apple_date_ns_sql('m.date')} = ? AND m.guid < ?))"
             )
+            params = (nanoseconds_since_apple_epoch, after[0], after[0], after[1], batch_size)
+        rows = query_messages_sources(
+            lambda source: (query, params), snapshot=True, label="fuzzy_search_messages"
+        )
+        if rows and "error" in rows[0]:
+            if not scanned:
+                return f"Error accessing messages: {rows[0]['error']}"
+            break
+        # Each source returned its own newest batch_size; keep the newest overall
+        page = sorted(rows, key=lambda r: (apple_date_sort_key(r["date"]), r["guid"]), reverse=True)[:batch_size]
+        if not page:
+            break
+        scanned += len(page)
+        after = (apple_date_sort_key(page[-1]["date"]), page[-1]["guid"])
+
+        for msg_dict_value in page:
+            original_message_text = get_message_body(msg_dict_value)
+            if not original_message_text or not original_message_text.strip():
+                continue
+            candidates += 1
+            # We use the original_message_text for matching, which might contain HTML entities etc.
+            # clean_name will handle basic cleaning like emoji removal.
+            cleaned_candidate_text = clean_name(original_message_text).lower()
+
+            # Using WRatio for a good balance of matching strategies.
+            score_from_thefuzz = fuzz.WRatio(cleaned_search_term, cleaned_candidate_text)
+
+            if score_from_thefuzz >= scaled_threshold:
+                # Store score as 0.0-1.0 for consistency with how threshold is defined
+                matched_messages_with_scores.append(
+                    (original_message_text, msg_dict_value, score_from_thefuzz / 100.0)
+                )
+        # Rows were already counted as they were fetched; this only carries the matches
+        report_progress(0, _fuzzy_progress(scanned, matched_messages_with_scores), force=True)
+        if deadline is not None and deadline.truncated:
+            break
+
+    if not scanned:
+        return f"No messages found in the last {hours} hours to search."
+    if not candidates:
+        return f"No message content found to search in the last {hours} hours."
+
     matched_messages_with_scores.sort(
         key=lambda x: x[2], reverse=True
     )  # Sort by score desc
@@ -1047,32 +2394,21 @@ def fuzzy_search_messages(
     if not matched_messages_with_scores:
         return f"No messages found matching '{search_term}' with a threshold of {threshold} in the last {hours} hours."
 
-    chat_mapping = get_chat_mapping()
+    chat_mappings = {}
+    index = _person_index_or_empty()
     formatted_results = []
     for _matched_text, msg_dict, score in matched_messages_with_scores:
-        original_body = (
-            msg_dict.get("text")
-            or extract_body_from_attributed(msg_dict.get("attributedBody"))
-            or "[No displayable content]"
-        )
+        source = msg_dict["_source"]
+        if source.path not in chat_mappings:
+            chat_mappings[source.path] = get_chat_mapping(source)
+        chat_mapping = chat_mappings[source.path]
+        original_body = get_message_body(msg_dict) or "[No displayable content]"
 
-        apple_offset = (
-            978307200  # Seconds between Unix epoch and Apple epoch (2001-01-01)
-        )
-        msg_timestamp_ns = int(msg_dict["date"])
-        # Ensure timestamp is in seconds for fromtimestamp
-        msg_timestamp_s = (
-            msg_timestamp_ns / 1_000_000_000
-            if len(str(msg_timestamp_ns)) > 10
-            else msg_timestamp_ns
-        )
-        date_val = datetime.fromtimestamp(
-            msg_timestamp_s + apple_offset, tz=timezone.utc
-        )
+        date_val = datetime.fromtimestamp(apple_date_to_unix(msg_dict["date"]), tz=timezone.utc)
         date_str = date_val.astimezone().strftime("%Y-%m-%d %H:%M:%S")
 
         direction = (
-            "You" if msg_dict["is_from_me"] else get_contact_name(msg_dict["handle_id"])
+            "You" if msg_dict["is_from_me"] else get_contact_name(msg_dict["handle_id"], source, index)
         )
         group_chat_name = (
             chat_mapping.get(msg_dict.get("cache_roomnames"))
@@ -1128,7 +2464,7 @@ def _check_imessage_availability(recipient: str) -> bool:
             h.service
         """
     
-    result = query_messages_db(query, query_params)
+    result = query_messages_db(query, query_params, label="check_imessage_availability")
     
     if not result or "error" in result[0]:
         return False
@@ -1360,7 +2696,22 @@ def check_messages_db_access() -> str:
             conn.close()
         except sqlite3.OperationalError as e:
             return f"ERROR: Database connection error: {str(e)} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."
-        
+
+        # List any additional (exported) Messages databases
+        other_paths = get_messages_db_paths()[1:]
+        if other_paths:
+            status.append(f"Additional Messages sources ({len(other_paths)}):")
+            for path in other_paths:
+                status.append(f" - {path}" + ("" if os.path.exists(path) else " (not found)"))
+
+        # Report where analytics reads are served from
+        if snapshot_enabled():
+            snapshot_path = resolve_read_path(db_path)
+            if snapshot_path != db_path:
+                status.append(f"Snapshot mode enabled, analytics reads use: {snapshot_path}")
+            else:
+                status.append("WARNING: Snapshot mode enabled but snapshot could not be created; reading live database")
+
         return "\n".join(status)
     except Exception as e:
         return f"ERROR: Unexpected error during database access check: {str(e)} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."
@@ -1407,13 +2758,14 @@ def find_handle_by_phone(phone: str) -> Optional[int]:
         return handles[0]
     return None
 
-def find_handles_by_phone(phone: str) -> Optional[List[int]]:
+def find_handles_by_phone(phone: str, source: Optional[DatabaseSource] = None) -> Optional[List[int]]:
     """
     Find all handle IDs by phone number, trying various formats.
     Returns all handles for multi-protocol support (iMessage, SMS, RCS).
     
     Args:
         phone: Phone number in any format
+        source: Messages database to search (default: primary)
         
     Returns:
         List of handle_id's if found, None otherwise
@@ -1436,7 +2788,7 @@ def find_handles_by_phone(phone: str) -> Optional[List[int]]:
     WHERE id IN ({placeholders})
     """
     
-    results = query_messages_db(query, tuple(formats_to_try))
+    results = query_messages_db(query, tuple(formats_to_try), source=source, label="find_handles_by_phone")
     
     if not results or "error" in results[0]:
         return None
@@ -1453,14 +2805,19 @@ def check_addressbook_access() -> str:
         sources_path = os.path.join(home_dir, "Library/Application Support/AddressBook/Sources")
         status = []
         
-        # Check if the directory exists
-        if not os.path.exists(sources_path):
-            return f"ERROR: AddressBook Sources directory not found at {sources_path} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."
-        
-        status.append(f"AddressBook Sources directory exists at: {sources_path}")
+        if ADDRESSBOOK_DB_PATHS_ENV in os.environ:
+            # Explicitly configured roots (e.g. exported copies)
+            sources_path = get_addressbook_search_pattern()
+            status.append(f"AddressBook sources configured via {ADDRESSBOOK_DB_PATHS_ENV}: {sources_path}")
+        else:
+            # Check if the directory exists
+            if not os.path.exists(sources_path):
+                return f"ERROR: AddressBook Sources directory not found at {sources_path} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."
+            
+            status.append(f"AddressBook Sources directory exists at: {sources_path}")
         
         # Find database files
-        db_paths = glob.glob(os.path.join(sources_path, "*/AddressBook-v22.abcddb"))
+        db_paths = [path for path in get_addressbook_db_paths() if os.path.exists(path)]
         
         if not db_paths:
             return f"ERROR: No AddressBook database files found in {sources_path} PLEASE TELL THE USER TO GRANT FULL DISK ACCESS TO THE TERMINAL APPLICATION(CURSOR, TERMINAL, CLAUDE, ETC.) AND RESTART THE APPLICATION. DO NOT RETRY UNTIL NEXT MESSAGE."
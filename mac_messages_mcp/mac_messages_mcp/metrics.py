@@ -0,0 +1,294 @@
+"""
+In-process metrics: latency histograms and counters.
+
+Records per-tool and per-query latency, query row counts, cache hit/miss
+counts and time spent in osascript. Metrics are exposed through the
+tool_get_metrics MCP tool and in Prometheus text format on the test server's
+/metrics endpoint.
+
+Collection is on by default and costs a lock and a few additions per sample.
+Set MAC_MESSAGES_METRICS=false to disable it; every entry point then returns
+immediately without taking locks or reading the clock.
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import tracing
+
+METRICS_ENV = "MAC_MESSAGES_METRICS"
+
+# Seconds; tuned for SQLite reads (sub-millisecond) up to slow osascript sends
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_COUNT_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+_HELP = {
+    "mcp_tool_latency_seconds": "Latency of MCP tool calls",
+    "mcp_tool_errors_total": "MCP tool calls that raised or returned an error",
+    "messages_query_latency_seconds": "Latency of SQLite queries by calling function",
+    "messages_query_rows": "Rows returned by SQLite queries by calling function",
+    "messages_cache_requests_total": "Cache lookups by cache and result",
+    "messages_osascript_seconds": "Time spent running osascript",
+}
+
+_NULL_TIMER = nullcontext()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _env_enabled() -> bool:
+    return os.environ.get(METRICS_ENV, "true").lower() not in ("0", "false", "no", "off")
+
+
+_ENABLED = _env_enabled()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with sum and count, as Prometheus expects."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside the bucket,
+        clamped to the smallest and largest values observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = self.min
+        for upper, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * ((rank - seen) / n)
+            seen += n
+            lower = max(upper, self.min)
+        return self.max
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+
+
+_REGISTRY = _Registry()
+
+
+def enabled() -> bool:
+    """Whether metrics are being collected."""
+    return _ENABLED
+
+
+def set_enabled(value: bool) -> None:
+    """Turn collection on or off at runtime (mostly for tests and benchmarks)."""
+    global _ENABLED
+    _ENABLED = value
+
+
+def reset() -> None:
+    """Drop all collected samples."""
+    with _REGISTRY.lock:
+        _REGISTRY.histograms.clear()
+        _REGISTRY.counters.clear()
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: str) -> None:
+    """Add a sample to a histogram."""
+    if not _ENABLED:
+        return
+    key = tuple(sorted(labels.items()))
+    with _REGISTRY.lock:
+        series = _REGISTRY.histograms.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def inc(name: str, amount: float = 1, **labels: str) -> None:
+    """Increment a counter."""
+    if not _ENABLED:
+        return
+    key = tuple(sorted(labels.items()))
+    with _REGISTRY.lock:
+        series = _REGISTRY.counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup for one of the package caches."""
+    if _ENABLED:
+        inc("messages_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def _timer(name: str, labels: Dict[str, str]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timer(name: str, **labels: str):
+    """Context manager timing its body into a latency histogram."""
+    if not _ENABLED:
+        return _NULL_TIMER
+    return _timer(name, labels)
+
+
+def _is_error_result(result: Any) -> bool:
+    return isinstance(result, str) and result.startswith(("Error", "An unexpected error"))
+
+
+def instrument_tool(name: str) -> Callable:
+    """
+    Decorator recording latency and errors for an MCP tool function.
+
+    Each call also runs inside a trace span. Works for sync and async tools
+    and preserves the signature FastMCP reads.
+    """
+    def decorator(fn: Callable) -> Callable:
+        def record(started: float, failed: bool) -> None:
+            observe("mcp_tool_latency_seconds", time.perf_counter() - started, tool=name)
+            if failed:
+                inc("mcp_tool_errors_total", tool=name)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not _ENABLED:
+                    with tracing.span(f"tool {name}"):
+                        return await fn(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    with tracing.span(f"tool {name}"):
+                        result = await fn(*args, **kwargs)
+                except BaseException:
+                    record(started, True)
+                    raise
+                record(started, _is_error_result(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _ENABLED:
+                with tracing.span(f"tool {name}"):
+                    return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                with tracing.span(f"tool {name}"):
+                    result = fn(*args, **kwargs)
+            except BaseException:
+                record(started, True)
+                raise
+            record(started, _is_error_result(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    with _REGISTRY.lock:
+        for name, series in sorted(_REGISTRY.counters.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(_REGISTRY.histograms.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for upper, n in zip(histogram.buckets, histogram.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{upper:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def format_summary() -> str:
+    """Human-readable summary of latency, row counts and cache hit rates."""
+    if not _ENABLED:
+        return f"Metrics are disabled. Set {METRICS_ENV}=true to enable them."
+
+    def latency_rows(name: str, label: str) -> List[str]:
+        rows = []
+        for key, h in sorted(_REGISTRY.histograms.get(name, {}).items()):
+            target = dict(key).get(label, "?")
+            rows.append(
+                f"  {target}: {h.count} calls, mean {h.total / h.count * 1000:.1f} ms, "
+                f"p50 {h.quantile(0.5) * 1000:.1f} ms, p95 {h.quantile(0.95) * 1000:.1f} ms"
+            )
+        return rows
+
+    lines: List[str] = []
+    with _REGISTRY.lock:
+        tools = latency_rows("mcp_tool_latency_seconds", "tool")
+        if tools:
+            errors = _REGISTRY.counters.get("mcp_tool_errors_total", {})
+            lines.append("Tool latency:")
+            for row, (key, _) in zip(tools, sorted(_REGISTRY.histograms["mcp_tool_latency_seconds"].items())):
+                failed = errors.get(key, 0)
+                lines.append(row + (f", {failed:g} errors" if failed else ""))
+
+        queries = latency_rows("messages_query_latency_seconds", "query")
+        if queries:
+            rows_by_query = _REGISTRY.histograms.get("messages_query_rows", {})
+            lines.append("Query latency:")
+            for row, key in zip(queries, sorted(_REGISTRY.histograms["messages_query_latency_seconds"])):
+                h = rows_by_query.get(key)
+                lines.append(row + (f", {h.total / h.count:.0f} rows avg" if h and h.count else ""))
+
+        osascript = _REGISTRY.histograms.get("messages_osascript_seconds", {}).get(())
+        if osascript:
+            lines.append(
+                f"osascript: {osascript.count} runs, {osascript.total:.2f} s total, "
+                f"mean {osascript.total / osascript.count * 1000:.0f} ms"
+            )
+
+        caches: Dict[str, Dict[str, float]] = {}
+        for key, value in _REGISTRY.counters.get("messages_cache_requests_total", {}).items():
+            labels = dict(key)
+            caches.setdefault(labels["cache"], {})[labels["result"]] = value
+        if caches:
+            lines.append("Caches:")
+            for cache, counts in sorted(caches.items()):
+                hits, misses = counts.get("hit", 0), counts.get("miss", 0)
+                lines.append(f"  {cache}: {hits:g} hits, {misses:g} misses ({hits / (hits + misses):.0%} hit rate)")
+
+    return "\n".join(lines) if lines else "No metrics recorded yet."
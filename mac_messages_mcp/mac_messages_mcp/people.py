@@ -0,0 +1,145 @@
+"""
+Person index: one entry per AddressBook contact, linked to every chat.db handle.
+
+A person in Messages can show up under several handles: the same number over
+iMessage and SMS, plus one or more iMessage email addresses. The index groups
+an AddressBook record's phone numbers (ZABCDPHONENUMBER) and email addresses
+(ZABCDEMAILADDRESS) into one Person, merges records that share an address
+(e.g. the same contact synced from two accounts), and maps each address to
+the handle ROWIDs it appears under in every Messages database.
+
+This module only builds and queries the index; messages.get_person_index()
+feeds it rows and caches the result.
+"""
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def address_key(address: Optional[str]) -> str:
+    """
+    Canonical form of a phone number or email for matching handles to contacts.
+
+    Emails are lowercased. Phone numbers keep their digits, with the US
+    country code dropped so "+1 (555) 123-4567" and "5551234567" agree.
+    """
+    if not address:
+        return ""
+    address = address.strip()
+    if "@" in address:
+        return address.lower()
+    if "X-IMAGETYPE" in address:
+        address = address.split("X-IMAGETYPE")[0]
+    digits = "".join(c for c in address if c.isdigit())
+    if len(digits) == 11 and digits.startswith("1"):
+        return digits[1:]
+    return digits
+
+
+class Person:
+    """A contact with all of their phone numbers, emails and handles."""
+
+    def __init__(self, name: str, nickname: str = ""):
+        self.name = name
+        self.nickname = nickname
+        self.phones: List[str] = []
+        self.emails: List[str] = []
+        # Messages database path -> handle ROWIDs
+        self.handle_ids: Dict[str, List[int]] = {}
+
+    @property
+    def id(self) -> str:
+        """Stable identifier derived from the person's addresses."""
+        keys = sorted(address_key(a) for a in self.phones + self.emails)
+        return "p_" + hashlib.sha1("\n".join(keys).encode()).hexdigest()[:10]
+
+    def addresses(self) -> List[str]:
+        return self.phones + self.emails
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "nickname": self.nickname,
+            "phones": list(self.phones),
+            "emails": list(self.emails),
+            "handle_ids": {path: list(ids) for path, ids in self.handle_ids.items()},
+        }
+
+
+class PersonIndex:
+    """Lookup from any phone number, email or handle to its Person."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        self.people: List[Person] = []
+        self._by_address: Dict[str, Person] = {}
+        self._by_handle: Dict[tuple, Person] = {}
+        # Every handle, including ones with no AddressBook entry
+        self._handles_by_address: Dict[str, Dict[str, List[int]]] = {}
+        # Data the index was built from (set by get_person_index), for keying derived caches
+        self.version: Optional[tuple] = None
+        self._add_records(records)
+
+    def _add_records(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Group AddressBook rows into people.
+
+        Each row has record_id, first_name, last_name, nickname, kind
+        ("phone" or "email") and address. Rows for the same record form one
+        person; a record sharing an address with an earlier person is merged
+        into it.
+        """
+        grouped: Dict[tuple, Dict[str, Any]] = {}
+        for row in records:
+            full_name = " ".join(filter(None, [row.get("first_name"), row.get("last_name")])).strip()
+            key = address_key(row.get("address"))
+            if not full_name or not key:
+                continue
+            record = grouped.setdefault(
+                (row.get("record_id"), full_name),
+                {"name": full_name, "nickname": (row.get("nickname") or "").strip(), "addresses": []},
+            )
+            record["addresses"].append((row.get("kind"), row["address"].strip(), key))
+
+        for record in grouped.values():
+            person = next(
+                (self._by_address[key] for _kind, _address, key in record["addresses"] if key in self._by_address),
+                None,
+            )
+            if person is None:
+                person = Person(record["name"], record["nickname"])
+                self.people.append(person)
+            for kind, address, key in record["addresses"]:
+                if key in self._by_address:
+                    continue
+                self._by_address[key] = person
+                (person.emails if kind == "email" or "@" in address else person.phones).append(address)
+
+    def add_handles(self, source_path: str, handles: Iterable[Dict[str, Any]]) -> None:
+        """Attach a Messages database's handle rows (ROWID, id) to their people."""
+        for row in handles:
+            key = address_key(row.get("id"))
+            if not key:
+                continue
+            self._handles_by_address.setdefault(key, {}).setdefault(source_path, []).append(row["ROWID"])
+            person = self._by_address.get(key)
+            if person is None:
+                continue
+            ids = person.handle_ids.setdefault(source_path, [])
+            if row["ROWID"] not in ids:
+                ids.append(row["ROWID"])
+            self._by_handle[(source_path, row["ROWID"])] = person
+
+    def find(self, address: str) -> Optional[Person]:
+        """The person a phone number or email belongs to."""
+        return self._by_address.get(address_key(address))
+
+    def handles_for(self, address: str) -> Dict[str, List[int]]:
+        """Handle ROWIDs per Messages database for one address, known contact or not."""
+        return {path: list(ids) for path, ids in self._handles_by_address.get(address_key(address), {}).items()}
+
+    def find_handle(self, source_path: str, handle_id: int) -> Optional[Person]:
+        """The person behind a handle ROWID in a given Messages database."""
+        return self._by_handle.get((source_path, handle_id))
+
+    def __len__(self) -> int:
+        return len(self.people)
@@ -0,0 +1,255 @@
+"""
+"Stay in touch" aggregates: when you last talked to each person and how often.
+
+For every handle in one-to-one conversations we keep the last inbound and
+outbound message time and a per-day message count. The aggregate is
+maintained incrementally: each Messages database has a ROWID watermark, and
+a refresh only reads messages added since the last one. Answering "who
+haven't I talked to lately" then needs no history scan, only the handful of
+new rows (if any) and a pass over the per-person summaries.
+
+Group chat messages and tapback reactions are not counted: outgoing group
+messages can't be attributed to one person, and reactions aren't contact.
+Deleted messages stay counted until the process restarts.
+"""
+import bisect
+import logging
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import LRUCache
+from .deadline import current_deadline
+from .messages import (
+    _messages_data_version,
+    _person_index_or_empty,
+    get_message_sources,
+    query_messages_db,
+)
+from .people import address_key
+from .sources import DatabaseSource, apple_date_to_unix
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOWS = (7, 30, 90)
+SECONDS_PER_DAY = 86400
+
+# Rows read per refresh query; the watermark advances batch by batch
+_INGEST_BATCH = 50000
+
+_INGEST_QUERY = """
+SELECT m.ROWID, m.date, m.is_from_me, h.id AS handle
+FROM message m
+JOIN handle h ON h.ROWID = m.handle_id
+WHERE m.ROWID > ?
+  AND m.cache_roomnames IS NULL
+  AND COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999
+ORDER BY m.ROWID
+LIMIT ?
+"""
+
+
+class HandleStats:
+    """Contact history for one address (phone number or email)."""
+
+    __slots__ = ("last_in", "last_out", "days", "counts", "total")
+
+    def __init__(self):
+        self.last_in = 0.0
+        self.last_out = 0.0
+        # Sorted day numbers (Unix days) with messages, and the count on each
+        self.days: List[int] = []
+        self.counts: List[int] = []
+        self.total = 0
+
+    def add(self, unix_time: float, is_from_me: bool) -> None:
+        if is_from_me:
+            self.last_out = max(self.last_out, unix_time)
+        else:
+            self.last_in = max(self.last_in, unix_time)
+        self.total += 1
+        day = int(unix_time // SECONDS_PER_DAY)
+        # Messages arrive in ROWID order, so this is almost always the last day
+        if self.days and self.days[-1] == day:
+            self.counts[-1] += 1
+            return
+        i = bisect.bisect_left(self.days, day)
+        if i < len(self.days) and self.days[i] == day:
+            self.counts[i] += 1
+        else:
+            self.days.insert(i, day)
+            self.counts.insert(i, 1)
+
+
+class _SourceState:
+    """Watermark and per-address stats for one Messages database."""
+
+    def __init__(self):
+        self.watermark = 0
+        self.stats: Dict[str, HandleStats] = {}
+
+
+_STATE: Dict[str, _SourceState] = {}
+_STATE_LOCK = threading.Lock()
+# Per-person summaries keyed by (database versions, person index version, day)
+_SUMMARY_CACHE = LRUCache("contact_summaries", 2)
+
+
+def _ingest(source: DatabaseSource, state: _SourceState) -> int:
+    """Read messages past the watermark into state. Returns rows read."""
+    try:
+        max_rowid = source.data_version()[1] or 0
+    except Exception:
+        max_rowid = None
+    if max_rowid is not None and max_rowid < state.watermark:
+        # A different (or restored) database: start over
+        state.watermark, state.stats = 0, {}
+    if max_rowid is not None and max_rowid == state.watermark:
+        return 0
+
+    read = 0
+    while True:
+        rows = query_messages_db(
+            _INGEST_QUERY, (state.watermark, _INGEST_BATCH), snapshot=True, source=source,
+            label="get_contact_summaries",
+        )
+        if rows and "error" in rows[0]:
+            logger.warning("Could not refresh contact history from %s: %s", source.path, rows[0]["error"])
+            return read
+        for row in rows:
+            key = address_key(row["handle"])
+            if key and row["date"]:
+                stats = state.stats.get(key)
+                if stats is None:
+                    stats = state.stats[key] = HandleStats()
+                stats.add(apple_date_to_unix(row["date"]), bool(row["is_from_me"]))
+        if rows:
+            state.watermark = rows[-1]["ROWID"]
+        read += len(rows)
+        # A short batch means we're caught up (or a deadline cut the read short)
+        if len(rows) < _INGEST_BATCH:
+            return read
+        if max_rowid is not None and state.watermark >= max_rowid:
+            return read
+
+
+def refresh() -> int:
+    """Bring every source's aggregate up to date. Returns new rows read."""
+    read = 0
+    with _STATE_LOCK:
+        for source in get_message_sources():
+            state = _STATE.setdefault(source.path, _SourceState())
+            read += _ingest(source, state)
+    return read
+
+
+def reset() -> None:
+    """Forget all aggregates (the next refresh rescans history)."""
+    with _STATE_LOCK:
+        _STATE.clear()
+    _SUMMARY_CACHE.clear()
+
+
+def _summarize(name: str, person_id: Optional[str], stats: List[HandleStats], today: int) -> Dict[str, Any]:
+    """Combine one person's per-address stats into a summary."""
+    day_counts: Dict[int, int] = {}
+    for s in stats:
+        for day, count in zip(s.days, s.counts):
+            day_counts[day] = day_counts.get(day, 0) + count
+    days = sorted(day_counts)
+
+    rolling = {}
+    for window in ROLLING_WINDOWS:
+        start = bisect.bisect_left(days, today - window + 1)
+        rolling[f"messages_{window}d"] = sum(day_counts[d] for d in days[start:])
+
+    gaps = [b - a for a, b in zip(days, days[1:])]
+    last_in = max(s.last_in for s in stats)
+    last_out = max(s.last_out for s in stats)
+    return {
+        "person_id": person_id,
+        "name": name,
+        "last_inbound": last_in or None,
+        "last_outbound": last_out or None,
+        "last_contact": max(last_in, last_out) or None,
+        "total_messages": sum(s.total for s in stats),
+        "active_days": len(days),
+        # Median days between days you talked; None until there are two
+        "cadence_days": statistics.median(gaps) if gaps else None,
+        **rolling,
+    }
+
+
+def get_contact_summaries() -> List[Dict[str, Any]]:
+    """
+    Per-person contact history across all sources.
+
+    Addresses that belong to the same AddressBook person (their numbers and
+    iMessage emails) are combined; addresses with no contact entry are
+    reported on their own, named by the address.
+
+    Returns:
+        Dicts with person_id, name, last_inbound, last_outbound, last_contact
+        (Unix seconds or None), total_messages, active_days, cadence_days and
+        messages_7d / messages_30d / messages_90d
+    """
+    refresh()
+    index = _person_index_or_empty()
+
+    today = int(time.time() // SECONDS_PER_DAY)
+    key = (_messages_data_version(), index.version, today)
+    cacheable = key[0] is not None and key[1] is not None
+    if cacheable:
+        cached = _SUMMARY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    grouped: Dict[str, Tuple[str, Optional[str], List[HandleStats]]] = {}
+    with _STATE_LOCK:
+        for state in _STATE.values():
+            for address, stats in state.stats.items():
+                person = index.find(address)
+                group = person.id if person is not None else address
+                if group not in grouped:
+                    grouped[group] = (person.name if person else address, person.id if person else None, [])
+                grouped[group][2].append(stats)
+        summaries = [_summarize(name, pid, stats, today) for name, pid, stats in grouped.values()]
+
+    deadline = current_deadline()
+    # Stats ingested under a cut-short time budget are partial; don't serve them again
+    if cacheable and not (deadline is not None and deadline.truncated):
+        _SUMMARY_CACHE.put(key, summaries)
+    return summaries
+
+
+def get_overdue_contacts(days: int = 21, limit: int = 20, min_messages: int = 5) -> List[Dict[str, Any]]:
+    """
+    People you haven't exchanged a message with in at least `days` days.
+
+    Only people with at least `min_messages` messages of history are
+    considered. Results are ordered by how overdue they are relative to
+    your usual cadence with them (a weekly contact silent for a month comes
+    before a monthly contact silent for five weeks).
+
+    Args:
+        days: Minimum days since the last message in either direction
+        limit: Maximum number of people to return
+        min_messages: Minimum total messages to count as someone you keep in touch with
+
+    Returns:
+        Contact summaries (see get_contact_summaries) with "days_since"
+        and "overdue_ratio" added
+    """
+    now = time.time()
+    overdue = []
+    for summary in get_contact_summaries():
+        if not summary["last_contact"] or summary["total_messages"] < min_messages:
+            continue
+        days_since = (now - summary["last_contact"]) / SECONDS_PER_DAY
+        if days_since < days:
+            continue
+        cadence = summary["cadence_days"] or days
+        overdue.append(dict(summary, days_since=round(days_since, 1), overdue_ratio=round(days_since / max(cadence, 1), 2)))
+    overdue.sort(key=lambda s: (s["overdue_ratio"], s["total_messages"]), reverse=True)
+    return overdue[:limit]
@@ -0,0 +1,177 @@
+"""
+Per-session contact disambiguation state.
+
+When a name matches several contacts, the candidates are saved as a selection
+in the caller's session and a token is returned alongside the numbered list.
+A later call can then pick one with "contact:N" (the session's most recent
+selection) or "<token>:N" (a specific selection, e.g. sel_1a2b3c4d:2).
+
+Sessions are identified by a context variable that the MCP server sets per
+call (one session per connected client); library and CLI callers share the
+"default" session. Both sessions and the selections inside them are evicted
+least-recently-used first, so the store stays bounded however many clients
+connect.
+"""
+import contextvars
+import hashlib
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+DEFAULT_SESSION = "default"
+MAX_SESSIONS = 256
+MAX_SELECTIONS_PER_SESSION = 16
+
+_TOKEN_PATTERN = re.compile(r"^(sel_[0-9a-f]{8}):\s*(.+)$", re.IGNORECASE)
+
+_current_session: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "selection_session", default=DEFAULT_SESSION
+)
+
+
+class SelectionStore:
+    """LRU of sessions, each holding an LRU of token -> candidate contacts."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, max_selections: int = MAX_SELECTIONS_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.max_selections = max_selections
+        self._sessions: "OrderedDict[str, OrderedDict[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, session: str) -> "OrderedDict[str, List[Dict[str, Any]]]":
+        selections = self._sessions.get(session)
+        if selections is None:
+            selections = self._sessions[session] = OrderedDict()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session)
+        return selections
+
+    def save(self, matches: List[Dict[str, Any]], session: Optional[str] = None) -> str:
+        """Store candidates and return their token (stable for the same candidate list)."""
+        token = make_token(matches)
+        with self._lock:
+            selections = self._session(session or _current_session.get())
+            selections[token] = list(matches)
+            selections.move_to_end(token)
+            while len(selections) > self.max_selections:
+                selections.popitem(last=False)
+        return token
+
+    def get(self, token: Optional[str] = None, session: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Candidates for a token, or the session's latest selection when token is None."""
+        with self._lock:
+            selections = self._sessions.get(session or _current_session.get())
+            if not selections:
+                return None
+            if token is None:
+                return list(next(reversed(selections.values())))
+            matches = selections.get(token.lower())
+            if matches is None:
+                return None
+            selections.move_to_end(token.lower())
+            return list(matches)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+
+def make_token(matches: List[Dict[str, Any]]) -> str:
+    """Deterministic token for a candidate list."""
+    key = "\n".join(f"{m.get('name')}\t{m.get('phone')}" for m in matches)
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f"sel_{digest[:8]}"
+
+
+_STORE = SelectionStore()
+
+
+def get_selection_store() -> SelectionStore:
+    return _STORE
+
+
+def current_session() -> str:
+    return _current_session.get()
+
+
+@contextmanager
+def selection_session(session: Optional[str]) -> Iterator[None]:
+    """Scope selections made and resolved in the body to one session."""
+    token = _current_session.set(session or DEFAULT_SESSION)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def session_key(session_obj: Any) -> str:
+    """Stable key for a client session object (e.g. an MCP ServerSession)."""
+    if session_obj is None:
+        return DEFAULT_SESSION
+    key = getattr(session_obj, "_selection_key", None)
+    if key is None:
+        key = uuid.uuid4().hex
+        try:
+            setattr(session_obj, "_selection_key", key)
+        except AttributeError:
+            return f"id-{id(session_obj)}"
+    return key
+
+
+def is_selection(value: str) -> bool:
+    """True for "contact:N" and "<token>:N" selection strings."""
+    value = value.strip()
+    return value.lower().startswith("contact:") or bool(_TOKEN_PATTERN.match(value))
+
+
+def save_selection(matches: List[Dict[str, Any]]) -> str:
+    """Save ambiguous matches in the current session and return their token."""
+    return _STORE.save(matches)
+
+
+def format_selection_prompt(query: str, matches: List[Dict[str, Any]], token: str, limit: int = 10) -> str:
+    """The "multiple contacts" reply listing numbered candidates and the token."""
+    contact_list = "\n".join(f"{i + 1}. {c['name']} ({c['phone']})" for i, c in enumerate(matches[:limit]))
+    return (
+        f"Multiple contacts found matching '{query}'. Please specify which one using "
+        f"'contact:N' (or '{token}:N') where N is the number:\n{contact_list}"
+    )
+
+
+def resolve_selection(value: str) -> Union[Dict[str, Any], str]:
+    """
+    Resolve "contact:N" or "<token>:N" to the chosen contact.
+
+    Returns:
+        The selected match dict, or an error string starting with "Error"
+        or "No recent contact matches"
+    """
+    value = value.strip()
+    token_match = _TOKEN_PATTERN.match(value)
+    if token_match:
+        token, number = token_match.group(1), token_match.group(2)
+    else:
+        token, number = None, value.split(":", 1)[1]
+
+    number = number.strip()
+    if not number:
+        return "Error: Invalid contact selection format. Use 'contact:N' where N is a positive number."
+    try:
+        index = int(number) - 1
+    except ValueError:
+        return "Error: Contact selection must be a number. Use 'contact:N' where N is a positive number."
+    if index < 0:
+        return "Error: Contact selection must be a positive number (starting from 1)."
+
+    matches = _STORE.get(token)
+    if not matches:
+        if token:
+            return f"Error: Selection {token} has expired or belongs to another session. Please search for the contact again."
+        return "No recent contact matches available. Please search for a contact first."
+    if index >= len(matches):
+        return f"Invalid selection. Please choose a number between 1 and {len(matches)}."
+    return matches[index]
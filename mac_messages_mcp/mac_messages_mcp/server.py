@@ -3,89 +3,125 @@
 Mac Messages MCP - Entry point fixed for proper MCP protocol implementation
 """
 
+import argparse
 import asyncio
+import json
 import logging
+import os
 import sys
+from datetime import datetime, timezone
 
 from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
 
+from mac_messages_mcp import metrics
+from mac_messages_mcp.analytics import WEEKDAYS, get_conversation_analytics
+from mac_messages_mcp.deadline import cancellable_tool
+from mac_messages_mcp.formatting import budget_chars, render_compact
+from mac_messages_mcp.logs import configure_logging, log_tool_call
 from mac_messages_mcp.messages import (
+    MAX_RESOLVE_BATCH,
     _check_imessage_availability,
     check_addressbook_access,
     check_messages_db_access,
     find_contact_by_name,
     fuzzy_search_messages,
+    get_attachments,
     get_cached_contacts,
+    get_chat_directory,
+    get_chat_messages,
+    get_latest_messages,
     get_recent_messages,
-    query_messages_db,
+    get_thread,
+    format_reactions,
+    format_reply_trees,
+    pick_dominant_contact,
+    resolve_contacts,
     send_message,
 )
-
-# Configure logging to stderr for debugging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    stream=sys.stderr
+from mac_messages_mcp.relationships import get_overdue_contacts
+from mac_messages_mcp.selections import (
+    save_selection,
+    selection_session,
+    session_key,
 )
 
 logger = logging.getLogger("mac_messages_mcp")
 
 
 def _log_tool_invocation(tool_name: str, **kwargs) -> None:
-    """Log when an MCP tool is invoked (e.g. by a Poke AI agent)."""
-    args_str = " ".join(f"{k}={v!r}" for k, v in kwargs.items() if v is not None)
-    logger.info("[MCP] Tool invoked: %s%s", tool_name, f" ({args_str})" if args_str else "")
+    """Log when an MCP tool is invoked (e.g. by a Poke AI agent), sampled and with long arguments cut."""
+    log_tool_call(logger, tool_name, **kwargs)
+
+
+def _client_session(ctx: Context) -> str:
+    """Key for the connected client, so contact:N selections don't leak between clients."""
+    try:
+        return session_key(ctx.session)
+    except (ValueError, AttributeError):
+        # Called outside a request (e.g. directly from tests)
+        return session_key(None)
 
 
 # Initialize the MCP server
 mcp = FastMCP("MessageBridge")
 
 @mcp.tool()
-def tool_get_recent_messages(ctx: Context, hours: int = 24, contact: str = None) -> str:
+@metrics.instrument_tool("get_recent_messages")
+@cancellable_tool
+def tool_get_recent_messages(ctx: Context, hours: int = 24, contact: str = None, max_tokens: int = None) -> str:
     """
     Get recent messages from the Messages app.
     
     Args:
         hours: Number of hours to look back (default: 24)
         contact: Filter by contact name, phone number, or email (optional)
-                Use "contact:N" to select a specific contact from previous matches
+                Use "contact:N" to select a specific contact from your previous matches,
+                or "<token>:N" (e.g. "sel_1a2b3c4d:2") for a specific earlier selection
+        max_tokens: Keep the reply within about this many tokens (optional). Switches to a
+                    compact format that groups consecutive messages by sender with relative times.
     """
-    _log_tool_invocation("get_recent_messages", hours=hours, contact=contact)
-    logger.info("Getting recent messages: hours=%s, contact=%s", hours, contact)
+    _log_tool_invocation("get_recent_messages", hours=hours, contact=contact, max_tokens=max_tokens)
     try:
         # Handle contacts that are passed as numbers
         if contact is not None:
             contact = str(contact)
-        result = get_recent_messages(hours=hours, contact=contact)
+        with selection_session(_client_session(ctx)):
+            result = get_recent_messages(hours=hours, contact=contact, max_tokens=max_tokens)
         return result
     except Exception as e:
         logger.error(f"Error in get_recent_messages: {str(e)}")
         return f"Error getting messages: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("send_message")
+@cancellable_tool
 def tool_send_message(ctx: Context, recipient: str, message: str, group_chat: bool = False) -> str:
     """
     Send a message using the Messages app.
     
     Args:
         recipient: Phone number, email, contact name, or "contact:N" to select from matches.
-                  For example, "contact:1" selects the first contact from a previous search.
+                  For example, "contact:1" selects the first contact from a previous search;
+                  "<token>:N" picks from a specific earlier selection.
                   For group chats, use the chat ID from tool_get_chats (e.g., "chat123456789" or "iMessage;-;chat123456789").
         message: Message text to send
         group_chat: Set to True when sending to a group chat. Uses the chat ID directly without contact lookup.
     """
     _log_tool_invocation("send_message", recipient=recipient, group_chat=group_chat)
-    logger.info("Sending message to: %s, group_chat: %s", recipient, group_chat)
     try:
         # Ensure recipient is a string (handles numbers properly)
         recipient = str(recipient)
-        result = send_message(recipient=recipient, message=message, group_chat=group_chat)
+        with selection_session(_client_session(ctx)):
+            result = send_message(recipient=recipient, message=message, group_chat=group_chat)
         return result
     except Exception as e:
         logger.error(f"Error in send_message: {str(e)}")
         return f"Error sending message: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("find_contact")
+@cancellable_tool
 def tool_find_contact(ctx: Context, name: str) -> str:
     """
     Find a contact by name using fuzzy matching.
@@ -94,7 +130,6 @@ def tool_find_contact(ctx: Context, name: str) -> str:
         name: The name to search for
     """
     _log_tool_invocation("find_contact", name=name)
-    logger.info("Finding contact: %s", name)
     try:
         matches = find_contact_by_name(name)
         
@@ -105,13 +140,26 @@ def tool_find_contact(ctx: Context, name: str) -> str:
             contact = matches[0]
             return f"Found contact: {contact['name']} ({contact['phone']}) with confidence {contact['score']:.2f}"
         else:
-            # Format multiple matches
-            result = [f"Found {len(matches)} contacts matching '{name}':"]
+            # Format multiple matches and keep them for a later contact:N
+            with selection_session(_client_session(ctx)):
+                token = save_selection(matches)
+            result = [f"Found {len(matches)} contacts matching '{name}' (selection {token}):"]
             for i, contact in enumerate(matches[:10]):  # Limit to top 10
-                result.append(f"{i+1}. {contact['name']} ({contact['phone']}) - confidence {contact['score']:.2f}")
+                result.append(
+                    f"{i+1}. {contact['name']} ({contact['phone']}) - confidence {contact['score']:.2f}, "
+                    f"{contact.get('messages', 0)} messages"
+                )
+            
+            dominant = pick_dominant_contact(matches)
+            if dominant is not None:
+                result.append(
+                    f"Most likely: {dominant['name']} (used automatically when reading messages for '{name}'; "
+                    "sending always asks)."
+                )
             
             if len(matches) > 10:
                 result.append(f"...and {len(matches) - 10} more.")
+            result.append(f"Use 'contact:N' (or '{token}:N') with get_recent_messages or send_message to pick one.")
             
             return "\n".join(result)
     except Exception as e:
@@ -119,12 +167,13 @@ def tool_find_contact(ctx: Context, name: str) -> str:
         return f"Error finding contact: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("check_db_access")
+@cancellable_tool
 def tool_check_db_access(ctx: Context) -> str:
     """
     Diagnose database access issues.
     """
     _log_tool_invocation("check_db_access")
-    logger.info("Checking database access")
     try:
         return check_messages_db_access()
     except Exception as e:
@@ -132,12 +181,13 @@ def tool_check_db_access(ctx: Context) -> str:
         return f"Error checking database access: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("check_contacts")
+@cancellable_tool
 def tool_check_contacts(ctx: Context) -> str:
     """
     List available contacts in the address book.
     """
     _log_tool_invocation("check_contacts")
-    logger.info("Checking available contacts")
     try:
         contacts = get_cached_contacts()
         if not contacts:
@@ -159,12 +209,13 @@ def tool_check_contacts(ctx: Context) -> str:
         return f"Error checking contacts: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("check_addressbook")
+@cancellable_tool
 def tool_check_addressbook(ctx: Context) -> str:
     """
     Diagnose AddressBook access issues.
     """
     _log_tool_invocation("check_addressbook")
-    logger.info("Checking AddressBook access")
     try:
         return check_addressbook_access()
     except Exception as e:
@@ -172,39 +223,118 @@ def tool_check_addressbook(ctx: Context) -> str:
         return f"Error checking AddressBook: {str(e)}"
 
 @mcp.tool()
-def tool_get_chats(ctx: Context) -> str:
+@metrics.instrument_tool("get_chats")
+@cancellable_tool
+def tool_get_chats(
+    ctx: Context,
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "recent",
+    include_direct: bool = False,
+) -> str:
     """
-    List available group chats from the Messages app.
+    List group chats from the Messages app with their members and last activity.
+    
+    Args:
+        limit: Chats per page (default: 50, max 500)
+        offset: Number of chats to skip, for the next page (default: 0)
+        sort: "recent" (last message first), "name" or "participants" (default: "recent")
+        include_direct: Also list one-to-one conversations (default: False)
     """
-    _log_tool_invocation("get_chats")
-    logger.info("Getting available chats")
+    _log_tool_invocation("get_chats", limit=limit, offset=offset, sort=sort, include_direct=include_direct or None)
     try:
-        query = "SELECT chat_identifier, display_name FROM chat WHERE display_name IS NOT NULL"
-        results = query_messages_db(query)
-        
-        if not results:
-            return "No group chats found."
+        directory = get_chat_directory(limit=limit, offset=offset, sort=sort, include_direct=include_direct)
         
-        if "error" in results[0]:
-            return f"Error accessing chats: {results[0]['error']}"
+        if "error" in directory:
+            return f"Error accessing chats: {directory['error']}"
         
-        # Filter out chats without display names and format the results
-        chats = [r for r in results if r.get('display_name')]
-        
-        if not chats:
-            return "No named group chats found."
+        if not directory["chats"]:
+            return "No group chats found." if offset == 0 else f"No more chats after {offset}."
         
         formatted_chats = []
-        for i, chat in enumerate(chats, 1):
-            formatted_chats.append(f"{i}. {chat['display_name']} (ID: {chat['chat_identifier']})")
+        for i, chat in enumerate(directory["chats"], offset + 1):
+            members = ", ".join(chat["members"][:8])
+            if len(chat["members"]) > 8:
+                members += f" and {len(chat['members']) - 8} more"
+            name = chat["display_name"] or members or "Unnamed chat"
+            last = f", last message {chat['last_message']}" if chat["last_message"] else ""
+            formatted_chats.append(
+                f"{i}. {name} (ID: {chat['chat_id']}) - {chat['participants']} participants: {members}{last}"
+            )
         
-        return "Available group chats:\n" + "\n".join(formatted_chats)
+        header = f"Chats {offset + 1}-{offset + len(directory['chats'])} of {directory['total']}:"
+        result = header + "\n" + "\n".join(formatted_chats)
+        if directory["next_offset"] is not None:
+            result += f"\nUse offset={directory['next_offset']} for more."
+        return result
     except Exception as e:
         logger.error(f"Error getting chats: {str(e)}")
         return f"Error getting chats: {str(e)}"
 
 
+def _chat_message_body(message: dict) -> str:
+    """A get_chat_messages body with its folded reactions appended."""
+    body = message["body"] or "[No displayable content]"
+    if message["reactions"]:
+        body += " " + format_reactions(message["reactions"])
+    return body
+
+
 @mcp.tool()
+@metrics.instrument_tool("get_chat_messages")
+@cancellable_tool
+def tool_get_chat_messages(
+    ctx: Context, chat_id: str, cursor: str = None, limit: int = 50, max_tokens: int = None
+) -> str:
+    """
+    Read messages from one chat (e.g. a group chat), newest first, a page at a time.
+    
+    Args:
+        chat_id: Chat ID from tool_get_chats (e.g. "chat123456789")
+        cursor: Cursor from the previous page to read older messages (optional)
+        limit: Messages per page (default: 50, max 200)
+        max_tokens: Keep the reply within about this many tokens (optional). Switches to a
+                    compact format that groups consecutive messages by sender with relative times.
+    """
+    _log_tool_invocation("get_chat_messages", chat_id=chat_id, cursor=cursor, limit=limit, max_tokens=max_tokens)
+    try:
+        page = get_chat_messages(chat_id, cursor=cursor, limit=limit)
+        
+        if "error" in page:
+            return f"Error reading chat: {page['error']}"
+        
+        if not page["messages"]:
+            return f"No messages found in chat {chat_id}."
+        
+        if max_tokens is not None:
+            text = render_compact(
+                [
+                    {"time": m["timestamp"], "sender": m["sender"], "body": _chat_message_body(m)}
+                    for m in page["messages"]
+                ],
+                datetime.now(timezone.utc),
+                max_chars=budget_chars(max_tokens=max_tokens),
+            )
+            if page["next_cursor"]:
+                text += f"\nOlder messages: cursor={page['next_cursor']}"
+            return text
+        
+        lines = [
+            f"[{m['date']}] {m['sender']}: {_chat_message_body(m)}"
+            + (f" (reply in thread {m['reply_to']})" if m["reply_to"] else "")
+            for m in page["messages"]
+        ]
+        if page["next_cursor"]:
+            lines.append(f"Older messages: cursor={page['next_cursor']}")
+        return "\n".join(lines)
+    except Exception as e:
+        logger.error(f"Error in get_chat_messages: {str(e)}")
+        return f"Error reading chat: {str(e)}"
+
+
+@mcp.tool()
+@metrics.instrument_tool("check_imessage_availability")
+@cancellable_tool
 def tool_check_imessage_availability(ctx: Context, recipient: str) -> str:
     """
     Check if a recipient has iMessage available.
@@ -216,7 +346,6 @@ def tool_check_imessage_availability(ctx: Context, recipient: str) -> str:
         recipient: Phone number or email to check for iMessage availability
     """
     _log_tool_invocation("check_imessage_availability", recipient=recipient)
-    logger.info("Checking iMessage availability for: %s", recipient)
     try:
         recipient = str(recipient)
         has_imessage = _check_imessage_availability(recipient)
@@ -234,6 +363,8 @@ def tool_check_imessage_availability(ctx: Context, recipient: str) -> str:
         return f"Error checking iMessage availability: {str(e)}"
 
 @mcp.tool()
+@metrics.instrument_tool("fuzzy_search_messages")
+@cancellable_tool
 def tool_fuzzy_search_messages(
     ctx: Context, search_term: str, hours: int = 24, threshold: float = 0.6
 ) -> str:
@@ -257,12 +388,6 @@ def tool_fuzzy_search_messages(
         hours=hours,
         threshold=threshold,
     )
-    logger.info(
-        "Fuzzy searching messages for %r in last %s hours with threshold %s",
-        search_term,
-        hours,
-        threshold,
-    )
     try:
         result = fuzzy_search_messages(
             search_term=search_term, hours=hours, threshold=threshold
@@ -273,6 +398,247 @@ def tool_fuzzy_search_messages(
         return f"An unexpected error occurred during fuzzy message search: {str(e)}"
 
 
+@mcp.tool()
+@metrics.instrument_tool("resolve_contacts")
+@cancellable_tool
+def tool_resolve_contacts(ctx: Context, queries: list[str]) -> str:
+    """
+    Resolve many contact names, phone numbers and emails in one call.
+
+    Use this instead of calling find_contact repeatedly (e.g. when building a
+    recap for a list of people).
+    
+    Args:
+        queries: Names, phone numbers or email addresses (up to 1000)
+    
+    Returns:
+        JSON list with one entry per query: status ("resolved", "ambiguous",
+        "handle_only" or "not_found"), the person (name, phones, emails and
+        handle_ids per Messages database) and ranked candidates when ambiguous
+    """
+    _log_tool_invocation("resolve_contacts", count=len(queries))
+    if len(queries) > MAX_RESOLVE_BATCH:
+        return f"Error: Too many queries ({len(queries)}). Resolve at most {MAX_RESOLVE_BATCH} per call."
+    try:
+        return json.dumps(resolve_contacts(queries))
+    except Exception as e:
+        logger.error(f"Error in resolve_contacts: {str(e)}")
+        return f"Error resolving contacts: {str(e)}"
+
+
+@mcp.tool()
+@metrics.instrument_tool("get_latest_messages")
+@cancellable_tool
+def tool_get_latest_messages(ctx: Context, contacts: list[str], hours: int = 1) -> str:
+    """
+    Get the newest message from each of many contacts in one call.
+
+    Use this to poll several conversations at once instead of calling
+    get_recent_messages per contact.
+    
+    Args:
+        contacts: Names, phone numbers or email addresses (up to 1000)
+        hours: How far back to look (default: 1)
+    
+    Returns:
+        JSON object mapping each contact to {body, is_from_me, date} (date is
+        an Apple timestamp), or null when there is no message in the window
+    """
+    _log_tool_invocation("get_latest_messages", count=len(contacts), hours=hours)
+    if len(contacts) > MAX_RESOLVE_BATCH:
+        return f"Error: Too many contacts ({len(contacts)}). Poll at most {MAX_RESOLVE_BATCH} per call."
+    try:
+        return json.dumps(get_latest_messages(contacts, hours=hours))
+    except Exception as e:
+        logger.error(f"Error in get_latest_messages: {str(e)}")
+        return f"Error getting latest messages: {str(e)}"
+
+
+@mcp.tool()
+@metrics.instrument_tool("get_attachments")
+@cancellable_tool
+def tool_get_attachments(
+    ctx: Context, chat_id: str, cursor: str = None, limit: int = 50, mime_type: str = None
+) -> str:
+    """
+    List the photos, videos and files shared in a chat, newest first, a page at a time.
+
+    Only metadata is returned (name, type, size, sender, date); files are not opened.
+    
+    Args:
+        chat_id: Chat ID from tool_get_chats (e.g. "chat123456789")
+        cursor: Cursor from the previous page to list older attachments (optional)
+        limit: Attachments per page (default: 50, max 200)
+        mime_type: Only list types starting with this, e.g. "image/" or "application/pdf" (optional)
+    """
+    _log_tool_invocation("get_attachments", chat_id=chat_id, cursor=cursor, limit=limit, mime_type=mime_type)
+    try:
+        page = get_attachments(chat_id, cursor=cursor, limit=limit, mime_type=mime_type)
+    except Exception as e:
+        logger.error(f"Error in get_attachments: {str(e)}")
+        return f"Error listing attachments: {str(e)}"
+    if "error" in page:
+        return f"Error listing attachments: {page['error']}"
+    if not page["attachments"]:
+        return f"No attachments found in chat {chat_id}."
+
+    lines = [f"{page['total']} attachments in {chat_id}:"]
+    for a in page["attachments"]:
+        if not a["size"]:
+            size = "unknown size"
+        elif a["size"] >= 1024 * 1024:
+            size = f"{a['size'] / (1024 * 1024):.1f} MB"
+        else:
+            size = f"{a['size'] / 1024:.0f} KB"
+        lines.append(f"[{a['date']}] {a['sender']}: {a['name'] or 'unnamed'} ({a['mime_type'] or 'unknown type'}, {size})")
+    if page["next_cursor"]:
+        lines.append(f"Older attachments: cursor={page['next_cursor']}")
+    return "\n".join(lines)
+
+
+@mcp.tool()
+@metrics.instrument_tool("get_thread")
+@cancellable_tool
+def tool_get_thread(ctx: Context, message_guid: str, format: str = "text", limit: int = 200) -> str:
+    """
+    Show a whole inline-reply thread: the original message and every reply to it, nested.
+
+    Args:
+        message_guid: guid of any message in the thread, e.g. the thread ID shown
+                      by tool_get_chat_messages for a reply
+        format: "text" for an indented view, or "json" for nested objects with
+                guid, date, sender, is_from_me, body and replies
+        limit: Maximum messages to include (default: 200, max 500)
+    """
+    _log_tool_invocation("get_thread", message_guid=message_guid, format=format, limit=limit)
+    try:
+        thread = get_thread(message_guid, limit=limit)
+    except Exception as e:
+        logger.error(f"Error in get_thread: {str(e)}")
+        return f"Error reading thread: {str(e)}"
+    if "error" in thread:
+        return f"Error reading thread: {thread['error']}"
+    if format == "json":
+        return json.dumps(thread)
+    text = format_reply_trees(thread["thread"])
+    if thread["truncated"]:
+        text += f"\n(First {thread['messages']} messages shown; raise limit for more.)"
+    return text
+
+
+@mcp.tool()
+@metrics.instrument_tool("get_overdue_contacts")
+@cancellable_tool
+def tool_get_overdue_contacts(ctx: Context, days: int = 21, limit: int = 20, min_messages: int = 5) -> str:
+    """
+    Find people you usually keep in touch with but haven't messaged lately.
+
+    Only one-to-one conversations count. People are ordered by how long the
+    silence is compared with how often you normally talk.
+    
+    Args:
+        days: Minimum days since the last message in either direction (default: 21)
+        limit: Maximum number of people to list (default: 20)
+        min_messages: Ignore people with fewer messages than this in total (default: 5)
+    
+    Returns:
+        One line per person with days since last contact, usual cadence and recent message counts
+    """
+    _log_tool_invocation("get_overdue_contacts", days=days, limit=limit)
+    try:
+        overdue = get_overdue_contacts(days=days, limit=limit, min_messages=min_messages)
+    except Exception as e:
+        logger.error(f"Error in get_overdue_contacts: {str(e)}")
+        return f"Error finding overdue contacts: {str(e)}"
+    if not overdue:
+        return f"No one you message regularly has been quiet for {days} days or more."
+
+    lines = [f"{len(overdue)} people you haven't messaged in {days}+ days:"]
+    for person in overdue:
+        cadence = person["cadence_days"]
+        usual = f"usually every {cadence:g} days" if cadence is not None else "no regular cadence"
+        lines.append(
+            f"- {person['name']}: {person['days_since']:g} days ago ({usual}; "
+            f"{person['messages_90d']} messages in 90 days, {person['total_messages']} total)"
+        )
+    return "\n".join(lines)
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+@mcp.tool()
+@metrics.instrument_tool("get_conversation_analytics")
+@cancellable_tool
+def tool_get_conversation_analytics(
+    ctx: Context, contact: str = None, chat_id: str = None, gap_hours: float = 6, format: str = "summary"
+) -> str:
+    """
+    Analyze a whole conversation history: reply times, when you talk and who reaches out first.
+
+    Give either a contact (direct messages with that person, across all of
+    their numbers and emails) or a chat_id from tool_get_chats.
+    
+    Args:
+        contact: Name, phone number or email address
+        chat_id: Chat ID from tool_get_chats (e.g. "chat123456789")
+        gap_hours: Hours of silence after which the next message starts a new conversation (default: 6)
+        format: "summary" for a readable report, or "json" for the full statistics
+                including the 7x24 weekday-by-hour message counts (Monday first)
+    """
+    _log_tool_invocation("get_conversation_analytics", contact=contact, chat_id=chat_id, gap_hours=gap_hours)
+    try:
+        stats = get_conversation_analytics(contact=contact, chat_id=chat_id, gap_hours=gap_hours)
+    except Exception as e:
+        logger.error(f"Error in get_conversation_analytics: {str(e)}")
+        return f"Error analyzing conversation: {str(e)}"
+    if "error" in stats:
+        return f"Error analyzing conversation: {stats['error']}"
+    if format == "json":
+        return json.dumps(stats)
+
+    conversations = stats["conversations"]
+    lines = [
+        f"{stats['label']}: {stats['messages']} messages ({stats['sent']} sent by you), "
+        f"{conversations['count']} conversations, {conversations['started_by_me']} started by you "
+        f"({conversations['initiation_ratio']:.0%})"
+    ]
+    for who, label in (("me", "Your replies"), ("them", "Replies to you")):
+        latency = stats["reply_latency"][who]
+        if latency["count"]:
+            lines.append(
+                f"{label}: median {_format_duration(latency['median_seconds'])}, "
+                f"90% within {_format_duration(latency['p90_seconds'])} ({latency['count']} replies)"
+            )
+    heatmap = stats["heatmap"]
+    by_day = [sum(row) for row in heatmap]
+    by_hour = [sum(column) for column in zip(*heatmap)]
+    busiest_hours = sorted(range(24), key=lambda h: by_hour[h], reverse=True)[:3]
+    lines.append(f"Busiest day: {WEEKDAYS[by_day.index(max(by_day))]}; "
+                 f"busiest hours: {', '.join(f'{h:02d}:00' for h in busiest_hours)}")
+    return "\n".join(lines)
+
+
+@mcp.tool()
+def tool_get_metrics(ctx: Context, format: str = "summary") -> str:
+    """
+    Report latency and cache statistics collected by this server.
+
+    Args:
+        format: "summary" for per-tool and per-query latency (p50/p95), row counts
+                and cache hit rates, or "prometheus" for the raw exposition text
+    """
+    _log_tool_invocation("get_metrics", format=format)
+    if format == "prometheus":
+        return metrics.render_prometheus()
+    return metrics.format_summary()
+
+
 @mcp.resource("messages://recent/{hours}")
 def get_recent_messages_resource(hours: int = 24) -> str:
     """Resource that provides recent messages."""
@@ -286,14 +652,115 @@ def get_contact_messages_resource(contact: str, hours: int = 24) -> str:
     logger.info("[MCP] Resource requested: messages://contact/%s/%s", contact, hours)
     return get_recent_messages(hours=hours, contact=contact)
 
-def run_server():
-    """Run the MCP server with proper error handling"""
+TRANSPORT_ENV = "MAC_MESSAGES_TRANSPORT"
+HOST_ENV = "MAC_MESSAGES_HOST"
+PORT_ENV = "MAC_MESSAGES_PORT"
+HTTP_WORKERS_ENV = "MAC_MESSAGES_HTTP_WORKERS"
+KEEP_ALIVE_ENV = "MAC_MESSAGES_KEEP_ALIVE"
+ALLOWED_HOSTS_ENV = "MAC_MESSAGES_ALLOWED_HOSTS"
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+# Seconds an idle HTTP connection stays open; longer than the usual client
+# poll interval so Poke (and tunnels like ngrok) reuse connections
+DEFAULT_KEEP_ALIVE = 75
+_LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    """Command line options, defaulting to the MAC_MESSAGES_* environment variables."""
+    parser = argparse.ArgumentParser(prog="mac-messages-mcp", description="Mac Messages MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.environ.get(TRANSPORT_ENV, "stdio"),
+                        help="stdio (default), streamable-http (serves /mcp) or sse (serves /sse)")
+    parser.add_argument("--host", default=os.environ.get(HOST_ENV, DEFAULT_HOST),
+                        help=f"Interface to bind for HTTP transports (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=_env_int(PORT_ENV, DEFAULT_PORT),
+                        help=f"Port for HTTP transports (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=_env_int(HTTP_WORKERS_ENV, 1),
+                        help="Worker processes; only 1 is supported (default: 1)")
+    parser.add_argument("--keep-alive", type=int, default=_env_int(KEEP_ALIVE_ENV, DEFAULT_KEEP_ALIVE),
+                        help=f"Seconds to keep idle HTTP connections open (default: {DEFAULT_KEEP_ALIVE})")
+    parser.add_argument("--allowed-host", action="append", dest="allowed_hosts",
+                        help="Extra Host header the HTTP transports accept besides localhost, e.g. an ngrok "
+                             f"domain; repeatable (default: {ALLOWED_HOSTS_ENV}, comma-separated)")
+    args = parser.parse_args(argv)
+    if args.transport not in TRANSPORTS:
+        parser.error(f"invalid {TRANSPORT_ENV} {args.transport!r} (choose from {', '.join(TRANSPORTS)})")
+    if args.workers != 1:
+        # contact:N selections and continuation tokens live in this process's
+        # memory, so a follow-up call must reach the process that made them
+        parser.error("--workers must be 1: the server keeps per-session state in memory and runs as one process")
+    if args.allowed_hosts is None:
+        args.allowed_hosts = [h.strip() for h in os.environ.get(ALLOWED_HOSTS_ENV, "").split(",") if h.strip()]
+    return args
+
+
+def _transport_security(allowed_hosts=()) -> TransportSecuritySettings:
+    """
+    DNS-rebinding protection that accepts localhost plus the given Host names.
+
+    A name without a port (an ngrok domain) also matches it on any port.
+    """
+    hosts = [f"[{host}]:*" if ":" in host else f"{host}:*" for host in _LOOPBACK_HOSTS]
+    for host in allowed_hosts:
+        hosts.append(host)
+        if not host.rsplit("]", 1)[-1].count(":"):
+            hosts.append(f"{host}:*")
+    origins = [f"{scheme}://{host}" for host in hosts for scheme in ("http", "https")]
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True, allowed_hosts=hosts, allowed_origins=origins
+    )
+
+
+def _configure_http(host: str, port: int, allowed_hosts=()) -> None:
+    """Point FastMCP's HTTP settings at host/port before its app is built."""
+    mcp.settings.host = host
+    mcp.settings.port = port
+    # Stateful sessions: contact:N selections and tokens are per session
+    mcp.settings.stateless_http = False
+    mcp.settings.transport_security = _transport_security(allowed_hosts)
+
+
+def _run_http(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    _configure_http(args.host, args.port, args.allowed_hosts)
+    if args.host not in _LOOPBACK_HOSTS and not args.allowed_hosts:
+        logger.warning("Bound to %s but only localhost Host headers are accepted; pass --allowed-host "
+                       "for the names clients use (e.g. host.docker.internal or an ngrok domain)", args.host)
+    path = mcp.settings.streamable_http_path if args.transport == "streamable-http" else mcp.settings.sse_path
+    logger.info("Serving MCP over %s at http://%s:%d%s", args.transport, args.host, args.port, path)
+    app = mcp.streamable_http_app() if args.transport == "streamable-http" else mcp.sse_app()
+    uvicorn.run(app, host=args.host, port=args.port, timeout_keep_alive=args.keep_alive, log_level="info")
+
+
+def run_server(argv=None):
+    """
+    Run the MCP server with proper error handling.
+
+    Serves stdio by default. With --transport streamable-http (or sse) the
+    server listens on --host/--port itself, so HTTP clients such as Poke
+    connect without an mcp-proxy in front.
+    """
+    args = _parse_args(argv)
+    # Log to stderr through a queue so formatting and writes happen off the request path
+    configure_logging()
     try:
         logger.info("Starting Mac Messages MCP server...")
-        mcp.run()
+        if args.transport == "stdio":
+            mcp.run()
+        else:
+            _run_http(args)
     except Exception as e:
         logger.error(f"Failed to start server: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    run_server()
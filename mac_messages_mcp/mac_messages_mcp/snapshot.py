@@ -0,0 +1,210 @@
+"""
+Consistent snapshot copies of the Messages database.
+
+Long analytics-style reads against the live chat.db compete with Messages.app
+writes. When snapshot mode is enabled, those reads are served from a private
+copy made with the SQLite online backup API. The copy is refreshed in small
+page batches (so Messages.app is never blocked for long) whenever the live
+database has changed and the copy is older than the staleness bound.
+
+Configuration (environment variables):
+    MAC_MESSAGES_SNAPSHOT            "true" to enable snapshot mode (default off)
+    MAC_MESSAGES_SNAPSHOT_PATH       Where to keep the copies (default: a private
+                                     per-user directory on tmpfs if available,
+                                     otherwise the user cache dir)
+    MAC_MESSAGES_SNAPSHOT_MAX_AGE    Staleness bound in seconds (default 30)
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENV = "MAC_MESSAGES_SNAPSHOT"
+SNAPSHOT_PATH_ENV = "MAC_MESSAGES_SNAPSHOT_PATH"
+SNAPSHOT_MAX_AGE_ENV = "MAC_MESSAGES_SNAPSHOT_MAX_AGE"
+
+DEFAULT_MAX_AGE = 30.0  # seconds
+
+# Pages copied per backup step. Between steps the source lock is released so
+# Messages.app can keep writing while a refresh is in progress.
+_BACKUP_PAGES_PER_STEP = 512
+_BACKUP_STEP_SLEEP = 0.001
+
+
+def snapshot_enabled() -> bool:
+    """Whether analytics reads should be served from a snapshot copy."""
+    return os.environ.get(SNAPSHOT_ENV, "").lower() in ("1", "true", "yes")
+
+
+def get_snapshot_max_age() -> float:
+    """Staleness bound for snapshots, in seconds."""
+    try:
+        return max(0.0, float(os.environ.get(SNAPSHOT_MAX_AGE_ENV, DEFAULT_MAX_AGE)))
+    except ValueError:
+        return DEFAULT_MAX_AGE
+
+
+def default_snapshot_path(source_path: str) -> str:
+    """
+    Pick a snapshot location for a source database.
+
+    Prefers a per-user directory on tmpfs (/dev/shm/mac_messages_mcp-<uid>)
+    so refreshes never touch the disk, falling back to
+    ~/Library/Caches/mac_messages_mcp on macOS. The snapshot is a full copy
+    of the message history, so the directory is created private (0700).
+
+    A configured directory holds one snapshot per source. A configured file
+    path gets the source's digest appended before the extension, so several
+    Messages roots never back up into the same file. Either way the
+    directory must be private to the user; a shared one is refused.
+    """
+    configured = os.environ.get(SNAPSHOT_PATH_ENV)
+    digest = hashlib.sha1(os.path.abspath(source_path).encode()).hexdigest()[:12]
+    filename = f"chat-snapshot-{digest}.db"
+
+    if configured:
+        configured = os.path.expanduser(configured)
+        if os.path.isdir(configured) or configured.endswith(os.sep):
+            return os.path.join(configured, filename)
+        root, ext = os.path.splitext(configured)
+        return f"{root}-{digest}{ext}"
+
+    if os.path.isdir("/dev/shm"):
+        return os.path.join("/dev/shm", f"mac_messages_mcp-{os.getuid()}", filename)
+    return os.path.join(
+        os.path.expanduser("~"), "Library/Caches/mac_messages_mcp", filename
+    )
+
+
+def _private_directory(directory: str) -> None:
+    """Create directory as 0700, or check an existing one is ours and not shared."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"snapshot directory {directory} is owned by another user")
+    if st.st_mode & 0o077:
+        # Never loosen or tighten a directory the user picked; ask them to
+        raise PermissionError(
+            f"snapshot directory {directory} is accessible to other users "
+            f"(mode {stat.S_IMODE(st.st_mode):o}); chmod 700 it or point {SNAPSHOT_PATH_ENV} "
+            "at a private directory"
+        )
+
+
+class MessagesSnapshot:
+    """
+    A backup-API copy of one Messages database with a staleness bound.
+
+    The copy is only refreshed when the source has actually changed (tracked
+    through file signatures of the database and its WAL) and the current copy
+    is older than ``max_age`` seconds.
+    """
+
+    def __init__(self, source_path: str, snapshot_path: str, max_age: float):
+        self.source_path = source_path
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age
+        self.last_refresh = 0.0
+        self._signature: Optional[Tuple[Tuple[int, int], ...]] = None
+        self._lock = threading.Lock()
+
+    def _source_signature(self) -> Tuple[Tuple[int, int], ...]:
+        """(mtime_ns, size) of the database and its WAL file."""
+        signature = []
+        for suffix in ("", "-wal"):
+            try:
+                st = os.stat(self.source_path + suffix)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((0, 0))
+        return tuple(signature)
+
+    def age(self) -> float:
+        """Seconds since the snapshot was last refreshed."""
+        if not self.last_refresh:
+            return float("inf")
+        return time.time() - self.last_refresh
+
+    def is_stale(self) -> bool:
+        """True when the copy is too old and the source has changed since."""
+        if self._signature is None or not os.path.exists(self.snapshot_path):
+            return True
+        if self.age() <= self.max_age:
+            return False
+        return self._source_signature() != self._signature
+
+    def refresh(self) -> None:
+        """Copy the live database into the snapshot file page-by-page."""
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            _private_directory(directory)
+        # Create the copy owner-only before SQLite opens it; its journal
+        # files inherit these permissions
+        os.close(os.open(self.snapshot_path, os.O_CREAT | os.O_WRONLY, 0o600))
+        os.chmod(self.snapshot_path, 0o600)
+
+        signature = self._source_signature()
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        try:
+            target = sqlite3.connect(self.snapshot_path)
+            try:
+                source.backup(
+                    target,
+                    pages=_BACKUP_PAGES_PER_STEP,
+                    sleep=_BACKUP_STEP_SLEEP,
+                )
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        self._signature = signature
+        self.last_refresh = time.time()
+
+    def get_path(self) -> str:
+        """Return the snapshot path, refreshing it first if it is stale."""
+        with self._lock:
+            if self.is_stale():
+                self.refresh()
+            elif self.age() > self.max_age:
+                # Source unchanged: the copy is still exact, restart the clock
+                self.last_refresh = time.time()
+        return self.snapshot_path
+
+
+_SNAPSHOTS: Dict[str, MessagesSnapshot] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def get_snapshot(source_path: str) -> MessagesSnapshot:
+    """Get (or create) the snapshot manager for a source database."""
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(source_path)
+        if snapshot is None:
+            snapshot = MessagesSnapshot(
+                source_path,
+                default_snapshot_path(source_path),
+                get_snapshot_max_age(),
+            )
+            _SNAPSHOTS[source_path] = snapshot
+        return snapshot
+
+
+def resolve_read_path(source_path: str) -> str:
+    """
+    Path to read analytics queries from: the snapshot when snapshot mode is
+    enabled and the copy can be made, otherwise the live database.
+    """
+    if not snapshot_enabled():
+        return source_path
+    try:
+        return get_snapshot(source_path).get_path()
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Snapshot unavailable, reading live database: %s", e)
+        return source_path
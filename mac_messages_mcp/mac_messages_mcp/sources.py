@@ -0,0 +1,339 @@
+"""
+Registry of Messages and AddressBook database roots.
+
+By default there is one Messages source (~/Library/Messages/chat.db) and one
+AddressBook source per ~/Library/Application Support/AddressBook/Sources/*
+database. Exported copies from other machines or years can be added through
+environment variables; each entry may be a database file, a directory that
+contains one, or a glob:
+
+    MAC_MESSAGES_DB_PATHS           chat.db roots, separated by os.pathsep (":")
+    MAC_MESSAGES_ADDRESSBOOK_PATHS  AddressBook-v22.abcddb roots, same format
+
+Every database gets its own small connection pool. Queries that span several
+sources are fanned out through a shared thread pool and merged by date.
+"""
+import contextvars
+import glob
+import heapq
+import os
+import queue
+import sqlite3
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .deadline import PROGRESS_INTERVAL, current_deadline
+
+MESSAGES_DB_PATHS_ENV = "MAC_MESSAGES_DB_PATHS"
+ADDRESSBOOK_DB_PATHS_ENV = "MAC_MESSAGES_ADDRESSBOOK_PATHS"
+
+DEFAULT_MESSAGES_DB = "Library/Messages/chat.db"
+DEFAULT_ADDRESSBOOK_GLOB = "Library/Application Support/AddressBook/Sources/*/AddressBook-v22.abcddb"
+
+APPLE_EPOCH_OFFSET = 978307200  # Seconds between the Unix epoch and 2001-01-01
+# message.date is in seconds below this (macOS before High Sierra), nanoseconds above
+SECONDS_DATE_LIMIT = 10_000_000_000
+
+_POOL_SIZE = 4
+_FAN_OUT_WORKERS = 8
+_FETCH_BATCH = 256
+
+T = TypeVar("T")
+
+
+class ConnectionPool:
+    """A small pool of SQLite connections to one database file."""
+
+    def __init__(self, path: str, size: int = _POOL_SIZE):
+        self.path = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, returning it to the pool afterwards."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            # Any failure (SQLite error, deadline, cancellation, GeneratorExit)
+            # may leave a cursor or transaction open; never pool that connection
+            conn.close()
+            raise
+        else:
+            if conn.in_transaction:
+                conn.close()
+                return
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class DatabaseSource:
+    """One database root (a chat.db or an AddressBook-v22.abcddb)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pool = ConnectionPool(path)
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """
+        Run a query and return rows as dictionaries. Raises sqlite3 errors.
+
+        Under an active deadline (see deadline.py) the query is interrupted
+        once the budget runs out or the call is cancelled; the rows read so
+        far are returned and the deadline is marked as truncated.
+        """
+        return self._fetch(query, params, dict)
+
+    def query_tuples(self, query: str, params: tuple = ()) -> List[tuple]:
+        """
+        Like query(), but rows are plain tuples in column order.
+
+        For bulk loads that transpose the result into columns (e.g. NumPy
+        arrays) and don't need a dictionary per row.
+        """
+        return self._fetch(query, params, None)
+
+    def _fetch(self, query: str, params: tuple, convert: Optional[Callable[[Any], Any]]) -> List[Any]:
+        deadline = current_deadline()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            if convert is None:
+                cursor.row_factory = None
+            if deadline is None:
+                try:
+                    cursor.execute(query, params)
+                    rows = cursor.fetchall()
+                    return rows if convert is None else [convert(row) for row in rows]
+                finally:
+                    cursor.close()
+
+            rows: List[Any] = []
+            conn.set_progress_handler(lambda: 1 if deadline.expired() else 0, PROGRESS_INTERVAL)
+            try:
+                cursor.execute(query, params)
+                while True:
+                    batch = cursor.fetchmany(_FETCH_BATCH)
+                    if not batch:
+                        return rows
+                    rows.extend(batch if convert is None else (convert(row) for row in batch))
+                    deadline.advance(len(batch))
+            except sqlite3.OperationalError as e:
+                if "interrupted" not in str(e) or not deadline.expired():
+                    raise
+                deadline.truncated = True
+                return rows
+            finally:
+                cursor.close()
+                conn.set_progress_handler(None, 0)
+
+    def data_version(self, table: str = "message") -> Tuple[int, Optional[int]]:
+        """
+        (PRAGMA data_version, MAX(ROWID) of table) for this database.
+
+        Read from a dedicated long-lived connection: data_version changes
+        whenever any other connection (e.g. Messages.app) commits, and the
+        max ROWID moves whenever a row is added. Raises sqlite3 errors.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                uri = "file:" + urllib.parse.quote(os.path.abspath(self.path)) + "?mode=ro"
+                self._version_conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            max_rowid = self._version_conn.execute(f"SELECT MAX(ROWID) FROM {table}").fetchone()[0]
+            return version, max_rowid
+
+    def __repr__(self) -> str:
+        return f"DatabaseSource({self.path!r})"
+
+
+_SOURCES: Dict[str, DatabaseSource] = {}
+_SOURCES_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _get_source(path: str) -> DatabaseSource:
+    """Get the registered source for a path, keeping its pool across calls."""
+    with _SOURCES_LOCK:
+        source = _SOURCES.get(path)
+        if source is None:
+            source = DatabaseSource(path)
+            _SOURCES[path] = source
+        return source
+
+
+def _expand_roots(value: str, filename: str) -> List[str]:
+    """Expand a path list into database files (dirs are searched for filename)."""
+    paths: List[str] = []
+    for entry in value.split(os.pathsep):
+        entry = os.path.expanduser(entry.strip())
+        if not entry:
+            continue
+        if os.path.isdir(entry):
+            direct = os.path.join(entry, filename)
+            matches = [direct] if os.path.exists(direct) else sorted(
+                glob.glob(os.path.join(entry, "**", filename), recursive=True)
+            )
+        elif glob.has_magic(entry):
+            matches = sorted(glob.glob(entry))
+        else:
+            matches = [entry]
+        for match in matches:
+            if match not in paths:
+                paths.append(match)
+    return paths
+
+
+def get_messages_db_paths() -> List[str]:
+    """All configured chat.db paths, primary first."""
+    configured = os.environ.get(MESSAGES_DB_PATHS_ENV, "")
+    if configured.strip():
+        paths = _expand_roots(configured, "chat.db")
+        if paths:
+            return paths
+    home_dir = os.path.expanduser("~")
+    return [os.path.join(home_dir, DEFAULT_MESSAGES_DB)]
+
+
+def get_addressbook_db_paths() -> List[str]:
+    """All configured AddressBook database paths."""
+    configured = os.environ.get(ADDRESSBOOK_DB_PATHS_ENV, "")
+    if configured.strip():
+        return _expand_roots(configured, "AddressBook-v22.abcddb")
+    home_dir = os.path.expanduser("~")
+    return sorted(glob.glob(os.path.join(home_dir, DEFAULT_ADDRESSBOOK_GLOB)))
+
+
+def get_addressbook_search_pattern() -> str:
+    """Human-readable description of where AddressBook databases are looked up."""
+    configured = os.environ.get(ADDRESSBOOK_DB_PATHS_ENV, "")
+    if configured.strip():
+        return configured
+    return os.path.join(os.path.expanduser("~"), DEFAULT_ADDRESSBOOK_GLOB)
+
+
+def get_message_sources() -> List[DatabaseSource]:
+    """Registered Messages databases, primary first."""
+    return [_get_source(path) for path in get_messages_db_paths()]
+
+
+def get_primary_message_source() -> DatabaseSource:
+    """The Messages database used for single-source lookups."""
+    return _get_source(get_messages_db_paths()[0])
+
+
+def get_addressbook_sources() -> List[DatabaseSource]:
+    """Registered AddressBook databases."""
+    return [_get_source(path) for path in get_addressbook_db_paths()]
+
+
+def get_source_for_path(path: str) -> DatabaseSource:
+    """Source (and pool) for an arbitrary database file, e.g. a snapshot copy."""
+    return _get_source(path)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _SOURCES_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=_FAN_OUT_WORKERS, thread_name_prefix="messages-source"
+            )
+        return _EXECUTOR
+
+
+def fan_out(sources: List[DatabaseSource], fn: Callable[[DatabaseSource], T]) -> List[T]:
+    """
+    Call fn for every source in parallel and return results in source order.
+
+    A single source is called inline to avoid thread hand-off cost. Workers
+    run in a copy of the caller's context, so context variables (such as the
+    active trace span) carry over.
+    """
+    if len(sources) <= 1:
+        return [fn(source) for source in sources]
+    executor = _get_executor()
+    futures = [executor.submit(contextvars.copy_context().run, fn, source) for source in sources]
+    return [future.result() for future in futures]
+
+
+def apple_date_sort_key(date_value: Any) -> int:
+    """Normalize an Apple timestamp (seconds or nanoseconds) to nanoseconds."""
+    try:
+        value = int(date_value)
+    except (TypeError, ValueError):
+        return 0
+    if abs(value) < SECONDS_DATE_LIMIT:  # Stored in seconds by older macOS versions
+        return value * 1_000_000_000
+    return value
+
+
+def apple_date_to_unix(date_value: Any) -> float:
+    """Convert a message.date value (seconds or nanoseconds since 2001) to Unix seconds."""
+    value = int(date_value)
+    seconds = value / 1_000_000_000 if abs(value) >= SECONDS_DATE_LIMIT else value
+    return seconds + APPLE_EPOCH_OFFSET
+
+
+def apple_date_ns_sql(column: str) -> str:
+    """SQL form of apple_date_sort_key, so per-source ORDER BY matches the merge order."""
+    return f"(CASE WHEN ABS({column}) < {SECONDS_DATE_LIMIT} THEN {column} * 1000000000 ELSE {column} END)"
+
+
+def merge_by_date(
+    row_lists: Iterable[List[Dict[str, Any]]],
+    limit: Optional[int] = None,
+    dedup_key: str = "guid",
+) -> List[Dict[str, Any]]:
+    """
+    k-way merge of per-source rows sorted by date descending.
+
+    Each list must already be ordered by apple_date_sort_key (in SQL,
+    ORDER BY apple_date_ns_sql("date") DESC), not by the raw date.
+
+    Rows sharing a message guid (the same message exported from several
+    machines) are kept once, from the first source that has it.
+    """
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for row in heapq.merge(
+        *row_lists, key=lambda r: apple_date_sort_key(r.get("date")), reverse=True
+    ):
+        key = row.get(dedup_key)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        merged.append(row)
+        if limit is not None and len(merged) >= limit:
+            break
+    return merged
@@ -0,0 +1,294 @@
+"""
+Lightweight cross-process tracing.
+
+Spans use W3C trace context ids so one backend request can be followed from
+the Node process through `uv`, the CLI scripts, SQLite queries and the Gemini
+scripts. A parent context is taken from the TRACEPARENT environment variable
+(set by the process that spawned us) and child processes get their own
+TRACEPARENT via child_env().
+
+Finished spans are handed to a background thread that appends them as JSON
+lines to TRACE_FILE and/or batches them to an OTLP/HTTP collector at
+OTEL_EXPORTER_OTLP_ENDPOINT (JSON encoding). With neither configured, span()
+returns a shared no-op context manager.
+
+The module only uses the standard library, so scripts outside the package
+(backend/gemini) load this file directly and call set_service_name().
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_ENV = "TRACEPARENT"
+TRACE_FILE_ENV = "TRACE_FILE"
+OTLP_ENDPOINT_ENV = "OTEL_EXPORTER_OTLP_ENDPOINT"
+SERVICE_NAME = "mac_messages_mcp"
+
+_OTLP_BATCH_SIZE = 64
+# Seconds a partial OTLP batch waits before it is sent anyway
+_OTLP_FLUSH_INTERVAL = 2.0
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_NULL_SPAN = nullcontext()
+_service_name = SERVICE_NAME
+_writer: Optional["_Writer"] = None
+_writer_lock = threading.Lock()
+
+
+def _parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """Return (trace_id, span_id) from a traceparent header, or None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def set_service_name(name: str) -> None:
+    """Report spans under another service name (e.g. a script sharing this tracer)."""
+    global _service_name
+    _service_name = name
+
+
+def enabled() -> bool:
+    """Whether spans are being exported anywhere."""
+    return bool(os.environ.get(TRACE_FILE_ENV) or os.environ.get(OTLP_ENDPOINT_ENV))
+
+
+class Span:
+    """A timed operation; attributes can be added until it ends."""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+        start_ns: Optional[int] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": _service_name,
+            "pid": os.getpid(),
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Writer(threading.Thread):
+    """
+    Background exporter: appends spans to the trace file and batches them to OTLP.
+
+    Request threads only enqueue finished spans, so neither file writes nor a
+    slow collector ever hold up a query. The trace file stays open between
+    spans and is flushed whenever the queue runs dry.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(name="trace-writer", daemon=True)
+        self.queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._file: Optional[TextIO] = None
+        self._file_path: Optional[str] = None
+        self._batches: Dict[str, List[Dict[str, Any]]] = {}
+
+    def run(self) -> None:
+        while True:
+            try:
+                item = self.queue.get(timeout=_OTLP_FLUSH_INTERVAL)
+            except queue.Empty:
+                self._send_all()
+                continue
+            if isinstance(item, threading.Event):  # flush() waiting for us
+                self._send_all()
+                item.set()
+                continue
+            record, path, endpoint = item
+            if path:
+                self._write(record, path)
+            if endpoint:
+                batch = self._batches.setdefault(endpoint, [])
+                batch.append(record)
+                if len(batch) >= _OTLP_BATCH_SIZE:
+                    _send(endpoint, self._batches.pop(endpoint))
+            if self._file is not None and self.queue.empty():
+                self._file.flush()
+
+    def _write(self, record: Dict[str, Any], path: str) -> None:
+        try:
+            if path != self._file_path:
+                if self._file is not None:
+                    self._file.close()
+                self._file = self._file_path = None
+                self._file = open(os.path.expanduser(path), "a", encoding="utf-8")
+                self._file_path = path
+            self._file.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            # stderr: stdout carries the CLI's JSON and the MCP stdio protocol
+            logger.warning("Could not write span to %s: %s", path, e)
+
+    def _send_all(self) -> None:
+        batches, self._batches = self._batches, {}
+        for endpoint, batch in batches.items():
+            _send(endpoint, batch)
+        if self._file is not None:
+            self._file.flush()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer()
+            _writer.start()
+        return _writer
+
+
+def _export(span: Span) -> None:
+    path = os.environ.get(TRACE_FILE_ENV)
+    endpoint = os.environ.get(OTLP_ENDPOINT_ENV)
+    if path or endpoint:
+        _get_writer().queue.put((span.to_dict(), path, endpoint))
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _send(endpoint: str, batch: List[Dict[str, Any]]) -> None:
+    """POST spans to an OTLP collector. Export failures are reported and dropped."""
+    spans = [{
+        "traceId": r["trace_id"],
+        "spanId": r["span_id"],
+        "parentSpanId": r["parent_id"] or "",
+        "name": r["name"],
+        "kind": 1,
+        "startTimeUnixNano": str(r["start_ns"]),
+        "endTimeUnixNano": str(r["end_ns"]),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in r["attributes"].items()],
+        "status": {"code": 2, "message": r["error"]} if r["error"] else {"code": 1},
+    } for r in batch]
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": _service_name}}]},
+        "scopeSpans": [{"scope": {"name": _service_name}, "spans": spans}],
+    }]}
+    request = urllib.request.Request(
+        endpoint.rstrip("/") + "/v1/traces",
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        urllib.request.urlopen(request, timeout=2).close()
+    except Exception as e:
+        # stderr: stdout carries the CLI's JSON and the MCP stdio protocol
+        logger.warning("Could not export %d spans to %s: %s", len(spans), endpoint, e)
+
+
+def flush(timeout: float = 5.0) -> None:
+    """Wait until every span exported so far is written and sent (at most timeout seconds)."""
+    with _writer_lock:
+        writer = _writer
+    if writer is None or not writer.is_alive():
+        return
+    done = threading.Event()
+    writer.queue.put(done)
+    done.wait(timeout)
+
+
+atexit.register(flush)
+
+
+@contextmanager
+def _span(name: str, start_ns: Optional[int], attributes: Dict[str, Any]) -> Iterator[Span]:
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        inherited = _parse_traceparent(os.environ.get(TRACEPARENT_ENV))
+        trace_id, parent_id = inherited if inherited else (secrets.token_hex(16), None)
+    span = Span(name, trace_id, parent_id, attributes, start_ns)
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        _export(span)
+
+
+def span(name: str, start_ns: Optional[int] = None, **attributes: Any):
+    """
+    Context manager recording a span around its body.
+
+    Yields the Span (or None when tracing is off), so callers can attach
+    attributes discovered along the way, e.g. row counts.
+
+    Args:
+        name: Span name
+        start_ns: Backdate the span start (time.time_ns()), e.g. to the
+                  moment a CLI began importing its dependencies
+        **attributes: Initial span attributes
+    """
+    if not enabled():
+        return _NULL_SPAN
+    return _span(name, start_ns, attributes)
+
+
+def current_traceparent() -> Optional[str]:
+    """Traceparent for the active span, falling back to the inherited one."""
+    current = _current.get()
+    if current is not None:
+        return current.traceparent
+    return os.environ.get(TRACEPARENT_ENV)
+
+
+def child_env(env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Environment for a subprocess that continues the current trace."""
+    result = dict(os.environ if env is None else env)
+    traceparent = current_traceparent()
+    if traceparent:
+        result[TRACEPARENT_ENV] = traceparent
+    return result
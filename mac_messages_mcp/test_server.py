@@ -6,40 +6,175 @@ Run from the mac_messages_mcp directory so uv uses the correct project and deps:
 
     cd mac_messages_mcp && uv run python test_server.py
 
-Then open http://localhost:8765 in your browser.
+Then open http://localhost:8765 in your browser. Latency and cache metrics are
+served in Prometheus text format at http://localhost:8765/metrics.
+
+Each connection is served on its own thread, so a slow /api/recent doesn't
+hold up other clients (the browser page, the mobile app). Connections are
+kept alive between requests, larger responses are gzipped for clients that
+accept it, and /api/recent answers If-None-Match with 304 Not Modified until
+chat.db changes.
 """
+import gzip
+import hashlib
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import os
+import select
+import socket
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
 
-from mac_messages_mcp.messages import get_recent_messages, send_message
+from mac_messages_mcp import metrics
+from mac_messages_mcp.deadline import Deadline, deadline_scope, default_timeout, mark_truncated
+from mac_messages_mcp.messages import _messages_data_version, get_recent_messages, send_message
 from mac_messages_mcp.phone_country import format_e164, list_countries
 
 PORT = 8765
+# Seconds an idle keep-alive connection is held open
+KEEP_ALIVE_TIMEOUT = 30
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 1024
+# /api/recent windows end "now", so ETags also roll over every minute as
+# old messages leave the window
+RECENT_ETAG_SECONDS = 60
+# data_version counters restart with the process; keep ETags from one run
+# from matching another
+_BOOT_ID = os.urandom(4).hex()
+
+
+def _etag(*parts) -> str:
+    """Weak ETag over parts (weak so gzip and identity bodies share it)."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def recent_etag(hours, contact):
+    """ETag for /api/recent, from the Messages data version, or None if it can't be read."""
+    version = _messages_data_version()
+    if version is None:
+        return None
+    return _etag(_BOOT_ID, version, hours, contact, int(time.time() // RECENT_ETAG_SECONDS))
+
+
+@lru_cache(maxsize=1)
+def country_codes_body():
+    """The /api/country-codes body and ETag; the list never changes while running."""
+    body = json.dumps({"ok": True, "countries": list_countries()}).encode()
+    return body, _etag(hashlib.sha1(body).hexdigest())
 
 
 class MessagesHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open; every response sets Content-Length
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+
     def _cors_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+
+    def _accepts_gzip(self):
+        encodings = self.headers.get("Accept-Encoding", "")
+        return any(part.split(";")[0].strip() == "gzip" for part in encodings.split(","))
 
-    def _reply_json(self, data, status=200):
+    def _not_modified(self, etag):
+        """True if the client's If-None-Match already covers etag."""
+        if etag is None:
+            return False
+        candidates = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+        bare = etag[2:] if etag.startswith("W/") else etag
+        return any(tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates if tag)
+
+    def _reply_not_modified(self, etag, cache_control=None, cors=False):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        if cache_control:
+            self.send_header("Cache-Control", cache_control)
+        if cors:
+            self._cors_headers()
+        self.end_headers()
+
+    def _send_body(self, data, content_type, status=200, etag=None, cache_control=None, cors=False):
+        """Send a complete response, gzipped when it helps, with validators if given."""
+        if status == 200 and self._not_modified(etag):
+            self._reply_not_modified(etag, cache_control, cors)
+            return
+        compressible = len(data) >= GZIP_MIN_BYTES
+        gzipped = compressible and self._accepts_gzip()
+        if gzipped:
+            data = gzip.compress(data, compresslevel=6, mtime=0)
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self._cors_headers()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        if etag:
+            self.send_header("ETag", etag)
+        if cache_control:
+            self.send_header("Cache-Control", cache_control)
+        if cors:
+            self._cors_headers()
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(data)
+
+    def _reply_json(self, data, status=200, etag=None, cache_control=None):
+        self._send_body(json.dumps(data).encode(), "application/json", status, etag, cache_control, cors=True)
+
+    def _reply_text(self, body, content_type="text/plain; charset=utf-8", status=200):
+        self._send_body(body.encode(), content_type, status)
 
     def _reply_html(self, body, status=200):
+        self._send_body(body.encode(), "text/html; charset=utf-8", status,
+                        etag=_etag(_BOOT_ID, "html"), cache_control="no-cache")
+
+    def _reply_empty(self, status):
         self.send_response(status)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", "0")
         self.end_headers()
-        self.wfile.write(body.encode())
+
+    def _client_gone(self):
+        """True if the client closed its end of the connection."""
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _run_cancellable(self, fn, **kwargs):
+        """
+        Run a read in a worker thread under a deadline, cancelling it if the
+        client disconnects. Returns (result, deadline).
+        """
+        deadline = Deadline(default_timeout())
+        outcome = {}
+
+        def work():
+            with deadline_scope(deadline):
+                try:
+                    outcome["result"] = fn(**kwargs)
+                except Exception as e:
+                    outcome["error"] = e
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        while worker.is_alive():
+            worker.join(0.1)
+            if worker.is_alive() and not deadline.cancelled and self._client_gone():
+                deadline.cancel()
+        if "error" in outcome:
+            raise outcome["error"]
+        return mark_truncated(outcome["result"], deadline), deadline
 
     def do_OPTIONS(self):
         self.send_response(204)
         self._cors_headers()
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
     def do_GET(self):
@@ -52,20 +187,33 @@ class MessagesHandler(BaseHTTPRequestHandler):
             hours = int(qs.get("hours", [24])[0])
             contact = qs.get("contact", [None])[0]
             try:
-                out = get_recent_messages(hours=hours, contact=contact)
-                self._reply_json({"ok": True, "messages": out})
+                etag = recent_etag(hours, contact)
+                if self._not_modified(etag):
+                    self._reply_not_modified(etag, "no-cache", cors=True)
+                    return
+                out, deadline = self._run_cancellable(get_recent_messages, hours=hours, contact=contact)
+                if deadline.cancelled:
+                    print("Client disconnected; cancelled /api/recent")
+                    self.close_connection = True
+                    return
+                # Partial results must not be revalidated as if complete
+                self._reply_json({"ok": True, "messages": out, "truncated": deadline.truncated},
+                                 etag=None if deadline.truncated else etag, cache_control="no-cache")
             except Exception as e:
                 self._reply_json({"ok": False, "error": str(e)}, 500)
             return
+        if path == "/metrics":
+            self._reply_text(metrics.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            return
         if path == "/api/country-codes":
             try:
-                countries = list_countries()
-                self._reply_json({"ok": True, "countries": countries})
+                body, etag = country_codes_body()
+                self._send_body(body, "application/json", etag=etag,
+                                cache_control="public, max-age=86400, immutable", cors=True)
             except Exception as e:
                 self._reply_json({"ok": False, "error": str(e)}, 500)
             return
-        self.send_response(404)
-        self.end_headers()
+        self._reply_empty(404)
 
     def do_POST(self):
         path = urlparse(self.path).path
@@ -89,13 +237,19 @@ class MessagesHandler(BaseHTTPRequestHandler):
             except Exception as e:
                 self._reply_json({"ok": False, "error": str(e)}, 500)
             return
-        self.send_response(404)
-        self.end_headers()
+        # Unread request bodies would be parsed as the next request
+        self.close_connection = True
+        self._reply_empty(404)
 
     def log_message(self, format, *args):
         print(format % args)
 
 
+class MessagesServer(ThreadingHTTPServer):
+    """One thread per connection; threads don't keep the process alive on Ctrl+C."""
+    daemon_threads = True
+
+
 HTML_PAGE = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -223,7 +377,7 @@ HTML_PAGE = """<!DOCTYPE html>
 
 
 def main():
-    server = HTTPServer(("", PORT), MessagesHandler)
+    server = MessagesServer(("", PORT), MessagesHandler)
     print("Messages test server: http://localhost:%s" % PORT)
     print("Press Ctrl+C to stop.")
     server.serve_forever()
@@ -0,0 +1,550 @@
+"""
+Deterministic generator for synthetic Messages and AddressBook databases.
+
+Produces chat.db files with the tables and indexes the package reads (message,
+handle, chat, chat_handle_join, chat_message_join, attachment,
+message_attachment_join), including attributedBody blobs, tapbacks, inline
+replies and a mix of second and nanosecond timestamps, plus matching
+AddressBook-v22 databases. The same seed and end time always produce the same
+rows.
+
+Usage:
+  python -m tests.fixtures OUTPUT_DIR [--messages N] [--people N] [--seed N]
+
+Then point the server at the result:
+  MAC_MESSAGES_DB_PATHS=OUTPUT_DIR/chat.db \\
+  MAC_MESSAGES_ADDRESSBOOK_PATHS=OUTPUT_DIR/AddressBook-v22.abcddb \\
+  uv run python -m mac_messages_mcp.server
+
+Tests that read a fixture subclass FixtureTestCase.
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from typing import Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+APPLE_EPOCH_OFFSET = 978307200  # Seconds between Unix epoch and Apple epoch
+
+# macOS stored message dates in seconds before High Sierra, nanoseconds after
+_NANOSECOND_CUTOVER = 1506816000 - APPLE_EPOCH_OFFSET  # 2017-10-01
+
+_FIRST_NAMES = [
+    "Alex", "Alexis", "Sam", "Samantha", "Jordan", "Taylor", "Chris", "Morgan",
+    "Jamie", "Casey", "Riley", "Avery", "Quinn", "Drew", "Mia", "Noah", "Liam",
+    "Emma", "Olivia", "Ava", "Lucas", "Ethan", "Zoe", "Nora", "Leo", "Maya",
+]
+_LAST_NAMES = [
+    "Smith", "Johnson", "Lee", "Garcia", "Martinez", "Brown", "Davis", "Miller",
+    "Wilson", "Moore", "Anderson", "Thomas", "Jackson", "White", "Harris",
+    "Clark", "Lewis", "Walker", "Young", "King", "Nguyen", "Patel", "Kim",
+]
+_NICKNAMES = ["Al", "Sammy", "J", "Tay", "Mo", "Bear", "Doc", "Ace", ""]
+_WORDS = (
+    "hey are we still on for dinner tonight running late sorry traffic is bad "
+    "did you see the game last night lol that was wild can you send me the "
+    "address thanks see you soon happy birthday love you call me when you can "
+    "meeting moved to tomorrow the weekend plans sound great coffee later"
+).split()
+_TAPBACKS = [("Loved", 2000), ("Liked", 2001), ("Disliked", 2002),
+             ("Laughed at", 2003), ("Emphasized", 2004), ("Questioned", 2005)]
+_MIME_TYPES = [("image/jpeg", "IMG_{:04d}.jpeg"), ("image/heic", "IMG_{:04d}.heic"),
+               ("video/quicktime", "IMG_{:04d}.mov"), ("application/pdf", "Doc{:04d}.pdf")]
+
+CHAT_DB_SCHEMA = """
+CREATE TABLE handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL,
+    country TEXT,
+    service TEXT NOT NULL,
+    uncanonicalized_id TEXT,
+    person_centric_id TEXT,
+    UNIQUE (id, service)
+);
+CREATE TABLE chat (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    style INTEGER,
+    state INTEGER,
+    chat_identifier TEXT,
+    service_name TEXT,
+    room_name TEXT,
+    is_archived INTEGER DEFAULT 0,
+    display_name TEXT,
+    group_id TEXT
+);
+CREATE TABLE chat_handle_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    handle_id INTEGER REFERENCES handle (ROWID) ON DELETE CASCADE,
+    UNIQUE (chat_id, handle_id)
+);
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    handle_id INTEGER DEFAULT 0,
+    service TEXT,
+    error INTEGER DEFAULT 0,
+    date INTEGER,
+    date_read INTEGER,
+    date_delivered INTEGER,
+    is_from_me INTEGER DEFAULT 0,
+    is_read INTEGER DEFAULT 0,
+    item_type INTEGER DEFAULT 0,
+    cache_has_attachments INTEGER DEFAULT 0,
+    cache_roomnames TEXT,
+    attributedBody BLOB,
+    associated_message_guid TEXT,
+    associated_message_type INTEGER DEFAULT 0,
+    thread_originator_guid TEXT
+);
+CREATE TABLE chat_message_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    message_date INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE attachment (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    created_date INTEGER DEFAULT 0,
+    filename TEXT,
+    mime_type TEXT,
+    transfer_name TEXT,
+    total_bytes INTEGER DEFAULT 0,
+    is_outgoing INTEGER DEFAULT 0
+);
+CREATE TABLE message_attachment_join (
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    attachment_id INTEGER REFERENCES attachment (ROWID) ON DELETE CASCADE,
+    UNIQUE (message_id, attachment_id)
+);
+"""
+
+# Indexes present in real chat.db files, created after the bulk load
+CHAT_DB_INDEXES = """
+CREATE INDEX message_idx_handle ON message (handle_id, date);
+CREATE INDEX message_idx_date ON message (date);
+CREATE INDEX message_idx_associated_message ON message (associated_message_guid);
+CREATE INDEX message_idx_thread_originator_guid ON message (thread_originator_guid);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id ON chat_message_join (chat_id, message_date, message_id);
+CREATE INDEX chat_message_join_idx_message_id_only ON chat_message_join (message_id);
+CREATE INDEX chat_handle_join_idx_handle_id ON chat_handle_join (handle_id);
+CREATE INDEX message_attachment_join_idx_message_id ON message_attachment_join (message_id);
+"""
+
+ADDRESSBOOK_SCHEMA = """
+CREATE TABLE ZABCDRECORD (
+    Z_PK INTEGER PRIMARY KEY,
+    Z_ENT INTEGER,
+    ZFIRSTNAME VARCHAR,
+    ZLASTNAME VARCHAR,
+    ZNICKNAME VARCHAR,
+    ZORGANIZATION VARCHAR
+);
+CREATE TABLE ZABCDPHONENUMBER (
+    Z_PK INTEGER PRIMARY KEY,
+    ZOWNER INTEGER,
+    ZORDERINGINDEX INTEGER,
+    ZLABEL VARCHAR,
+    ZFULLNUMBER VARCHAR
+);
+CREATE TABLE ZABCDEMAILADDRESS (
+    Z_PK INTEGER PRIMARY KEY,
+    ZOWNER INTEGER,
+    ZORDERINGINDEX INTEGER,
+    ZLABEL VARCHAR,
+    ZADDRESS VARCHAR,
+    ZADDRESSNORMALIZED VARCHAR
+);
+CREATE INDEX ZABCDPHONENUMBER_ZOWNER_INDEX ON ZABCDPHONENUMBER (ZOWNER);
+CREATE INDEX ZABCDEMAILADDRESS_ZOWNER_INDEX ON ZABCDEMAILADDRESS (ZOWNER);
+"""
+
+
+class Person:
+    """A synthetic contact with one phone number and maybe an email."""
+
+    def __init__(self, index: int, rng: random.Random):
+        self.first_name = rng.choice(_FIRST_NAMES)
+        self.last_name = rng.choice(_LAST_NAMES)
+        self.nickname = rng.choice(_NICKNAMES)
+        self.phone = "+1555{:07d}".format(index * 7919 % 10_000_000)
+        self.email = (
+            f"{self.first_name.lower()}.{self.last_name.lower()}{index}@example.com"
+            if rng.random() < 0.4
+            else None
+        )
+        self.has_imessage = rng.random() < 0.8
+        # Zipf-like weight so a few people dominate the history
+        self.weight = 1.0 / (index + 1)
+        self.handle_ids: List[int] = []
+
+
+def make_attributed_body(text: str) -> bytes:
+    """
+    Build a typedstream attributedBody blob the way Messages.app stores it.
+
+    Only the short-string form (length < 128 bytes) is produced, which is what
+    extract_body_from_attributed understands.
+    """
+    encoded = text.encode("utf-8")[:127]
+    return (
+        b"\x04\x0bstreamtyped\x81\xe8\x03\x84\x01@\x84\x84\x84\x12NSAttributedString"
+        b"\x00\x84\x84\x08NSObject\x00\x85\x92\x84\x84\x84\x08NSString"
+        b"\x01\x94\x84\x01+" + bytes([len(encoded)]) + encoded
+        + b"\x86\x84\x02iI\x01\x01\x92\x84\x84\x84\x0cNSDictionary"
+        b"\x00\x94\x84\x01i\x01\x92\x84\x96\x96\x1d__kIMMessagePartAttributeName"
+        b"\x86\x92\x84\x84\x84\x08NSNumber\x00\x84\x84\x07NSValue\x00\x94\x84\x01*"
+        b"\x84\x99\x99\x00\x86\x86\x86"
+    )
+
+
+def _apple_date(unix_seconds: float) -> int:
+    """Apple timestamp for a Unix time, in seconds or nanoseconds by era."""
+    apple_seconds = unix_seconds - APPLE_EPOCH_OFFSET
+    if apple_seconds < _NANOSECOND_CUTOVER:
+        return int(apple_seconds)
+    return int(apple_seconds * 1_000_000_000)
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 14)))
+
+
+def generate_chat_db(
+    path: str,
+    messages: int = 100_000,
+    people: int = 300,
+    group_chats: int = 25,
+    days: int = 3 * 365,
+    seed: int = 0,
+    end_time: Optional[float] = None,
+) -> List[Person]:
+    """
+    Write a synthetic chat.db.
+
+    Args:
+        path: Output file (replaced if it exists)
+        messages: Number of message rows, including tapbacks
+        people: Number of distinct correspondents
+        group_chats: Number of named group chats
+        days: History length; the oldest messages use second timestamps
+        seed: Random seed
+        end_time: Unix time of the newest message (default: now)
+
+    Returns:
+        The generated people, for building a matching AddressBook
+    """
+    rng = random.Random(seed)
+    end_time = time.time() if end_time is None else end_time
+    start_time = end_time - days * 86400
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(CHAT_DB_SCHEMA)
+
+    roster = [Person(i, rng) for i in range(people)]
+
+    # Handles: every person gets a phone handle, some also SMS and email handles
+    handle_rows = []
+    for person in roster:
+        services = ["iMessage", "SMS"] if person.has_imessage else ["SMS"]
+        if person.has_imessage and rng.random() < 0.5:
+            services = ["iMessage"]
+        for service in services:
+            handle_rows.append((person.phone, "us", service, person.phone[2:]))
+            person.handle_ids.append(len(handle_rows))
+        if person.email:
+            handle_rows.append((person.email, "us", "iMessage", None))
+            person.handle_ids.append(len(handle_rows))
+    conn.executemany(
+        "INSERT INTO handle (id, country, service, uncanonicalized_id) VALUES (?, ?, ?, ?)",
+        handle_rows,
+    )
+
+    # One direct chat per handle, then named group chats
+    chat_rows = []
+    chat_handles: List[Tuple[int, List[int]]] = []
+    direct_chat_for_handle = {}
+    for handle_id, (handle, _country, service, _raw) in enumerate(handle_rows, 1):
+        chat_rows.append((f"{service};-;{handle}", 45, 3, handle, service, None, None))
+        direct_chat_for_handle[handle_id] = len(chat_rows)
+        chat_handles.append((len(chat_rows), [handle_id]))
+    groups = []
+    for g in range(group_chats):
+        members = rng.sample(roster, k=min(len(roster), rng.randint(3, 8)))
+        room_name = "chat{:015d}".format(rng.randrange(10**15))
+        chat_rows.append(
+            (f"iMessage;+;{room_name}", 43, 3, room_name, "iMessage", room_name,
+             f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()} {g}")
+        )
+        member_handles = [p.handle_ids[0] for p in members]
+        chat_handles.append((len(chat_rows), member_handles))
+        groups.append((len(chat_rows), room_name, member_handles))
+    conn.executemany(
+        "INSERT INTO chat (guid, style, state, chat_identifier, service_name, room_name, display_name)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        chat_rows,
+    )
+    conn.executemany(
+        "INSERT INTO chat_handle_join (chat_id, handle_id) VALUES (?, ?)",
+        [(chat_id, h) for chat_id, handles in chat_handles for h in handles],
+    )
+
+    cum_weights = list(itertools.accumulate(p.weight for p in roster))
+    handle_services = [row[2] for row in handle_rows]
+    recent_guids: List[Tuple[str, int]] = []
+    attachments: List[Tuple] = []
+    attachment_joins: List[Tuple[int, int]] = []
+    chat_joins: List[Tuple[int, int, int]] = []
+
+    def rows() -> Iterator[Tuple]:
+        # Evenly spread timestamps with jitter, oldest first like a real history
+        step = (end_time - start_time) / max(messages, 1)
+        for rowid in range(1, messages + 1):
+            unix_time = start_time + rowid * step - rng.random() * step
+            date = _apple_date(unix_time)
+            guid = "{:08X}-{:04X}-{:04X}-{:012X}".format(
+                rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16), rng.getrandbits(48)
+            )
+            is_from_me = 1 if rng.random() < 0.45 else 0
+
+            if groups and rng.random() < 0.25:
+                chat_id, room_name, members = rng.choice(groups)
+                handle_id = 0 if is_from_me else rng.choice(members)
+            else:
+                person = rng.choices(roster, cum_weights=cum_weights)[0]
+                handle_id = rng.choice(person.handle_ids)
+                chat_id, room_name = direct_chat_for_handle[handle_id], None
+
+            text: Optional[str] = _sentence(rng)
+            attributed: Optional[bytes] = None
+            associated_guid = None
+            associated_type = 0
+            thread_originator = None
+            has_attachments = 0
+
+            roll = rng.random()
+            if recent_guids and roll < 0.08:
+                # Tapback on a recent message
+                target_guid, _ = rng.choice(recent_guids)
+                verb, associated_type = rng.choice(_TAPBACKS)
+                associated_guid = f"p:0/{target_guid}"
+                text = f"{verb} “{_sentence(rng)}”"
+            elif recent_guids and roll < 0.12:
+                # Inline reply to a recent message
+                thread_originator = rng.choice(recent_guids)[0]
+            elif roll < 0.17:
+                # Attachment: object replacement character as the body
+                has_attachments = 1
+                text = "￼"
+                mime_type, name = rng.choice(_MIME_TYPES)
+                transfer_name = name.format(rowid % 10_000)
+                attachments.append((
+                    guid + "-att", date, f"~/Library/Messages/Attachments/{rowid % 256:02x}/{transfer_name}",
+                    mime_type, transfer_name, rng.randint(10_000, 20_000_000), is_from_me,
+                ))
+                attachment_joins.append((rowid, len(attachments)))
+
+            if text and text != "￼" and not associated_type and rng.random() < 0.6:
+                # Modern macOS leaves text NULL and stores the body in attributedBody
+                attributed = make_attributed_body(text)
+                text = None
+
+            service = handle_services[handle_id - 1] if handle_id else "iMessage"
+            error = 1 if rng.random() < 0.01 else 0
+            if associated_type == 0:
+                recent_guids.append((guid, rowid))
+                if len(recent_guids) > 50:
+                    recent_guids.pop(0)
+            chat_joins.append((chat_id, rowid, date))
+            yield (
+                rowid, guid, text, handle_id, service, error, date,
+                date if is_from_me else 0, is_from_me, 1, has_attachments,
+                room_name, attributed, associated_guid, associated_type, thread_originator,
+            )
+
+    conn.executemany(
+        "INSERT INTO message (ROWID, guid, text, handle_id, service, error, date, date_read,"
+        " is_from_me, is_read, cache_has_attachments, cache_roomnames, attributedBody,"
+        " associated_message_guid, associated_message_type, thread_originator_guid)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows(),
+    )
+    conn.executemany(
+        "INSERT INTO chat_message_join (chat_id, message_id, message_date) VALUES (?, ?, ?)",
+        chat_joins,
+    )
+    conn.executemany(
+        "INSERT INTO attachment (guid, created_date, filename, mime_type, transfer_name,"
+        " total_bytes, is_outgoing) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        attachments,
+    )
+    conn.executemany(
+        "INSERT INTO message_attachment_join (message_id, attachment_id) VALUES (?, ?)",
+        attachment_joins,
+    )
+    conn.executescript(CHAT_DB_INDEXES)
+    conn.commit()
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+    return roster
+
+
+def _format_phone(phone: str, rng: random.Random) -> str:
+    """Format a +1 number the various ways people type them into Contacts."""
+    digits = phone[2:]
+    style = rng.randrange(4)
+    if style == 0:
+        return phone
+    if style == 1:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    if style == 2:
+        return f"+1 {digits[:3]}-{digits[3:6]}-{digits[6:]}"
+    return f"1{digits}"
+
+
+def generate_addressbook_db(path: str, roster: List[Person], seed: int = 0) -> None:
+    """
+    Write a synthetic AddressBook-v22.abcddb for the given people.
+
+    Args:
+        path: Output file (replaced if it exists)
+        roster: People returned by generate_chat_db
+        seed: Random seed for phone formatting
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(ADDRESSBOOK_SCHEMA)
+    records, phones, emails = [], [], []
+    for pk, person in enumerate(roster, 1):
+        records.append((pk, 22, person.first_name, person.last_name, person.nickname or None))
+        phones.append((pk, pk, 0, "_$!<Mobile>!$_", _format_phone(person.phone, rng)))
+        if person.email:
+            emails.append((pk, pk, 0, "_$!<Home>!$_", person.email, person.email.lower()))
+    conn.executemany(
+        "INSERT INTO ZABCDRECORD (Z_PK, Z_ENT, ZFIRSTNAME, ZLASTNAME, ZNICKNAME) VALUES (?, ?, ?, ?, ?)",
+        records,
+    )
+    conn.executemany(
+        "INSERT INTO ZABCDPHONENUMBER (Z_PK, ZOWNER, ZORDERINGINDEX, ZLABEL, ZFULLNUMBER) VALUES (?, ?, ?, ?, ?)",
+        phones,
+    )
+    conn.executemany(
+        "INSERT INTO ZABCDEMAILADDRESS (Z_PK, ZOWNER, ZORDERINGINDEX, ZLABEL, ZADDRESS, ZADDRESSNORMALIZED)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        emails,
+    )
+    conn.commit()
+    conn.close()
+
+
+def generate_fixture_dir(
+    directory: str,
+    messages: int = 100_000,
+    people: int = 300,
+    seed: int = 0,
+    end_time: Optional[float] = None,
+) -> Tuple[str, str]:
+    """
+    Write chat.db and AddressBook-v22.abcddb into a directory.
+
+    Returns:
+        (chat_db_path, addressbook_db_path)
+    """
+    os.makedirs(directory, exist_ok=True)
+    chat_db = os.path.join(directory, "chat.db")
+    addressbook_db = os.path.join(directory, "AddressBook-v22.abcddb")
+    roster = generate_chat_db(
+        chat_db, messages=messages, people=people, seed=seed, end_time=end_time
+    )
+    generate_addressbook_db(addressbook_db, roster, seed=seed)
+    return chat_db, addressbook_db
+
+
+class FixtureTestCase(unittest.TestCase):
+    """
+    Test case that runs against a generated fixture.
+
+    The fixture is generated once per class (FIXTURE_MESSAGES messages,
+    FIXTURE_PEOPLE people). Each test gets its own copy in self.fixture_dir,
+    so it may write to self.chat_db, with MAC_MESSAGES_DB_PATHS and
+    MAC_MESSAGES_ADDRESSBOOK_PATHS pointing at it and every module cache
+    reset before and after.
+    """
+
+    FIXTURE_MESSAGES = 500
+    FIXTURE_PEOPLE = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._fixture_tmpdir = tempfile.TemporaryDirectory()
+        cls._fixture_files = generate_fixture_dir(
+            cls._fixture_tmpdir.name, messages=cls.FIXTURE_MESSAGES, people=cls.FIXTURE_PEOPLE
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._fixture_tmpdir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.fixture_dir = tmpdir.name
+        self.chat_db, self.addressbook_db = (
+            shutil.copy(path, self.fixture_dir) for path in self._fixture_files
+        )
+        self.env = {
+            "MAC_MESSAGES_DB_PATHS": self.chat_db,
+            "MAC_MESSAGES_ADDRESSBOOK_PATHS": self.addressbook_db,
+        }
+        env_patch = patch.dict(os.environ, self.env)
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        reset_caches()
+        self.addCleanup(reset_caches)
+
+
+def reset_caches() -> None:
+    """Clear every cache in the package so the next call reads the fixture."""
+    # Imported here so generating fixtures only needs the standard library
+    from mac_messages_mcp import messages, relationships
+
+    messages.reset_caches()
+    relationships.reset()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("output_dir")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--people", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end-time", type=float, default=None,
+                        help="Unix time of the newest message (default: now)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    chat_db, addressbook_db = generate_fixture_dir(
+        args.output_dir, args.messages, args.people, args.seed, args.end_time
+    )
+    print(f"Wrote {chat_db} and {addressbook_db} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Tests for vectorized conversation analytics
+"""
+import sqlite3
+import time
+import unittest
+
+import numpy as np
+
+from mac_messages_mcp import analytics, messages
+from tests.fixtures import FixtureTestCase
+
+HOUR = 3600
+
+
+class TestConversationStats(unittest.TestCase):
+    """Tests for the array computations on a hand-built conversation"""
+
+    def _conversation(self, events):
+        """events: (seconds, sender) with sender 0 for you."""
+        times = np.array([t for t, _ in events], dtype=np.float64)
+        sender = np.array([s for _, s in events], dtype=np.int64)
+        return analytics.Conversation(times, sender == 0, sender, ["", "+15551234567"])
+
+    def test_latency_and_initiation(self):
+        """Turn changes count as replies; long silences start new conversations"""
+        conversation = self._conversation([
+            (0, 1), (60, 1), (300, 0),          # they start, you reply after 4m
+            (900, 1),                           # they reply after 10m
+            (10 * HOUR, 0), (10 * HOUR + 30, 1),  # you start, they reply after 30s
+            (30 * HOUR, 1),                     # they start again
+        ])
+        latencies = analytics.reply_latencies(conversation, 6 * HOUR)
+        self.assertEqual(latencies["me"].tolist(), [240])
+        self.assertEqual(latencies["them"].tolist(), [600, 30])
+
+        starts = analytics.conversation_starts(conversation, 6 * HOUR)
+        self.assertEqual(np.flatnonzero(starts).tolist(), [0, 4, 6])
+        self.assertEqual(int((starts & conversation.from_me).sum()), 1)
+
+        summary = analytics.summarize_latencies(latencies["them"])
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["median_seconds"], 315.0)
+        self.assertEqual(summary["histogram"]["<1m"], 1)
+        self.assertEqual(summary["histogram"]["5-15m"], 1)
+
+    def test_group_replies_between_others_are_not_theirs_to_you(self):
+        """In a group, only answers to your messages count as their reply latency"""
+        times = np.array([0, 60, 120, 300], dtype=np.float64)
+        sender = np.array([1, 2, 0, 2], dtype=np.int64)  # Ana, Ben, you, Ben
+        conversation = analytics.Conversation(times, sender == 0, sender, ["", "ana@example.com", "+15551234567"])
+        latencies = analytics.reply_latencies(conversation, 6 * HOUR)
+        self.assertEqual(latencies["me"].tolist(), [60])
+        self.assertEqual(latencies["them"].tolist(), [180])
+
+    def test_heatmap_uses_local_weekday_and_hour(self):
+        """Each message lands in its local weekday/hour cell"""
+        times = np.array([time.mktime((2024, 3, 4, 9, 30, 0, 0, 0, -1)),    # Monday 09:30
+                          time.mktime((2024, 3, 10, 23, 5, 0, 0, 0, -1)),   # Sunday 23:05
+                          time.mktime((2024, 7, 10, 14, 0, 0, 0, 0, -1))])  # Wednesday 14:00
+        heatmap = analytics.activity_heatmap(times)
+        self.assertEqual(heatmap.shape, (7, 24))
+        self.assertEqual(heatmap.sum(), 3)
+        self.assertEqual((heatmap[0, 9], heatmap[6, 23], heatmap[2, 14]), (1, 1, 1))
+
+    def test_apple_dates_in_seconds_and_nanoseconds(self):
+        """Both date encodings convert to the same Unix time"""
+        unix = analytics.apple_dates_to_unix([700000000, 700000000 * 1_000_000_000])
+        self.assertEqual(unix.tolist(), [700000000 + 978307200] * 2)
+
+
+class TestConversationAnalytics(FixtureTestCase):
+    """Tests for loading a fixture conversation into arrays"""
+
+    FIXTURE_MESSAGES = 3000
+
+    def test_person_history_matches_direct_query(self):
+        """A person's stats cover every direct message across all of their handles"""
+        conn = sqlite3.connect(self.chat_db)
+        email = conn.execute("SELECT id FROM handle WHERE id LIKE '%@%' LIMIT 1").fetchone()[0]
+        person = messages.find_person(email)
+        ids = [h for ids in person.handle_ids.values() for h in ids]
+        expected_total, expected_sent = conn.execute(
+            f"SELECT COUNT(*), SUM(is_from_me) FROM message WHERE handle_id IN ({','.join('?' * len(ids))})"
+            " AND cache_roomnames IS NULL"
+            " AND COALESCE(associated_message_type, 0) NOT BETWEEN 2000 AND 3999",
+            ids,
+        ).fetchone()
+        chat_id, chat_total = conn.execute(
+            "SELECT c.chat_identifier, COUNT(*) FROM chat c"
+            " JOIN chat_message_join cmj ON cmj.chat_id = c.ROWID"
+            " JOIN message m ON m.ROWID = cmj.message_id"
+            " WHERE c.style = 43 AND COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999"
+            " GROUP BY c.ROWID LIMIT 1"
+        ).fetchone()
+        conn.close()
+
+        stats = analytics.get_conversation_analytics(contact=person.phones[0])
+        chat_stats = analytics.get_conversation_analytics(chat_id=chat_id)
+        missing = analytics.get_conversation_analytics(chat_id="chat-does-not-exist")
+
+        self.assertEqual(stats["label"], person.name)
+        self.assertEqual((stats["messages"], stats["sent"]), (expected_total, expected_sent))
+        self.assertEqual(sum(map(sum, stats["heatmap"])), expected_total)
+        conversations = stats["conversations"]
+        self.assertLessEqual(conversations["started_by_me"], conversations["count"])
+        self.assertEqual(chat_stats["messages"], chat_total)
+        self.assertIn("error", missing)
+
+
+if __name__ == '__main__':
+    unittest.main()
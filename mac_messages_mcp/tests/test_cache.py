@@ -0,0 +1,48 @@
+"""
+Tests for the message-window result cache
+"""
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp import messages
+from tests.fixtures import FixtureTestCase
+
+
+class TestResultCache(FixtureTestCase):
+    """Tests for caching get_recent_messages by database version"""
+
+    def _add_message(self, text):
+        conn = sqlite3.connect(self.chat_db)
+        latest = conn.execute("SELECT MAX(date), MAX(ROWID) FROM message").fetchone()
+        conn.execute(
+            "INSERT INTO message (guid, text, handle_id, date, is_from_me) VALUES (?, ?, 1, ?, 1)",
+            (f"new-{latest[1]}", text, latest[0] + 1),
+        )
+        conn.commit()
+        conn.close()
+
+    def test_repeat_calls_are_served_from_cache(self):
+        """The same (hours, contact) within a minute skips the database"""
+        first = messages.get_recent_messages(hours=24 * 30)
+        with patch.object(messages, "query_messages_sources") as query:
+            second = messages.get_recent_messages(hours=24 * 30)
+        query.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_new_message_invalidates(self):
+        """A write to chat.db changes the version and forces a fresh read"""
+        messages.get_recent_messages(hours=24 * 30)
+        self._add_message("brand new message")
+        self.assertIn("brand new message", messages.get_recent_messages(hours=24 * 30))
+
+    def test_contact_selection_is_not_cached(self):
+        """contact:N answers depend on the previous lookup and are never cached"""
+        with patch.object(messages, "_get_recent_messages", return_value="ok") as inner:
+            messages.get_recent_messages(hours=24, contact="contact:1")
+            messages.get_recent_messages(hours=24, contact="contact:1")
+        self.assertEqual(inner.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Tests for query deadlines and cancellation
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+import anyio
+
+from mac_messages_mcp.deadline import Deadline, cancellable_tool, deadline_scope, report_progress
+from mac_messages_mcp.sources import DatabaseSource
+
+# Produces rows slowly enough that any budget below a few seconds runs out
+_SLOW_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000)
+    SELECT i FROM n WHERE i % 1000000 = 0
+"""
+
+
+class TestDeadline(unittest.TestCase):
+    """Tests for progress-handler enforced budgets"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "chat.db")
+        sqlite3.connect(path).close()
+        self.source = DatabaseSource(path)
+
+    def tearDown(self):
+        self.source.pool.close()
+        self.tmpdir.cleanup()
+
+    def test_expired_budget_returns_partial_rows(self):
+        """An over-budget scan stops early and is marked truncated"""
+        deadline = Deadline(0.2)
+        started = time.monotonic()
+        with deadline_scope(deadline):
+            rows = self.source.query(_SLOW_QUERY)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertTrue(deadline.truncated)
+        self.assertLess(len(rows), 100)
+        self.assertIn("time budget", deadline.truncation_notice())
+        # The pooled connection is still usable afterwards
+        self.assertEqual(self.source.query("SELECT 1 AS one"), [{"one": 1}])
+
+    def test_cancel_from_another_thread(self):
+        """Cancelling the deadline interrupts a running query"""
+        deadline = Deadline(None)
+        threading.Timer(0.1, deadline.cancel).start()
+        with deadline_scope(deadline):
+            self.source.query(_SLOW_QUERY)
+        self.assertTrue(deadline.truncated)
+        self.assertIn("cancelled", deadline.truncation_notice())
+
+    def test_cancelled_tool_stops_its_thread(self):
+        """Cancelling an MCP tool call cancels the worker's SQLite scan"""
+        finished = threading.Event()
+
+        @cancellable_tool
+        def tool_slow() -> str:
+            rows = self.source.query(_SLOW_QUERY)
+            finished.set()
+            return f"{len(rows)} rows"
+
+        async def main():
+            with anyio.move_on_after(0.1):
+                await tool_slow()
+
+        anyio.run(main)
+        self.assertTrue(finished.wait(2))
+
+    def test_progress_is_forwarded_to_the_client(self):
+        """Work reported in the worker reaches ctx.report_progress in increasing order"""
+        notifications = []
+
+        class FakeContext:
+            request_context = SimpleNamespace(meta=SimpleNamespace(progressToken="token-1"))
+
+            async def report_progress(self, progress, total=None, message=None):
+                notifications.append((progress, message))
+
+        @cancellable_tool
+        def tool_scan(ctx) -> str:
+            for step in range(3):
+                report_progress(10, f"step {step}", force=True)
+                time.sleep(0.01)
+            rows = self.source.query("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000) SELECT i FROM n")
+            report_progress(0, "done", force=True)
+            return f"{len(rows)} rows"
+
+        result = anyio.run(tool_scan, FakeContext())
+        self.assertEqual(result, "5000 rows")
+        progress = [p for p, _ in notifications]
+        self.assertEqual(progress[:3], [10, 20, 30])
+        self.assertEqual(notifications[-1], (5030, "done"))
+        self.assertEqual(progress, sorted(progress))
+
+    def test_no_progress_without_token(self):
+        """Clients that didn't ask for progress get no notifications"""
+        notifications = []
+
+        class FakeContext:
+            request_context = SimpleNamespace(meta=SimpleNamespace(progressToken=None))
+
+            async def report_progress(self, progress, total=None, message=None):
+                notifications.append(progress)
+
+        @cancellable_tool
+        def tool_scan(ctx) -> str:
+            report_progress(10, "step", force=True)
+            return "ok"
+
+        self.assertEqual(anyio.run(tool_scan, FakeContext()), "ok")
+        self.assertEqual(notifications, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
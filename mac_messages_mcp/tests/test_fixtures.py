@@ -0,0 +1,52 @@
+"""
+Tests for the synthetic database generator
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from mac_messages_mcp.messages import extract_body_from_attributed, get_recent_messages
+from tests.fixtures import FixtureTestCase, generate_fixture_dir, make_attributed_body
+
+_END_TIME = 1_760_000_000.0  # Fixed so generated rows are reproducible
+
+
+class TestFixtures(unittest.TestCase):
+    """Tests for tests.fixtures"""
+
+    def test_attributed_body_round_trip(self):
+        """Generated blobs decode with the production extractor"""
+        blob = make_attributed_body("see you soon")
+        self.assertEqual(extract_body_from_attributed(blob), "see you soon")
+
+    def test_generation_is_deterministic(self):
+        """The same seed and end time produce identical rows"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rows = []
+            for name in ("a", "b"):
+                chat_db, _ = generate_fixture_dir(
+                    os.path.join(tmpdir, name), messages=500, people=20, end_time=_END_TIME
+                )
+                conn = sqlite3.connect(chat_db)
+                rows.append(conn.execute("SELECT guid, date, text FROM message").fetchall())
+                conn.close()
+            self.assertEqual(rows[0], rows[1])
+            self.assertEqual(len(rows[0]), 500)
+
+
+class TestFixtureTestCase(FixtureTestCase):
+    """Tests for tests.fixtures.FixtureTestCase"""
+
+    FIXTURE_MESSAGES = 2000
+    FIXTURE_PEOPLE = 30
+
+    def test_package_reads_generated_databases(self):
+        """The fixture is usable through the database source registry"""
+        result = get_recent_messages(hours=24 * 30)
+        self.assertNotIn("Error", result)
+        self.assertGreater(len(result.splitlines()), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for compact, budgeted message rendering
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from mac_messages_mcp.formatting import (
+    _FOOTER_RESERVE,
+    budget_chars,
+    relative_time,
+    render_compact,
+    trim_body,
+)
+
+NOW = datetime(2024, 3, 14, 12, 0, 0)
+
+
+def _message(minutes_ago, sender, body, chat=None):
+    return {"time": (NOW - timedelta(minutes=minutes_ago)).timestamp(), "sender": sender, "body": body, "chat": chat}
+
+
+class TestCompactRendering(unittest.TestCase):
+    """Tests for grouping, relative times and the output budget"""
+
+    def test_consecutive_messages_share_a_header(self):
+        """Runs from the same sender and chat are grouped; single messages stay on one line"""
+        output = render_compact([
+            _message(5, "Ana", "on my way"),
+            _message(6, "Ana", "leaving now"),
+            _message(7, "Ana", "hi", chat="Climbing"),
+            _message(60 * 26, "You", "see you tomorrow"),
+        ], NOW)
+        self.assertEqual(output.splitlines(), [
+            "Ana · 5m ago:",
+            "  on my way",
+            "  leaving now",
+            "Ana in Climbing · 7m ago: hi",
+            "You · yesterday 10:00: see you tomorrow",
+        ])
+
+    def test_budget_stops_output_with_footer(self):
+        """Output stays within the budget and says how much was left out"""
+        messages = [_message(i * 45, f"Person {i % 2}", "word " * 40) for i in range(50)]
+        output = render_compact(messages, NOW, max_chars=budget_chars(max_tokens=200))
+        self.assertLessEqual(len(output), 800)
+        self.assertRegex(output.splitlines()[-1], r"^… \d+ more messages not shown")
+
+    def test_budget_smaller_than_first_message(self):
+        """A cut first run only counts the messages written in full"""
+        single = [_message(5, "Ana", "word " * 200), _message(90, "Ben", "hi")]
+        output = render_compact(single, NOW, max_chars=120, max_body_chars=2000)
+        self.assertTrue(output.splitlines()[0].endswith("…"))
+        self.assertRegex(output.splitlines()[-1], r"^… 2 more messages not shown")
+
+        run = [_message(5 + i, "Ana", f"line {i} " + "word " * 4) for i in range(10)]
+        output = render_compact(run, NOW, max_chars=_FOOTER_RESERVE + 60)
+        written = [line for line in output.splitlines()[1:-1] if not line.endswith("…")]
+        self.assertRegex(output.splitlines()[-1], rf"^… {10 - len(written)} more messages not shown")
+
+    def test_helpers(self):
+        """Relative times, trimming and budget conversion"""
+        self.assertEqual(relative_time(NOW.timestamp() - 30, NOW), "just now")
+        self.assertEqual(relative_time((NOW - timedelta(hours=3)).timestamp(), NOW), "3h ago")
+        self.assertEqual(relative_time((NOW - timedelta(days=3)).timestamp(), NOW), "Mon 12:00")
+        self.assertEqual(relative_time((NOW - timedelta(days=30)).timestamp(), NOW), "2024-02-13")
+        self.assertEqual(trim_body("a  b\n c" + "x" * 20, 10), "a b cxxxx…")
+        self.assertEqual(budget_chars(max_tokens=100, max_chars=300), 300)
+        self.assertIsNone(budget_chars())
+
+
+if __name__ == '__main__':
+    unittest.main()
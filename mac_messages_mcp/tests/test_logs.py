@@ -0,0 +1,101 @@
+"""
+Tests for queued JSON logging, sampling and argument truncation
+"""
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp import logs
+
+
+class TestLogs(unittest.TestCase):
+    """Tests for the QueueHandler/QueueListener pipeline"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.logger = logging.getLogger("mac_messages_mcp.test_logs")
+        self.logger.propagate = False
+        logs.configure_logging(stream=self.stream, json_format=True, logger=self.logger)
+        self.addCleanup(logs.stop_logging, self.logger)
+
+    def records(self):
+        logs.stop_logging(self.logger)
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_written_off_thread_as_json(self):
+        """The caller only enqueues; the listener thread formats and writes"""
+        writers = []
+        original_emit = logging.StreamHandler.emit
+
+        def emit(handler, record):
+            writers.append(threading.current_thread())
+            original_emit(handler, record)
+
+        with patch.object(logging.StreamHandler, "emit", emit):
+            logs.log_tool_call(self.logger, "get_recent_messages", hours=24, contact="Alice", max_tokens=None)
+            try:
+                raise ValueError("bad input")
+            except ValueError:
+                self.logger.error("Error in get_recent_messages: %s", "bad input", exc_info=True)
+            records = self.records()
+
+        self.assertTrue(writers)
+        self.assertNotIn(threading.current_thread(), writers)
+        call, error = records
+        self.assertEqual(call["tool"], "get_recent_messages")
+        self.assertEqual(call["tool_args"], {"hours": 24, "contact": "Alice"})
+        self.assertEqual(error["level"], "ERROR")
+        self.assertEqual(error["message"], "Error in get_recent_messages: bad input")
+        self.assertIn("ValueError: bad input", error["exception"])
+
+    def test_long_arguments_are_truncated(self):
+        """Message bodies and lists are cut to the configured length"""
+        body = "word " * 400
+        logs.log_tool_call(self.logger, "send_message", recipient="+15551234567", message=body,
+                           contacts=["Alice"] * 100)
+        args = self.records()[0]["tool_args"]
+        self.assertEqual(args["recipient"], "+15551234567")
+        self.assertTrue(args["message"].startswith("word word"))
+        self.assertTrue(args["message"].endswith(f"…(+{len(body) - logs.DEFAULT_ARG_CHARS} chars)"))
+        self.assertLess(len(args["contacts"]), logs.DEFAULT_ARG_CHARS + 30)
+
+    def test_per_tool_sampling(self):
+        """A tool sampled at 0.25 logs every fourth call; other tools log every call"""
+        rates = {"*": 1.0, "get_recent_messages": 0.25, "get_metrics": 0.0}
+        with patch.object(logs, "_SAMPLE_RATES", rates), patch.object(logs, "_CALL_COUNTS", {}):
+            for _ in range(8):
+                logs.log_tool_call(self.logger, "get_recent_messages", hours=1)
+                logs.log_tool_call(self.logger, "get_metrics")
+                logs.log_tool_call(self.logger, "find_contact", name="Bob")
+        records = self.records()
+        counts = {}
+        for record in records:
+            counts[record["tool"]] = counts.get(record["tool"], 0) + 1
+        self.assertEqual(counts, {"get_recent_messages": 2, "find_contact": 8})
+        sampled = [r for r in records if r["tool"] == "get_recent_messages"]
+        self.assertEqual(sampled[0]["sample_rate"], 0.25)
+
+    def test_sample_rates_from_environment(self):
+        """MAC_MESSAGES_LOG_SAMPLE parses tool=rate pairs and ignores junk"""
+        with patch.dict("os.environ", {logs.LOG_SAMPLE_ENV: "get_recent_messages=0.1, *=0.5,bogus,x=2"}):
+            rates = logs._sample_rates()
+        self.assertEqual(rates, {"*": 0.5, "get_recent_messages": 0.1, "x": 1.0})
+
+    def test_importing_the_server_leaves_logging_alone(self):
+        """configure_logging runs from run_server, not when server.py is imported"""
+        script = ("import logging, mac_messages_mcp.server; "
+                  "print(*(type(h).__name__ for h in logging.getLogger().handlers))")
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("_QueueHandler", result.stdout.split())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
 """
 Tests for the messages module
 """
+import os
+import sqlite3
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 
+from mac_messages_mcp import messages
+from mac_messages_mcp.deadline import Deadline, deadline_scope
+from mac_messages_mcp.sources import apple_date_ns_sql
 from mac_messages_mcp.messages import run_applescript, get_messages_db_path, query_messages_db
+from tests.fixtures import FixtureTestCase, reset_caches
 
 class TestMessages(unittest.TestCase):
     """Tests for the messages module"""
@@ -57,5 +64,523 @@ class TestMessages(unittest.TestCase):
         self.assertEqual(result, '/Users/testuser/Library/Messages/chat.db')
         mock_expanduser.assert_called_with('~')
 
+
+class TestContactRanking(unittest.TestCase):
+    """Tests for ranking name matches by message activity"""
+
+    CONTACTS = {"15550001111": "Sam Smith", "15550002222": "Sam Smith"}
+
+    def _find(self, activity):
+        with patch.object(messages, "get_cached_contacts", return_value=self.CONTACTS), \
+                patch.object(messages, "get_handle_activity", return_value=activity):
+            return messages.find_contact_by_name("Sam")
+
+    def test_active_contact_ranks_first_and_is_auto_selected(self):
+        """The Sam you text daily beats the one from years ago"""
+        now = time.time()
+        matches = self._find({
+            "15550002222": {"messages": 500, "last_message": now - 3600},
+            "5550001111": {"messages": 2, "last_message": now - 400 * 86400},
+        })
+        self.assertEqual(matches[0]["phone"], "15550002222")
+        self.assertEqual(matches[1]["messages"], 2)
+        self.assertIs(messages.pick_dominant_contact(matches), matches[0])
+        with patch.dict(os.environ, {messages.AUTO_SELECT_ENV: "false"}):
+            self.assertIsNone(messages.pick_dominant_contact(matches))
+
+    def test_send_never_auto_selects(self):
+        """Even a clear winner isn't messaged without an explicit contact:N choice"""
+        now = time.time()
+        activity = {
+            "15550002222": {"messages": 500, "last_message": now - 3600},
+            "5550001111": {"messages": 2, "last_message": now - 400 * 86400},
+        }
+        with patch.object(messages, "get_cached_contacts", return_value=self.CONTACTS), \
+                patch.object(messages, "get_handle_activity", return_value=activity), \
+                patch.object(messages, "_send_message_to_recipient") as send:
+            result = messages.send_message("Sam", "On my way")
+        send.assert_not_called()
+        self.assertIn("contact:", result)
+
+    def test_comparable_contacts_still_ask(self):
+        """Two people you talk to about as much are left for the user to pick"""
+        now = time.time()
+        matches = self._find({
+            "15550001111": {"messages": 300, "last_message": now - 3600},
+            "15550002222": {"messages": 250, "last_message": now - 7200},
+        })
+        self.assertIsNone(messages.pick_dominant_contact(matches))
+
+
+class TestHandleActivity(FixtureTestCase):
+    """Tests for the incrementally maintained per-handle activity"""
+
+    def test_handle_activity_counts_every_message(self):
+        """Per-handle aggregates cover all messages and only read new rows afterwards"""
+        conn = sqlite3.connect(self.chat_db)
+        expected = conn.execute(
+            "SELECT COUNT(*) FROM message m JOIN handle h ON m.handle_id = h.ROWID"
+        ).fetchone()[0]
+        handle_id, handle, max_rowid = conn.execute(
+            "SELECT h.ROWID, h.id, (SELECT MAX(ROWID) FROM message) FROM handle h WHERE h.id LIKE '+%' LIMIT 1"
+        ).fetchone()
+        activity = messages.get_handle_activity()
+        with patch.object(messages, "query_messages_db") as query:
+            self.assertEqual(messages.get_handle_activity(), activity)
+        query.assert_not_called()
+
+        key = messages.normalize_phone_number(handle)
+        before = activity[key]["messages"]
+        conn.execute(
+            "INSERT INTO message (guid, date, text, is_from_me, handle_id) VALUES ('new-1', 1, 'hi', 0, ?)",
+            (handle_id,),
+        )
+        conn.commit()
+        conn.close()
+        with patch.object(messages, "query_messages_db", wraps=messages.query_messages_db) as query:
+            updated = messages.get_handle_activity()
+        self.assertEqual(query.call_args.args[1], (max_rowid, max_rowid + 1))
+        self.assertEqual(sum(entry["messages"] for entry in activity.values()), expected)
+        self.assertEqual(updated[key]["messages"], before + 1)
+
+
+class TestResolveContacts(FixtureTestCase):
+    """Tests for resolving many names, numbers and emails in one call"""
+
+    FIXTURE_PEOPLE = 20
+
+    def test_bulk_resolution(self):
+        """Names, numbers, emails and unknowns resolve in order with handle ids"""
+        conn = sqlite3.connect(self.addressbook_db)
+        first, last, phone, email = conn.execute(
+            "SELECT r.ZFIRSTNAME, r.ZLASTNAME, p.ZFULLNUMBER, e.ZADDRESS FROM ZABCDRECORD r "
+            "JOIN ZABCDPHONENUMBER p ON p.ZOWNER = r.Z_PK "
+            "JOIN ZABCDEMAILADDRESS e ON e.ZOWNER = r.Z_PK LIMIT 1"
+        ).fetchone()
+        conn.close()
+        results = messages.resolve_contacts(
+            [phone, email.upper(), "Zebediah Quux", "+1 212 000 0000", phone]
+        )
+
+        self.assertEqual([r["query"] for r in results][:2], [phone, email.upper()])
+        by_phone, by_email, unknown_name, unknown_number, repeat = results
+        self.assertEqual(by_phone["status"], "resolved")
+        self.assertEqual(by_phone["person"]["name"], f"{first} {last}")
+        self.assertEqual(by_email["person"]["id"], by_phone["person"]["id"])
+        self.assertGreater(len(by_phone["person"]["handle_ids"][self.chat_db]), 1)
+        self.assertIn(email, by_phone["person"]["emails"])
+        self.assertEqual(unknown_name["status"], "not_found")
+        self.assertEqual(unknown_number["status"], "not_found")
+        self.assertEqual(repeat["person"], by_phone["person"])
+
+    def test_partial_index_is_not_cached(self):
+        """An index built under a cut-short deadline is rebuilt on the next call"""
+        deadline = Deadline(None)
+        deadline.truncated = True
+        with deadline_scope(deadline):
+            partial = messages.get_person_index()
+        complete = messages.get_person_index()
+
+        self.assertIsNone(partial.version)
+        self.assertIsNot(complete, partial)
+        self.assertIs(messages.get_person_index(), complete)
+
+
+class TestLatestMessages(FixtureTestCase):
+    """Tests for the batched newest-message query"""
+
+    FIXTURE_MESSAGES = 1000
+    FIXTURE_PEOPLE = 20
+
+    def test_one_query_for_many_contacts(self):
+        """Each contact gets its own newest message, all from a single statement"""
+        conn = sqlite3.connect(self.addressbook_db)
+        people = conn.execute(
+            "SELECT p.ZFULLNUMBER, e.ZADDRESS FROM ZABCDRECORD r "
+            "JOIN ZABCDPHONENUMBER p ON p.ZOWNER = r.Z_PK "
+            "LEFT JOIN ZABCDEMAILADDRESS e ON e.ZOWNER = r.Z_PK ORDER BY r.Z_PK LIMIT 6"
+        ).fetchall()
+        conn.close()
+        conn = sqlite3.connect(self.chat_db)
+        expected = {}
+        for phone, email in people:
+            digits = "".join(c for c in phone if c.isdigit())[-10:]
+            expected[phone] = conn.execute(
+                "SELECT m.date FROM message m JOIN handle h ON m.handle_id = h.ROWID "
+                "WHERE (h.id = ? OR h.id = ?) "
+                "AND COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999 "
+                "ORDER BY m.date DESC LIMIT 1",
+                ("+1" + digits, email),
+            ).fetchone()
+        conn.close()
+
+        contacts = [phone for phone, _email in people] + ["+1 212 000 0000"]
+        messages.get_person_index()
+        with patch.object(messages, "query_messages_db", wraps=messages.query_messages_db) as query:
+            results = messages.get_latest_messages(contacts, hours=24 * 3650)
+        single = messages.get_latest_message_from_contact(contacts[0], hours=24 * 3650)
+
+        self.assertEqual(query.call_count, 1)
+        self.assertIsNone(results["+1 212 000 0000"])
+        self.assertEqual(single, results[contacts[0]])
+        for phone, row in expected.items():
+            if row is None:
+                self.assertIsNone(results[phone])
+            elif results[phone] is not None:
+                self.assertEqual(results[phone]["date"], row[0])
+        self.assertTrue(any(results[phone] for phone in expected))
+
+    def test_skips_tapbacks_and_reads_every_source(self):
+        """A newer tapback is ignored, and a newer message in a second database wins"""
+        other_dir = os.path.join(self.fixture_dir, "other")
+        os.makedirs(other_dir)
+        other_db = os.path.join(other_dir, "chat.db")
+        conn = sqlite3.connect(self.addressbook_db)
+        phone = conn.execute(
+            "SELECT p.ZFULLNUMBER FROM ZABCDPHONENUMBER p ORDER BY p.Z_PK LIMIT 1"
+        ).fetchone()[0]
+        conn.close()
+        digits = "".join(c for c in phone if c.isdigit())[-10:]
+
+        conn = sqlite3.connect(self.chat_db)
+        handle_id = conn.execute("SELECT ROWID FROM handle WHERE id = ?", ("+1" + digits,)).fetchone()[0]
+        newest = conn.execute("SELECT MAX(date) FROM message").fetchone()[0]
+        conn.execute(
+            "INSERT INTO message (guid, text, handle_id, date, is_from_me, associated_message_type) "
+            "VALUES ('tapback-latest', 'Loved “hi”', ?, ?, 0, 2000)",
+            (handle_id, newest + 1_000_000_000),
+        )
+        conn.commit()
+        conn.execute("VACUUM INTO ?", (other_db,))
+        conn.close()
+        primary_only = messages.get_latest_messages([phone], hours=24 * 3650)[phone]
+
+        conn = sqlite3.connect(other_db)
+        conn.execute(
+            "INSERT INTO message (guid, text, handle_id, date, is_from_me) "
+            "VALUES ('other-latest', 'from the other Mac', ?, ?, 1)",
+            (handle_id, newest + 2_000_000_000),
+        )
+        conn.commit()
+        conn.close()
+        with patch.dict(os.environ, {"MAC_MESSAGES_DB_PATHS": os.pathsep.join([self.chat_db, other_db])}):
+            reset_caches()
+            both = messages.get_latest_messages([phone], hours=24 * 3650)[phone]
+
+        self.assertIsNotNone(primary_only)
+        self.assertLessEqual(primary_only["date"], newest)
+        self.assertNotIn("Loved", primary_only["body"])
+        self.assertEqual(both["body"], "from the other Mac")
+        self.assertTrue(both["is_from_me"])
+
+
+class TestChatDirectory(FixtureTestCase):
+    """Tests for the paged chat directory"""
+
+    FIXTURE_MESSAGES = 1000
+    FIXTURE_PEOPLE = 30
+
+    def test_pages_are_sorted_and_cached(self):
+        """Group chats come newest first with members, and paging reuses the cached build"""
+        conn = sqlite3.connect(self.chat_db)
+        groups = conn.execute("SELECT COUNT(*) FROM chat WHERE style = 43").fetchone()[0]
+        conn.close()
+        first = messages.get_chat_directory(limit=2)
+        with patch.object(messages, "query_messages_db") as query:
+            second = messages.get_chat_directory(limit=2, offset=2)
+            everything = messages.get_chat_directory(limit=500, include_direct=True)
+        query.assert_not_called()
+
+        self.assertEqual(first["total"], groups)
+        self.assertEqual(first["next_offset"], 2)
+        self.assertTrue(all(chat["is_group"] for chat in first["chats"] + second["chats"]))
+        dates = [chat["last_message"] for chat in first["chats"] + second["chats"]]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        chat = first["chats"][0]
+        self.assertEqual(chat["participants"], len(chat["members"]))
+        self.assertNotIn("+", "".join(chat["members"]))
+        self.assertGreater(everything["total"], groups)
+        self.assertIn("error", messages.get_chat_directory(sort="size"))
+
+    def test_second_dates_sort_by_time(self):
+        """A chat whose newest row is stored in seconds still sorts by when it happened"""
+        conn = sqlite3.connect(self.chat_db)
+        chat_rowid, chat_id = conn.execute(
+            "SELECT c.ROWID, c.chat_identifier FROM chat c JOIN chat_message_join cmj ON cmj.chat_id = c.ROWID"
+            " WHERE c.style = 43 GROUP BY c.ROWID ORDER BY MAX(cmj.message_date) LIMIT 1"
+        ).fetchone()
+        newest = conn.execute("SELECT MAX(message_date) FROM chat_message_join").fetchone()[0]
+        conn.execute(
+            "INSERT INTO chat_message_join (chat_id, message_id, message_date) VALUES (?, 1, ?)",
+            (chat_rowid, newest // 1_000_000_000 + 60),
+        )
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(messages.get_chat_directory(limit=1)["chats"][0]["chat_id"], chat_id)
+
+    def test_partial_directory_is_not_cached(self):
+        """A directory built under a cut-short deadline is rebuilt on the next call"""
+        deadline = Deadline(None)
+        deadline.truncated = True
+        with deadline_scope(deadline):
+            messages.get_chat_directory()
+        with patch.object(messages, "_build_chat_directory", wraps=messages._build_chat_directory) as build:
+            messages.get_chat_directory()
+            messages.get_chat_directory()
+        self.assertEqual(build.call_count, 1)
+
+
+class TestReactionFolding(unittest.TestCase):
+    """Tests for folding tapbacks into their parent messages"""
+
+    def test_latest_reaction_per_sender_wins(self):
+        """A newer reaction replaces the sender's older one and a removal cancels it"""
+        encoded = "\x1f".join([
+            "2000:0:+15551234567",  # they love it
+            "2001:1:",              # you like it
+            "2003:1:",              # then change to a laugh
+            "2001:0:a@example.com",
+            "3001:0:a@example.com",  # and take the like back
+            "2000:0:b@example.com",
+        ])
+        self.assertEqual(
+            messages.fold_reactions(encoded),
+            [("❤️", ["+15551234567", "b@example.com"]), ("😂", [""])],
+        )
+        self.assertEqual(messages.fold_reactions(None), [])
+
+
+class TestRecentMessageReactions(FixtureTestCase):
+    """Tests for reactions in the recent-messages window"""
+
+    FIXTURE_MESSAGES = 1000
+    FIXTURE_PEOPLE = 20
+
+    def test_reactions_annotate_parents_instead_of_using_rows(self):
+        """Reaction rows don't count toward the window and show up on their parent"""
+        conn = sqlite3.connect(self.chat_db)
+        text, attributed_body, reaction_type = conn.execute(
+            "WITH page AS (SELECT guid, text, attributedBody, date FROM message"
+            " WHERE COALESCE(associated_message_type, 0) NOT BETWEEN 2000 AND 3999"
+            " ORDER BY date DESC LIMIT 100)"
+            " SELECT page.text, page.attributedBody, r.associated_message_type FROM page"
+            " JOIN message r ON r.associated_message_guid = 'p:0/' || page.guid"
+            " GROUP BY page.guid HAVING COUNT(*) = 1 AND SUM(r.is_from_me) = 1"
+            " ORDER BY page.date DESC LIMIT 1"
+        ).fetchone()
+        conn.close()
+        parent_text = messages.get_message_body({"text": text, "attributedBody": attributed_body})
+        result = messages.get_recent_messages(hours=24 * 3650)
+
+        lines = result.splitlines()
+        self.assertFalse(any("“" in line for line in lines))
+        emoji = messages.TAPBACK_EMOJI[reaction_type - 2000]
+        self.assertIn(f"{parent_text} [{emoji} You]", result)
+
+
+class TestRecentMessageBudget(FixtureTestCase):
+    """Tests for keeping get_recent_messages within max_chars"""
+
+    def test_auto_select_note_counts_against_the_budget(self):
+        """The note naming the auto-selected contact fits inside max_chars with the messages"""
+        conn = sqlite3.connect(self.chat_db)
+        handle = conn.execute(
+            "SELECT h.id FROM message m JOIN handle h ON h.ROWID = m.handle_id WHERE h.id LIKE '+%'"
+            " GROUP BY h.id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        conn.close()
+        matches = [
+            {"name": "Sam Smith", "phone": handle, "messages": 500},
+            {"name": "Sam Jones", "phone": "+15550009999", "messages": 1},
+        ]
+        with patch.object(messages, "find_contact_by_name", return_value=matches), \
+                patch.object(messages, "pick_dominant_contact", return_value=matches[0]):
+            for max_chars in (200, 400, 1000):
+                result = messages.get_recent_messages(hours=24 * 3650, contact="Sam", max_chars=max_chars)
+                self.assertLessEqual(len(result), max_chars)
+                self.assertTrue(result.startswith("Showing Sam Smith"))
+
+
+class TestFuzzySearch(FixtureTestCase):
+    """Tests for paged fuzzy search and its progress notifications"""
+
+    FIXTURE_MESSAGES = 1000
+
+    def test_pages_are_scored_and_reported_as_they_are_read(self):
+        """Every page reports the best matches so far, and the pages cover the newest messages once"""
+        conn = sqlite3.connect(self.chat_db)
+        newest = conn.execute("SELECT MAX(date) FROM message").fetchone()[0]
+        conn.execute(
+            "INSERT INTO message (guid, text, handle_id, date, is_from_me) VALUES ('zeppelin', ?, 1, ?, 0)",
+            ("the zeppelin lands at noon", newest + 1),
+        )
+        conn.commit()
+        expected = [row[0] for row in conn.execute(
+            f"SELECT guid FROM message ORDER BY {apple_date_ns_sql('date')} DESC, guid DESC LIMIT ?",
+            (messages.FUZZY_MAX_MESSAGES,),
+        )]
+        conn.close()
+
+        progress = []
+        deadline = Deadline(None, on_progress=lambda work, message: progress.append(message))
+        with deadline_scope(deadline), patch.object(messages, "FUZZY_BATCH", 40), \
+                patch.object(messages, "get_message_body", wraps=messages.get_message_body) as body:
+            result = messages.fuzzy_search_messages("zeppelin lands at noon", hours=24 * 3650, threshold=0.9)
+
+        scored = [c.args[0]["guid"] for c in body.call_args_list][:len(expected)]
+        self.assertEqual(scored, expected)
+        reports = [m for m in progress if m and m.startswith("Scanned")]
+        self.assertEqual(len(reports), -(-len(expected) // 40))
+        self.assertIn('best so far: "the zeppelin lands at noon"', reports[0])
+        self.assertTrue(reports[-1].startswith(f"Scanned {len(expected)} messages"))
+        self.assertIn("the zeppelin lands at noon", result)
+
+
+class TestAttachments(FixtureTestCase):
+    """Tests for paged attachment metadata"""
+
+    FIXTURE_MESSAGES = 1000
+    FIXTURE_PEOPLE = 20
+
+    def test_pages_cover_every_attachment_once(self):
+        """Paging returns each attachment of the chat once, newest first, from one cached load"""
+        conn = sqlite3.connect(self.chat_db)
+        chat_rowid, chat_id = conn.execute(
+            "SELECT c.ROWID, c.chat_identifier FROM chat c"
+            " JOIN chat_message_join cmj ON cmj.chat_id = c.ROWID"
+            " JOIN message_attachment_join maj ON maj.message_id = cmj.message_id"
+            " GROUP BY c.ROWID ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        expected = [row[0] for row in conn.execute(
+            "SELECT a.guid FROM chat_message_join cmj"
+            " JOIN message_attachment_join maj ON maj.message_id = cmj.message_id"
+            " JOIN attachment a ON a.ROWID = maj.attachment_id"
+            " WHERE cmj.chat_id = ? ORDER BY cmj.message_date DESC, a.guid DESC", (chat_rowid,)
+        )]
+        images = conn.execute(
+            "SELECT COUNT(*) FROM chat_message_join cmj"
+            " JOIN message_attachment_join maj ON maj.message_id = cmj.message_id"
+            " JOIN attachment a ON a.ROWID = maj.attachment_id"
+            " WHERE cmj.chat_id = ? AND a.mime_type LIKE 'image/%'", (chat_rowid,)
+        ).fetchone()[0]
+        conn.close()
+        guids, cursor = [], None
+        with patch.object(messages, "query_messages_db", wraps=messages.query_messages_db) as query:
+            while True:
+                page = messages.get_attachments(chat_id, cursor=cursor, limit=3)
+                guids.extend(a["guid"] for a in page["attachments"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            image_guids, cursor = [], None
+            while True:
+                page = messages.get_attachments(chat_id, cursor=cursor, limit=2, mime_type="image/")
+                image_guids.extend(a["guid"] for a in page["attachments"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            missing = messages.get_attachments("chat-does-not-exist")
+
+        self.assertEqual(guids, expected)
+        self.assertEqual(len(image_guids), images)
+        self.assertEqual(page["total"], images)
+        # One attachment join, however many pages
+        joins = [c for c in query.call_args_list if c.args[0] == messages._CHAT_ATTACHMENTS_QUERY]
+        self.assertEqual(len(joins), 1)
+        self.assertIn("error", missing)
+
+
+class TestThreads(FixtureTestCase):
+    """Tests for inline-reply thread reconstruction"""
+
+    FIXTURE_PEOPLE = 5
+
+    def test_thread_from_any_reply_is_nested(self):
+        """Looking up a reply to a reply returns the whole tree from its root"""
+        conn = sqlite3.connect(self.chat_db)
+        date = conn.execute("SELECT MAX(date) FROM message").fetchone()[0]
+        rows = [
+            ("root", "Dinner Friday?", None, 0),
+            ("a", "Yes!", "root", 1),
+            ("b", "Where?", "root", 0),
+            ("a1", "Great", "a", 0),
+        ]
+        for i, (guid, text, parent, from_me) in enumerate(rows):
+            conn.execute(
+                "INSERT INTO message (guid, text, handle_id, date, is_from_me, thread_originator_guid)"
+                " VALUES (?, ?, 1, ?, ?, ?)",
+                (guid, text, date + i + 1, from_me, parent),
+            )
+        conn.commit()
+        conn.close()
+        thread = messages.get_thread("a1")
+        truncated = messages.get_thread("b", limit=2)
+        missing = messages.get_thread("no-such-guid")
+
+        self.assertEqual(thread["messages"], 4)
+        [root] = thread["thread"]
+        self.assertEqual(root["body"], "Dinner Friday?")
+        self.assertEqual([r["guid"] for r in root["replies"]], ["a", "b"])
+        self.assertEqual([r["guid"] for r in root["replies"][0]["replies"]], ["a1"])
+        lines = messages.format_reply_trees(thread["thread"]).splitlines()
+        self.assertEqual([len(line) - len(line.lstrip()) for line in lines], [0, 2, 4, 2])
+        self.assertTrue(lines[2].endswith(": Great"))
+        self.assertTrue(truncated["truncated"])
+        self.assertEqual(truncated["messages"], 2)
+        self.assertIn("error", missing)
+
+
+class TestChatMessages(FixtureTestCase):
+    """Tests for keyset-paged chat reads"""
+
+    FIXTURE_MESSAGES = 1000
+    FIXTURE_PEOPLE = 20
+
+    def test_pages_cover_the_thread_once(self):
+        """Walking the cursor returns every message of the chat once, newest first"""
+        conn = sqlite3.connect(self.chat_db)
+        chat_rowid, chat_id = conn.execute(
+            "SELECT c.ROWID, c.chat_identifier FROM chat c JOIN chat_message_join cmj ON cmj.chat_id = c.ROWID "
+            "WHERE c.style = 43 GROUP BY c.ROWID ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        expected = [row[0] for row in conn.execute(
+            "SELECT m.guid FROM chat_message_join cmj JOIN message m ON m.ROWID = cmj.message_id "
+            "WHERE cmj.chat_id = ? AND COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999 "
+            "ORDER BY cmj.message_date DESC, m.guid DESC", (chat_rowid,)
+        )]
+        reacted = {row[0] for row in conn.execute(
+            "SELECT m.guid FROM chat_message_join cmj JOIN message m ON m.ROWID = cmj.message_id "
+            "JOIN message r ON r.associated_message_guid IN ('p:0/' || m.guid, 'bp:' || m.guid) "
+            "WHERE cmj.chat_id = ?", (chat_rowid,)
+        )}
+        conn.execute(
+            "INSERT INTO chat (guid, style, chat_identifier, service_name) "
+            "VALUES ('iMessage;+;chat-empty', 43, 'chat-empty', 'iMessage')"
+        )
+        conn.commit()
+        conn.close()
+        guids, annotated, cursor, pages = [], set(), None, 0
+        while True:
+            page = messages.get_chat_messages(chat_id, cursor=cursor, limit=17)
+            guids.extend(m["guid"] for m in page["messages"])
+            annotated.update(m["guid"] for m in page["messages"] if m["reactions"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        missing = messages.get_chat_messages("chat-does-not-exist")
+        empty = messages.get_chat_messages("chat-empty")
+        bad_cursor = messages.get_chat_messages(chat_id, cursor="!!")
+
+        self.assertEqual(guids, expected)
+        self.assertEqual(pages, -(-len(expected) // 17))
+        self.assertTrue(annotated)
+        self.assertLessEqual(annotated, reacted)
+        self.assertIn("error", missing)
+        self.assertEqual(empty, {"chat_id": "chat-empty", "messages": [], "next_cursor": None})
+        self.assertIn("error", bad_cursor)
+
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the metrics module
+"""
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp import messages, metrics
+from tests.fixtures import FixtureTestCase
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for latency histograms, counters and their exposition"""
+
+    def setUp(self):
+        self._was_enabled = metrics.enabled()
+        metrics.set_enabled(True)
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+        metrics.set_enabled(self._was_enabled)
+
+    def test_instrumented_tool_records_latency_and_errors(self):
+        """Tool calls are timed and error strings are counted"""
+        @metrics.instrument_tool("echo")
+        def tool_echo(text: str) -> str:
+            return text
+
+        tool_echo("hi")
+        tool_echo("Error: nope")
+        exposition = metrics.render_prometheus()
+        self.assertIn('mcp_tool_latency_seconds_count{tool="echo"} 2', exposition)
+        self.assertIn('mcp_tool_errors_total{tool="echo"} 1', exposition)
+        self.assertIn("echo: 2 calls", metrics.format_summary())
+
+    def test_disabled_records_nothing(self):
+        """With metrics off nothing is collected"""
+        metrics.set_enabled(False)
+        with metrics.timer("messages_osascript_seconds"):
+            pass
+        metrics.record_cache("contacts", hit=True)
+        self.assertEqual(metrics.render_prometheus(), "\n")
+
+
+class TestQueryMetrics(FixtureTestCase):
+    """Tests for the query and cache metrics recorded by reads"""
+
+    def setUp(self):
+        super().setUp()
+        was_enabled = metrics.enabled()
+        metrics.set_enabled(True)
+        metrics.reset()
+        self.addCleanup(metrics.set_enabled, was_enabled)
+        self.addCleanup(metrics.reset)
+
+    def test_queries_and_caches_are_counted(self):
+        """Reads record per-function query latency and cache lookups"""
+        with patch.object(messages._RESULT_CACHE, "maxsize", 0):
+            messages.get_recent_messages(hours=24 * 30)
+            messages.get_recent_messages(hours=24 * 30)
+        messages.get_person_index()
+        exposition = metrics.render_prometheus()
+        # Queries run from lambdas and nested helpers carry their caller's name
+        self.assertIn('messages_query_latency_seconds_count{query="get_person_index"}', exposition)
+        self.assertNotIn('query="<lambda>"', exposition)
+        self.assertNotIn('query="run"', exposition)
+        self.assertNotIn('query="unlabelled"', exposition)
+        self.assertIn('messages_query_latency_seconds_count{query="get_recent_messages"} 2', exposition)
+        self.assertIn('messages_query_rows_count{query="get_recent_messages"} 2', exposition)
+        self.assertIn('messages_cache_requests_total{cache="chat_mapping",result="hit"}', exposition)
+        self.assertIn('messages_cache_requests_total{cache="decoded_body",result="hit"}', exposition)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for the person index
+"""
+import sqlite3
+import unittest
+
+from mac_messages_mcp import messages
+from mac_messages_mcp.people import PersonIndex, address_key
+from tests.fixtures import FixtureTestCase
+
+
+def _row(record_id, first, last, kind, address):
+    return {"record_id": record_id, "first_name": first, "last_name": last,
+            "nickname": None, "kind": kind, "address": address}
+
+
+class TestPersonIndex(unittest.TestCase):
+    """Tests for grouping AddressBook addresses and linking handles"""
+
+    def test_addresses_and_handles_resolve_to_one_person(self):
+        """Phone formats, emails and duplicate records all land on the same person"""
+        index = PersonIndex([
+            _row(1, "Ana", "Diaz", "phone", "+1 (555) 123-4567"),
+            _row(1, "Ana", "Diaz", "email", "Ana.Diaz@example.com"),
+            # Same contact synced from a second account
+            _row(7, "Ana", "Diaz", "phone", "5551234567"),
+            _row(7, "Ana", "Diaz", "email", "ana@work.example"),
+            _row(2, "Ben", "Ng", "phone", "+15559870000"),
+        ])
+        index.add_handles("chat.db", [
+            {"ROWID": 1, "id": "+15551234567"},
+            {"ROWID": 2, "id": "ana.diaz@example.com"},
+            {"ROWID": 3, "id": "ana@work.example"},
+            {"ROWID": 4, "id": "+15559870000"},
+            {"ROWID": 5, "id": "+15550000000"},
+        ])
+        self.assertEqual(len(index), 2)
+        ana = index.find("555-123-4567")
+        self.assertIs(index.find("ANA@WORK.EXAMPLE"), ana)
+        self.assertEqual(ana.handle_ids, {"chat.db": [1, 2, 3]})
+        self.assertEqual(ana.emails, ["Ana.Diaz@example.com", "ana@work.example"])
+        self.assertIs(index.find_handle("chat.db", 3), ana)
+        self.assertIsNone(index.find_handle("chat.db", 5))
+        self.assertEqual(address_key("+1 555 123 4567"), "5551234567")
+
+
+class TestContactFilter(FixtureTestCase):
+    """Tests for the person index applied to a fixture database"""
+
+    def test_contact_filter_includes_email_handles(self):
+        """Filtering by a phone number also reads that person's email handle"""
+        conn = sqlite3.connect(self.chat_db)
+        email, email_rowid = conn.execute(
+            "SELECT id, ROWID FROM handle WHERE id LIKE '%@%' ORDER BY ROWID LIMIT 1"
+        ).fetchone()
+        conn.close()
+        source = messages.get_message_sources()[0]
+        person = messages.find_person(email)
+        handle_ids = messages._contact_handle_ids(person.phones[0], source)
+        name = messages.get_contact_name(email_rowid, source)
+
+        self.assertIn(email_rowid, handle_ids)
+        self.assertGreater(len(handle_ids), 1)
+        self.assertEqual(name, person.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for the incrementally maintained contact history
+"""
+import sqlite3
+import time
+import unittest
+
+from mac_messages_mcp import messages, relationships
+from mac_messages_mcp.deadline import Deadline, deadline_scope
+from mac_messages_mcp.sources import apple_date_to_unix
+from tests.fixtures import FixtureTestCase
+
+
+class TestContactSummaries(FixtureTestCase):
+    """Tests for per-person stats and the ROWID watermark"""
+
+    FIXTURE_MESSAGES = 3000
+    FIXTURE_PEOPLE = 20
+
+    def _direct_stats(self, addresses):
+        """Total and last inbound/outbound Apple dates straight from SQL."""
+        conn = sqlite3.connect(self.chat_db)
+        marks = ",".join("?" * len(addresses))
+        row = conn.execute(
+            "SELECT COUNT(*), MAX(CASE WHEN is_from_me = 0 THEN date END),"
+            " MAX(CASE WHEN is_from_me = 1 THEN date END)"
+            " FROM message m JOIN handle h ON h.ROWID = m.handle_id"
+            f" WHERE h.id IN ({marks}) AND m.cache_roomnames IS NULL"
+            " AND COALESCE(m.associated_message_type, 0) NOT BETWEEN 2000 AND 3999",
+            addresses,
+        ).fetchone()
+        conn.close()
+        return row
+
+    def test_summaries_match_direct_query(self):
+        """Each person's counts and last-contact times agree with a full scan"""
+        summaries = relationships.get_contact_summaries()
+        index = messages.get_person_index()
+        checked = 0
+        for summary in summaries:
+            if summary["person_id"] is None:
+                continue
+            person = next(p for p in index.people if p.id == summary["person_id"])
+            handles = [
+                row["id"]
+                for row in messages.query_messages_db("SELECT id FROM handle")
+                if person is messages.find_person(row["id"])
+            ]
+            total, last_in, last_out = self._direct_stats(handles)
+            self.assertEqual(summary["total_messages"], total)
+            for unix_time, apple_date in ((summary["last_inbound"], last_in), (summary["last_outbound"], last_out)):
+                if apple_date is None:
+                    self.assertIsNone(unix_time)
+                else:
+                    self.assertAlmostEqual(unix_time, apple_date_to_unix(apple_date), places=3)
+            self.assertLessEqual(summary["messages_7d"], summary["messages_30d"])
+            self.assertLessEqual(summary["messages_30d"], summary["messages_90d"])
+            checked += 1
+        self.assertGreater(checked, 5)
+
+        overdue = relationships.get_overdue_contacts(days=0, limit=100, min_messages=1)
+        ratios = [p["overdue_ratio"] for p in overdue]
+        self.assertEqual(ratios, sorted(ratios, reverse=True))
+
+    def test_refresh_reads_only_new_messages(self):
+        """After the first pass, a refresh reads just the rows past the watermark"""
+        first = relationships.refresh()
+        self.assertGreater(first, 0)
+        self.assertEqual(relationships.refresh(), 0)
+
+        conn = sqlite3.connect(self.chat_db)
+        handle_id, address = conn.execute(
+            "SELECT ROWID, id FROM handle WHERE id LIKE '+1555%' ORDER BY ROWID LIMIT 1"
+        ).fetchone()
+        person_id = messages.find_person(address).id
+        summary = next(s for s in relationships.get_contact_summaries() if s["person_id"] == person_id)
+        now = time.time()
+        conn.execute(
+            "INSERT INTO message (guid, text, handle_id, date, is_from_me) VALUES (?, ?, ?, ?, 1)",
+            ("new-guid", "hello again", handle_id, int((now - 978307200) * 1_000_000_000)),
+        )
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(relationships.refresh(), 1)
+        updated = next(s for s in relationships.get_contact_summaries() if s["person_id"] == person_id)
+        self.assertEqual(updated["total_messages"], summary["total_messages"] + 1)
+        self.assertAlmostEqual(updated["last_outbound"], now, places=0)
+        self.assertEqual(updated["messages_7d"], summary["messages_7d"] + 1)
+
+    def test_partial_summaries_are_not_cached(self):
+        """Summaries built under a cut-short deadline are rebuilt; complete ones are reused"""
+        deadline = Deadline(None)
+        deadline.truncated = True
+        with deadline_scope(deadline):
+            partial = relationships.get_contact_summaries()
+        complete = relationships.get_contact_summaries()
+        self.assertIsNot(complete, partial)
+        self.assertIs(relationships.get_contact_summaries(), complete)
+        self.assertIsNotNone(messages.get_person_index().version)
+
+
+if __name__ == '__main__':
+    unittest.main()
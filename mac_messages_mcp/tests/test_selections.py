@@ -0,0 +1,81 @@
+"""
+Tests for per-session contact selections
+"""
+import threading
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp import messages, selections
+from mac_messages_mcp.selections import SelectionStore, resolve_selection, selection_session
+
+
+def _matches(*names):
+    return [{"name": name, "phone": f"+1555000{i:04d}", "score": 0.9} for i, name in enumerate(names)]
+
+
+class TestSelections(unittest.TestCase):
+    """Tests for the selection store and contact:N / token:N resolution"""
+
+    def setUp(self):
+        selections.get_selection_store().clear()
+
+    def tearDown(self):
+        selections.get_selection_store().clear()
+
+    def test_sessions_do_not_see_each_others_selections(self):
+        """Concurrent clients each resolve contact:N against their own lookup"""
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def client(session, names):
+            with selection_session(session):
+                selections.save_selection(_matches(*names))
+                barrier.wait()
+                results[session] = resolve_selection("contact:2")["name"]
+
+        threads = [
+            threading.Thread(target=client, args=("a", ["Alice A", "Alice B"])),
+            threading.Thread(target=client, args=("b", ["Bob A", "Bob B"])),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, {"a": "Alice B", "b": "Bob B"})
+        with selection_session("c"):
+            self.assertIn("No recent contact matches", resolve_selection("contact:1"))
+
+    def test_token_is_stable_and_selects_earlier_lookup(self):
+        """The same candidates get the same token, which outlives newer lookups"""
+        with selection_session("a"):
+            first = selections.save_selection(_matches("Alice A", "Alice B"))
+            self.assertEqual(first, selections.save_selection(_matches("Alice A", "Alice B")))
+            selections.save_selection(_matches("Bob A", "Bob B"))
+            self.assertEqual(resolve_selection("contact:1")["name"], "Bob A")
+            self.assertEqual(resolve_selection(f"{first}:1")["name"], "Alice A")
+        with selection_session("b"):
+            self.assertTrue(resolve_selection(f"{first}:1").startswith("Error: Selection"))
+
+    def test_lru_eviction(self):
+        """Old sessions and old selections are evicted first"""
+        store = SelectionStore(max_sessions=2, max_selections=2)
+        old = store.save(_matches("A1", "A2"), session="a")
+        store.save(_matches("B1", "B2"), session="a")
+        store.save(_matches("C1", "C2"), session="a")
+        self.assertIsNone(store.get(old, session="a"))
+        store.save(_matches("D1", "D2"), session="b")
+        store.save(_matches("E1", "E2"), session="c")
+        self.assertIsNone(store.get(session="a"))
+        self.assertEqual(store.get(session="c")[0]["name"], "E1")
+
+    def test_ambiguous_lookup_returns_token(self):
+        """get_recent_messages stores ambiguous matches and names their token"""
+        found = _matches("Sam One", "Sam Two")
+        with patch.object(messages, "find_contact_by_name", return_value=found):
+            result = messages.get_recent_messages(hours=1, contact="Sam")
+        self.assertIn(selections.make_token(found), result)
+        self.assertEqual(resolve_selection("contact:2")["name"], "Sam Two")
+
+
+if __name__ == '__main__':
+    unittest.main()
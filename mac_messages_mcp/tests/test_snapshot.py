@@ -0,0 +1,100 @@
+"""
+Tests for the snapshot module
+"""
+import os
+import sqlite3
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp.snapshot import MessagesSnapshot, default_snapshot_path, resolve_read_path
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests for backup-API snapshots of the Messages database"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmpdir.name, "chat.db")
+        self.target = os.path.join(self.tmpdir.name, "snap", "chat.db")
+        conn = sqlite3.connect(self.source)
+        conn.execute("CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT)")
+        conn.execute("INSERT INTO message (text) VALUES ('hello')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _count(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM message").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _add_message(self):
+        conn = sqlite3.connect(self.source)
+        conn.execute("INSERT INTO message (text) VALUES ('again')")
+        conn.commit()
+        conn.close()
+
+    def test_first_access_creates_copy(self):
+        """The snapshot is created on first access"""
+        snapshot = MessagesSnapshot(self.source, self.target, max_age=60)
+        self.assertEqual(snapshot.get_path(), self.target)
+        self.assertEqual(self._count(self.target), 1)
+
+    def test_changes_within_staleness_bound_are_not_copied(self):
+        """A fresh snapshot is served even if the source changed"""
+        snapshot = MessagesSnapshot(self.source, self.target, max_age=60)
+        snapshot.get_path()
+        self._add_message()
+        snapshot.get_path()
+        self.assertEqual(self._count(self.target), 1)
+
+    def test_stale_snapshot_refreshes_on_change(self):
+        """An expired snapshot picks up new rows"""
+        snapshot = MessagesSnapshot(self.source, self.target, max_age=0)
+        snapshot.get_path()
+        self._add_message()
+        # Make sure the file signature differs even on coarse mtime filesystems
+        os.utime(self.source, ns=(0, 0))
+        snapshot.get_path()
+        self.assertEqual(self._count(self.target), 2)
+
+    def test_copy_is_private(self):
+        """The snapshot and its directory are readable by the owner only"""
+        snapshot = MessagesSnapshot(self.source, self.target, max_age=60)
+        snapshot.get_path()
+        self.assertEqual(stat.S_IMODE(os.stat(self.target).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(self.target)).st_mode), 0o700)
+
+    def test_shared_directory_is_refused(self):
+        """A group- or world-readable directory is an error, not silently chmodded"""
+        os.makedirs(os.path.dirname(self.target), mode=0o755)
+        os.chmod(os.path.dirname(self.target), 0o755)
+        snapshot = MessagesSnapshot(self.source, self.target, max_age=60)
+        with self.assertRaisesRegex(PermissionError, "accessible to other users"):
+            snapshot.get_path()
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(self.target)).st_mode), 0o755)
+        self.assertFalse(os.path.exists(self.target))
+
+    def test_configured_file_path_is_per_source(self):
+        """Several roots configured with one file name get separate snapshots"""
+        configured = os.path.join(self.tmpdir.name, "snap.db")
+        with patch.dict(os.environ, {"MAC_MESSAGES_SNAPSHOT_PATH": configured}):
+            first = default_snapshot_path("/one/chat.db")
+            second = default_snapshot_path("/two/chat.db")
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith(os.path.join(self.tmpdir.name, "snap-")) and first.endswith(".db"))
+
+    def test_disabled_mode_reads_live_database(self):
+        """Without snapshot mode the live path is returned unchanged"""
+        with patch.dict(os.environ, {"MAC_MESSAGES_SNAPSHOT": "false"}):
+            self.assertEqual(resolve_read_path(self.source), self.source)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Tests for multi-root database sources
+"""
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from mac_messages_mcp.messages import get_recent_messages, query_messages_sources
+from mac_messages_mcp.sources import (
+    MESSAGES_DB_PATHS_ENV,
+    ConnectionPool,
+    apple_date_ns_sql,
+    get_messages_db_paths,
+    merge_by_date,
+)
+
+
+def _make_chat_db(path, messages):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT, service TEXT);
+        CREATE TABLE chat (ROWID INTEGER PRIMARY KEY, room_name TEXT, display_name TEXT, chat_identifier TEXT);
+        CREATE TABLE chat_handle_join (chat_id INTEGER, handle_id INTEGER);
+        CREATE TABLE message (
+            ROWID INTEGER PRIMARY KEY, guid TEXT, date INTEGER, text TEXT,
+            attributedBody BLOB, is_from_me INTEGER, handle_id INTEGER,
+            cache_roomnames TEXT, error INTEGER DEFAULT 0,
+            associated_message_guid TEXT, associated_message_type INTEGER DEFAULT 0,
+            cache_has_attachments INTEGER DEFAULT 0
+        );
+        INSERT INTO handle (ROWID, id, service) VALUES (1, '+15551234567', 'iMessage');
+        """
+    )
+    conn.executemany(
+        "INSERT INTO message (guid, date, text, is_from_me, handle_id) VALUES (?, ?, ?, 0, 1)",
+        messages,
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestSources(unittest.TestCase):
+    """Tests for the source registry and fan-out merge"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.old = os.path.join(self.tmpdir.name, "old-mac", "chat.db")
+        self.new = os.path.join(self.tmpdir.name, "new-mac", "chat.db")
+        os.makedirs(os.path.dirname(self.old))
+        os.makedirs(os.path.dirname(self.new))
+        now = 990_000_000 * 1_000_000_000  # Future date, same digit count as real ones
+        _make_chat_db(self.old, [("a", now + 1, "first"), ("b", now + 3, "shared")])
+        _make_chat_db(self.new, [("b", now + 3, "shared"), ("c", now + 2, "latest")])
+        self.env = patch.dict(
+            os.environ,
+            {MESSAGES_DB_PATHS_ENV: os.pathsep.join([self.new, os.path.dirname(self.old)]),
+             "USE_TEST_DATA": "true"},
+        )
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmpdir.cleanup()
+
+    def test_configured_paths_expand_directories(self):
+        """Directories are searched for chat.db and order is preserved"""
+        self.assertEqual(get_messages_db_paths(), [self.new, self.old])
+
+    def test_merge_by_date_dedups_guids(self):
+        """Rows are merged newest-first and duplicates dropped by guid"""
+        merged = merge_by_date(
+            [
+                [{"guid": "b", "date": 3}, {"guid": "a", "date": 1}],
+                [{"guid": "b", "date": 3}, {"guid": "c", "date": 2}],
+            ]
+        )
+        self.assertEqual([row["guid"] for row in merged], ["b", "c", "a"])
+
+    def test_merge_orders_mixed_second_and_nanosecond_dates(self):
+        """Per-source SQL ordered on the normalized date merges correctly with seconds rows"""
+        conn = sqlite3.connect(self.old)
+        # Seconds-resolution row from an older macOS, newer than every nanosecond row
+        conn.execute("INSERT INTO message (guid, date, text) VALUES ('s', 990000001, 'seconds')")
+        conn.commit()
+        conn.close()
+        query = f"SELECT guid, date FROM message ORDER BY {apple_date_ns_sql('date')} DESC"
+        merged = query_messages_sources(lambda source: (query, ()))
+        self.assertEqual([row["guid"] for row in merged], ["s", "b", "c", "a"])
+
+    def test_unreadable_source_is_logged_not_printed(self):
+        """A broken source is skipped with a log warning, keeping stdout free for the stdio transport"""
+        with open(self.old, "wb") as f:
+            f.write(b"not a database")
+        query = f"SELECT guid, date FROM message ORDER BY {apple_date_ns_sql('date')} DESC"
+        stdout = io.StringIO()
+        with self.assertLogs("mac_messages_mcp.messages", "WARNING") as logs, redirect_stdout(stdout):
+            merged = query_messages_sources(lambda source: (query, ()))
+        self.assertEqual([row["guid"] for row in merged], ["b", "c"])
+        self.assertIn("Skipping unreadable Messages source", logs.output[0])
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_recent_messages_span_sources(self):
+        """get_recent_messages reads every configured chat.db once per message"""
+        result = get_recent_messages(hours=1, contact="+15551234567")
+        lines = result.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].endswith("shared"))
+        self.assertTrue(lines[1].endswith("latest"))
+        self.assertTrue(lines[2].endswith("first"))
+
+    def test_pool_drops_connections_after_any_failure(self):
+        """A connection is only reused after a clean exit with no open transaction"""
+        pool = ConnectionPool(self.old)
+        with pool.connection() as conn:
+            first = conn
+        with pool.connection() as conn:
+            self.assertIs(conn, first)
+
+        with self.assertRaises(KeyboardInterrupt):
+            with pool.connection() as conn:
+                conn.execute("SELECT 1")
+                raise KeyboardInterrupt
+        with pool.connection() as conn:
+            self.assertIsNot(conn, first)
+            conn.execute("BEGIN")
+            conn.execute("UPDATE message SET text = text")
+            in_transaction = conn
+        with pool.connection() as conn:
+            self.assertIsNot(conn, in_transaction)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
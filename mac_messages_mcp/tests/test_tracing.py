@@ -0,0 +1,75 @@
+"""
+Tests for the tracing module
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mac_messages_mcp import tracing
+from mac_messages_mcp.messages import query_messages_db
+from tests.fixtures import generate_fixture_dir
+
+_PARENT_TRACE = "0af7651916cd43dd8448eb211c80319c"
+_PARENT_SPAN = "b7ad6b7169203331"
+
+
+class TestTracing(unittest.TestCase):
+    """Tests for JSONL span export and trace propagation"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.tmpdir.name, "traces.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _spans(self):
+        tracing.flush()
+        with open(self.trace_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_spans_continue_inherited_trace(self):
+        """Spans join the TRACEPARENT trace and SQLite queries nest under them"""
+        chat_db, _ = generate_fixture_dir(self.tmpdir.name, messages=200, people=5)
+        env = {
+            "TRACE_FILE": self.trace_file,
+            "TRACEPARENT": f"00-{_PARENT_TRACE}-{_PARENT_SPAN}-01",
+            "MAC_MESSAGES_DB_PATHS": chat_db,
+        }
+        with patch.dict(os.environ, env):
+            with tracing.span("cli") as root:
+                query_messages_db("SELECT ROWID FROM message LIMIT 3")
+                child = tracing.child_env()
+
+        query, cli = self._spans()
+        self.assertEqual(cli["name"], "cli")
+        self.assertEqual(cli["trace_id"], _PARENT_TRACE)
+        self.assertEqual(cli["parent_id"], _PARENT_SPAN)
+        self.assertEqual(query["name"], "sqlite.query")
+        self.assertEqual(query["parent_id"], cli["span_id"])
+        self.assertEqual(query["attributes"]["rows"], 3)
+        self.assertEqual(child["TRACEPARENT"], root.traceparent)
+
+    def test_writer_keeps_the_trace_file_open(self):
+        """Spans are written off the calling thread through one open file handle"""
+        with patch.dict(os.environ, {"TRACE_FILE": self.trace_file}), \
+                patch.object(tracing, "open", wraps=open, create=True) as opened:
+            for i in range(50):
+                with tracing.span("query", n=i):
+                    pass
+            spans = self._spans()
+        self.assertEqual([s["attributes"]["n"] for s in spans], list(range(50)))
+        self.assertEqual(opened.call_count, 1)
+
+    def test_disabled_without_exporter(self):
+        """Without TRACE_FILE or an OTLP endpoint spans are no-ops"""
+        with patch.dict(os.environ, {}, clear=True):
+            with tracing.span("noop") as span:
+                self.assertIsNone(span)
+        self.assertFalse(os.path.exists(self.trace_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for serving the MCP server over HTTP without a proxy
+"""
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+from starlette.testclient import TestClient
+
+from mac_messages_mcp import server
+
+_ACCEPT = "application/json, text/event-stream"
+
+
+def _sse_json(response):
+    """The JSON-RPC message in a streamable HTTP response (JSON or a single SSE event)."""
+    if response.headers["content-type"].startswith("application/json"):
+        return response.json()
+    data = [line[5:].strip() for line in response.text.splitlines() if line.startswith("data:")]
+    return json.loads(data[-1])
+
+
+class TestHttpTransport(unittest.TestCase):
+    """Tests for run_server options and the streamable HTTP app"""
+
+    def setUp(self):
+        settings = server.mcp.settings
+        saved = (settings.host, settings.port, settings.stateless_http, settings.transport_security)
+
+        def restore():
+            settings.host, settings.port, settings.stateless_http, settings.transport_security = saved
+        self.addCleanup(restore)
+
+    def test_options_default_to_environment(self):
+        """Flags fall back to MAC_MESSAGES_* variables, and stdio stays the default"""
+        with patch.dict(os.environ, {}, clear=True):
+            args = server._parse_args([])
+        self.assertEqual((args.transport, args.host, args.port, args.workers), ("stdio", "127.0.0.1", 8000, 1))
+
+        env = {server.TRANSPORT_ENV: "streamable-http", server.PORT_ENV: "9001", server.KEEP_ALIVE_ENV: "30",
+               server.ALLOWED_HOSTS_ENV: "host.docker.internal, example.ngrok.app"}
+        with patch.dict(os.environ, env):
+            args = server._parse_args([])
+            flagged = server._parse_args(["--allowed-host", "mac.local"])
+        self.assertEqual((args.transport, args.port, args.keep_alive), ("streamable-http", 9001, 30))
+        self.assertEqual(args.allowed_hosts, ["host.docker.internal", "example.ngrok.app"])
+        self.assertEqual(flagged.allowed_hosts, ["mac.local"])
+        allowed = server._transport_security(["example.ngrok.app", "mac.local:8000"]).allowed_hosts
+        self.assertTrue({"localhost:*", "example.ngrok.app", "example.ngrok.app:*", "mac.local:8000"} <= set(allowed))
+        self.assertNotIn("mac.local:8000:*", allowed)
+
+        with patch.dict(os.environ, {server.TRANSPORT_ENV: "carrier-pigeon"}), self.assertRaises(SystemExit):
+            server._parse_args([])
+        # Selections and tokens are per process, so extra workers are refused
+        with self.assertRaises(SystemExit):
+            server._parse_args(["--transport", "streamable-http", "--workers", "3"])
+
+    def test_streamable_http_lists_tools(self):
+        """The app answers initialize and tools/list on /mcp in one session, and only for allowed hosts"""
+        server._configure_http("0.0.0.0", 8000, ["testserver"])
+        app = server.mcp.streamable_http_app()
+        self.assertFalse(server.mcp.settings.stateless_http)
+        self.assertTrue(server.mcp.settings.transport_security.enable_dns_rebinding_protection)
+
+        headers = {"Accept": _ACCEPT, "Content-Type": "application/json"}
+        initialize = {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {"protocolVersion": "2025-03-26", "capabilities": {},
+                       "clientInfo": {"name": "test", "version": "1"}},
+        }
+        with TestClient(app) as client:
+            response = client.post("/mcp", json=initialize, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(_sse_json(response)["result"]["serverInfo"]["name"], "MessageBridge")
+            headers["mcp-session-id"] = response.headers["mcp-session-id"]
+            client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+
+            response = client.post("/mcp", json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+                                   headers=headers)
+            tools = {tool["name"] for tool in _sse_json(response)["result"]["tools"]}
+
+            # DNS-rebinding protection stays on when bound to every interface
+            response = client.post("/mcp", json={"jsonrpc": "2.0", "id": 3, "method": "tools/list"},
+                                   headers=dict(headers, Host="rebind.example"))
+            self.assertEqual(response.status_code, 421)
+        self.assertIn("tool_get_recent_messages", tools)
+
+
+if __name__ == '__main__':
+    unittest.main()
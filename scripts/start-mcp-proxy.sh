@@ -1,18 +1,22 @@
 #!/usr/bin/env bash
-# Start mcp-proxy to expose mac_messages_mcp over HTTP for Poke.AI.
-# mac_messages_mcp uses stdio; Poke requires HTTP at /mcp.
+# Serve mac_messages_mcp over HTTP at /mcp for Poke.AI.
+# The server speaks streamable HTTP itself, so no mcp-proxy/Node process sits
+# in front of it. It binds 127.0.0.1 unless MAC_MESSAGES_HOST says otherwise;
+# set MAC_MESSAGES_ALLOWED_HOSTS to the names clients use when binding wider,
+# and MAC_MESSAGES_KEEP_ALIVE to tune idle connections.
 #
 # Uses local source (mac_messages_mcp) to avoid PyPI/FastMCP version mismatches.
 # Run from scrap/ or project root.
 #
 # Usage: ./scripts/start-mcp-proxy.sh [port] [--ngrok]
 #   port: default 8000
-#   --ngrok: also run ngrok to expose the proxy (for Poke integration)
+#   --ngrok: also run ngrok to expose the server (for Poke integration)
 set -e
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 MCP_DIR="$(cd "$SCRIPT_DIR/../mac_messages_mcp" && pwd)"
 
 PORT=8000
+HOST="${MAC_MESSAGES_HOST:-127.0.0.1}"
 NGROK=
 for arg in "$@"; do
   if [[ "$arg" == "--ngrok" ]]; then
@@ -23,13 +27,13 @@ for arg in "$@"; do
 done
 
 run_proxy() {
-  if [[ ! -f "$MCP_DIR/run-for-proxy.sh" ]]; then
-    echo "Local mac_messages_mcp not found at $MCP_DIR; falling back to uvx"
-    npx mcp-proxy uvx mac-messages-mcp --port "$PORT" --host 0.0.0.0
-  else
-    echo "Starting MCP proxy for mac-messages-mcp (local) on port $PORT"
-    npx mcp-proxy "$MCP_DIR/run-for-proxy.sh" --port "$PORT" --host 0.0.0.0
+  if [[ ! -f "$MCP_DIR/pyproject.toml" ]]; then
+    # The published release predates --transport, so there is nothing to fall back to
+    echo "Local mac_messages_mcp not found at $MCP_DIR" >&2
+    exit 1
   fi
+  echo "Starting mac-messages-mcp (local) over HTTP on $HOST:$PORT"
+  (cd "$MCP_DIR" && exec uv run python -m mac_messages_mcp.server --transport streamable-http --port "$PORT" --host "$HOST")
 }
 
 if [[ -n "$NGROK" ]]; then
@@ -42,7 +46,8 @@ if [[ -n "$NGROK" ]]; then
   trap "kill $MCP_PID 2>/dev/null || true" EXIT
   sleep 2
   echo "Exposing with ngrok..."
-  ngrok http "$PORT"
+  # Rewrite Host to localhost so requests pass the server's DNS-rebinding check
+  ngrok http "$PORT" --host-header=rewrite
 else
   run_proxy
 fi